@@ -0,0 +1,90 @@
+"""Benchmark: async (aiosqlite) endpoints vs. the same reads on sync endpoints when the threadpool is full.
+Starlette runs sync endpoints on a 40-thread pool; a few slow sync requests (here: sleeping ones, standing
+in for TMDB-bound admin syncs) exhaust it and every sync read queues behind them, while async endpoints
+keep answering. Uses a throwaway SQLite file, never movie_tinder.db.
+Run: python bench_async.py [concurrent_reads] [blocking_requests]"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+os.environ["TMDB_CACHE_PATH"] = os.path.join(_tmp.name, "tmdb_cache.db")
+os.environ["NOTIFY_BACKEND"] = "memory"
+
+import httpx  # noqa: E402
+from fastapi import Depends, HTTPException, Query  # noqa: E402
+from sqlalchemy.orm import Session  # noqa: E402
+
+import main  # noqa: E402
+from catalog import get_match_feed  # noqa: E402
+from database import get_read_db, async_read_engine, SessionLocal, User, Movie, Friendship, Match  # noqa: E402
+
+
+@main.app.get("/bench/slow")
+def slow(seconds: float = 1.0):
+    time.sleep(seconds)
+    return {}
+
+
+@main.app.get("/bench/sync-matches")
+def sync_matches(current_username: str = Query(...), db: Session = Depends(get_read_db)):
+    user = main.user_cache.get(db, current_username)
+    if not user:
+        raise HTTPException(status_code=404, detail="User not found")
+    return get_match_feed(db, user.id)[0]
+
+
+def seed(users: int = 50, movies: int = 200) -> None:
+    with SessionLocal() as db:
+        db.add_all(Movie(title=f"Movie {i}", genre="Drama") for i in range(movies))
+        db.add_all(User(username=f"user{i}", invite_code=f"CODE{i:04d}") for i in range(users))
+        db.flush()
+        db.add_all(Friendship(user1_id=u, user2_id=u + 1) for u in range(1, users))
+        db.add_all(Match(user1_id=u, user2_id=u + 1, movie_id=m) for u in range(1, users) for m in range(1, 6))
+        db.commit()
+
+
+async def asgi_app(scope, receive, send):
+    """main.app as httpx's ASGITransport types it (its ASGI signature is stricter than Starlette's)."""
+    await main.app(scope, receive, send)
+
+
+async def timed(client: httpx.AsyncClient, url: str) -> float:
+    start = time.perf_counter()
+    response = await client.get(url)
+    response.raise_for_status()
+    return time.perf_counter() - start
+
+
+async def run(path: str, reads: int, blockers: int) -> tuple[int, float, float]:
+    """Fire `blockers` 1s sync requests, then `reads` concurrent reads.
+    Returns (reads served while the threadpool was held, p50, max read latency)."""
+    transport = httpx.ASGITransport(app=asgi_app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        slow_requests = [asyncio.create_task(timed(client, "/bench/slow?seconds=1")) for _ in range(blockers)]
+        await asyncio.sleep(0.1)  # let the slow requests take their threads
+        latencies = sorted(await asyncio.gather(
+            *(timed(client, f"{path}?current_username=user{i % 50}") for i in range(reads))
+        ))
+        await asyncio.gather(*slow_requests)
+    await async_read_engine.dispose()  # pooled aiosqlite connections belong to this event loop
+    served_while_blocked = sum(1 for latency in latencies if latency < 0.9)
+    return served_while_blocked, latencies[len(latencies) // 2], latencies[-1]
+
+
+def bench():
+    reads = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    blockers = int(sys.argv[2]) if len(sys.argv) > 2 else 40
+    seed()
+    print(f"{reads} concurrent /api/matches/ reads while {blockers} slow sync requests hold the threadpool (40 threads)")
+    for label, path in (("sync endpoint ", "/bench/sync-matches"), ("async endpoint", "/api/matches/")):
+        served, p50, worst = asyncio.run(run(path, reads, blockers))
+        print(f"  {label}: {served:5d} served while blocked   p50 {p50 * 1000:7.1f} ms   max {worst * 1000:7.1f} ms")
+    _tmp.cleanup()
+
+
+if __name__ == "__main__":
+    bench()
@@ -0,0 +1,103 @@
+"""Benchmark: movies every member of a group liked, bitset AND (bitmap_index) vs. the SQL INTERSECT
+fallback vs. an N-way self-join on swipes. Builds a synthetic catalog and likes in a throwaway SQLite file, never
+movie_tinder.db. Each member likes the same popular core plus random movies, so the groups have
+common likes.
+Run: python bench_group_sessions.py [members] [likes per member] [movies]"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+os.environ["NOTIFY_BACKEND"] = "memory"
+
+from sqlalchemy import insert, select  # noqa: E402
+from sqlalchemy.orm import aliased  # noqa: E402
+
+from config import settings  # noqa: E402
+from database import (  # noqa: E402
+    init_db, SessionLocal, ReadSessionLocal, User, Movie, Swipe, SwipeDirection, StreamingService,
+    MovieStreamingService,
+)
+from bitmap_index import movie_index  # noqa: E402
+from group_sessions import group_movie_ids  # noqa: E402
+
+SERVICES = ["Netflix", "Hulu", "Disney+", "Max", "Prime Video", "Apple TV+", "Paramount+", "Peacock"]
+RUNS = 20
+
+
+def fill(members: int, likes: int, movies: int) -> list[int]:
+    with SessionLocal() as db:
+        for start in range(0, movies, 50000):
+            db.execute(insert(Movie), [
+                {"title": f"Movie {n}", "genre": "Drama"} for n in range(start, min(movies, start + 50000))
+            ])
+        db.execute(insert(StreamingService), [{"name": name} for name in SERVICES])
+        db.execute(insert(MovieStreamingService), [
+            {"movie_id": movie_id, "streaming_service_id": service_id}
+            for movie_id in range(1, movies + 1)
+            for service_id in random.sample(range(1, len(SERVICES) + 1), random.randint(0, 3))
+        ])
+        db.execute(insert(User), [{"username": f"user{n}", "invite_code": f"code{n}"} for n in range(members)])
+        core = random.sample(range(1, movies + 1), likes // 10)
+        for user_id in range(1, members + 1):
+            liked = set(core)
+            while len(liked) < likes:
+                liked.add(random.randint(1, movies))
+            db.execute(insert(Swipe), [
+                {"user_id": user_id, "movie_id": movie_id, "direction": SwipeDirection.RIGHT} for movie_id in liked
+            ])
+        db.commit()
+    return list(range(1, members + 1))
+
+
+def self_join(db, user_ids: list[int]) -> list[int]:
+    """The query this replaces: one swipes alias per member, all common likes (ranking needs every one)."""
+    first = aliased(Swipe)
+    stmt = select(first.movie_id).where(first.user_id == user_ids[0], first.direction == SwipeDirection.RIGHT)
+    for user_id in user_ids[1:]:
+        other = aliased(Swipe)
+        stmt = stmt.join(other, other.movie_id == first.movie_id).where(
+            other.user_id == user_id, other.direction == SwipeDirection.RIGHT
+        )
+    return list(db.execute(stmt).scalars())
+
+
+def timed(label: str, call) -> list[int]:
+    timings, result = [], []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        result = call()
+        timings.append(time.perf_counter() - start)
+    timings.sort()
+    print(f"  {label:<14} p50 {timings[len(timings) // 2] * 1000:8.2f} ms  max {timings[-1] * 1000:8.2f} ms")
+    return result
+
+
+def main():
+    members = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    likes = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    movies = int(sys.argv[3]) if len(sys.argv) > 3 else 200000
+    random.seed(0)
+    init_db()
+    start = time.perf_counter()
+    user_ids = fill(members, likes, movies)
+    print(f"{members} members x {likes} likes over {movies} movies inserted in {time.perf_counter() - start:.1f} s")
+
+    with ReadSessionLocal() as db:
+        start = time.perf_counter()
+        movie_index.ensure_loaded(db)
+        common = movie_index.common_likes(db, user_ids)
+        print(f"  bitsets loaded (cold) in {(time.perf_counter() - start) * 1000:.1f} ms, {common.bit_count()} common likes")
+        timed("bitset AND", lambda: movie_index.common_likes(db, user_ids))
+        settings.use_bitmap_index = True
+        ranked = timed("bitsets", lambda: group_movie_ids(db, user_ids, None, 20))
+        settings.use_bitmap_index = False
+        assert timed("SQL intersect", lambda: group_movie_ids(db, user_ids, None, 20)) == ranked
+        timed("self-join", lambda: self_join(db, user_ids))
+
+
+if __name__ == "__main__":
+    main()
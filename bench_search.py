@@ -0,0 +1,89 @@
+"""Benchmark: typeahead search over a synthetic catalog, FTS5 (search.py) vs. LIKE '%q%' on movies.title.
+Generates titles and descriptions from a Zipf-distributed vocabulary (inserted through the movies_fts
+triggers) in a throwaway SQLite file, never movie_tinder.db, then times queries as a user types them.
+Run: python bench_search.py [movies] [queries]"""
+import itertools
+import os
+import random
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+os.environ["NOTIFY_BACKEND"] = "memory"
+
+from sqlalchemy import insert, select  # noqa: E402
+
+from database import init_db, SessionLocal, ReadSessionLocal, Movie  # noqa: E402
+from search import search_movie_ids  # noqa: E402
+
+SYLLABLES = "ka ri to mo na se lu vi po de ra ne shi ta ko mi ba lo fe gu".split()
+
+
+def vocabulary(size: int = 30000) -> tuple[list[str], list[float]]:
+    """Stop words plus invented words, with Zipf cumulative weights."""
+    words = sorted({"".join(random.choices(SYLLABLES, k=random.randint(2, 4))) for _ in range(size)})
+    random.shuffle(words)
+    words = ["the", "of", "a", "and", "in"] + words
+    return words, list(itertools.accumulate(1 / (rank + 1) for rank in range(len(words))))
+
+
+def fill(movies: int, words: list[str], weights: list[float]) -> None:
+    with SessionLocal() as db:
+        for start in range(0, movies, 10000):
+            db.execute(insert(Movie), [
+                {
+                    "title": " ".join(random.choices(words, cum_weights=weights, k=random.randint(1, 4))).title(),
+                    "genre": "Drama",
+                    "description": " ".join(random.choices(words, cum_weights=weights, k=30)),
+                }
+                for _ in range(start, min(movies, start + 10000))
+            ])
+            db.commit()
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run(label: str, search, queries: list[str]) -> None:
+    timings = []
+    for query in queries:
+        start = time.perf_counter()
+        search(query)
+        timings.append(time.perf_counter() - start)
+    print(f"  {label:<6} p50 {percentile(timings, 0.5) * 1000:7.2f} ms  p99 {percentile(timings, 0.99) * 1000:7.2f} ms")
+
+
+def main():
+    movies = int(sys.argv[1]) if len(sys.argv) > 1 else 500000
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    random.seed(0)
+    init_db()
+    words, weights = vocabulary()
+    start = time.perf_counter()
+    fill(movies, words, weights)
+    print(f"{movies} movies inserted (with FTS triggers) in {time.perf_counter() - start:.1f} s")
+
+    # Every prefix (2+ characters) of two-word phrases, as typed: "ka", "kar", ..., "karito mo", ...
+    queries = []
+    while len(queries) < count:
+        phrase = " ".join(random.choices(words[:2000], cum_weights=weights[:2000], k=2))
+        queries += [phrase[:n] for n in range(2, len(phrase) + 1) if not phrase[:n].endswith(" ")]
+    queries = queries[:count]
+
+    with ReadSessionLocal() as db:
+        def like(query: str):
+            return db.execute(
+                select(Movie.id).where(Movie.title.ilike(f"%{query}%")).order_by(Movie.title).limit(20)
+            ).scalars().all()
+
+        print(f"{len(queries)} typeahead queries, 20 results each:")
+        run("fts5", lambda query: search_movie_ids(db, query, 20), queries)
+        run("like", like, queries)
+
+
+if __name__ == "__main__":
+    main()
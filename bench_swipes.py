@@ -0,0 +1,77 @@
+"""Benchmark: swipe write throughput, one commit per request vs. group commit (SwipeWriter).
+Uses a throwaway SQLite file, never movie_tinder.db. Run: python bench_swipes.py [clients] [swipes_per_client]"""
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.orm import sessionmaker
+
+from database import Base, Movie, User, SwipeDirection
+from swipes import record_swipes
+from swipe_writer import SwipeWriter
+
+
+def make_db(path: str, clients: int, movies: int):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 60})
+
+    @event.listens_for(engine, "connect")
+    def _wal(dbapi_conn, _record):
+        dbapi_conn.execute("PRAGMA journal_mode=WAL")
+
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with Session() as db:
+        db.add_all(Movie(title=f"Movie {i}", genre="Drama") for i in range(movies))
+        db.add_all(User(username=f"user{i}", invite_code=f"CODE{i:04d}") for i in range(clients))
+        db.commit()
+    return engine, Session
+
+
+def run(clients: int, per_client: int, swipe_one) -> float:
+    """Each client thread swipes per_client movies sequentially; returns swipes/second."""
+    def client(user_id: int):
+        for movie_id in range(1, per_client + 1):
+            swipe_one(user_id, movie_id, SwipeDirection.RIGHT if movie_id % 3 == 0 else SwipeDirection.LEFT)
+
+    threads = [threading.Thread(target=client, args=(u,)) for u in range(1, clients + 1)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return clients * per_client / (time.perf_counter() - start)
+
+
+def main():
+    clients = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    per_client = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with tempfile.TemporaryDirectory() as tmp:
+        engine, Session = make_db(os.path.join(tmp, "per_request.db"), clients, per_client)
+
+        def per_request(user_id, movie_id, direction):
+            with Session() as db:
+                record_swipes(db, [(user_id, movie_id, direction)])
+                db.commit()
+
+        baseline = run(clients, per_client, per_request)
+        engine.dispose()
+
+        engine, Session = make_db(os.path.join(tmp, "group_commit.db"), clients, per_client)
+        writer = SwipeWriter(Session)
+        grouped = run(clients, per_client, lambda *args: writer.submit(*args).result())
+        writer.stop()
+        with engine.connect() as conn:
+            written = conn.execute(text("SELECT count(*) FROM swipes")).scalar()
+        engine.dispose()
+
+    print(f"{clients} clients x {per_client} swipes")
+    print(f"  per-request commit: {baseline:8.0f} swipes/s")
+    print(f"  group commit:       {grouped:8.0f} swipes/s "
+          f"({writer.stats['commits']} commits for {written} swipes, {grouped / baseline:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
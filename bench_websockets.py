@@ -0,0 +1,118 @@
+"""Load test: realtime.ConnectionManager with thousands of simulated sockets in one event loop.
+
+Sockets are in-process stand-ins for Starlette WebSockets: most send immediately, some take
+1-5 ms per send, some never finish a send (stalled clients), and some never answer pings.
+Every user has two sockets (tabs). Reports fan-out cost, delivery latency to healthy sockets,
+and slow / idle evictions.
+Run: python bench_websockets.py [sockets] [rounds]"""
+import asyncio
+import json
+import random
+import sys
+import time
+
+from fastapi import WebSocketDisconnect
+
+from realtime import ConnectionManager
+
+
+class SimulatedSocket:
+    def __init__(self, send_delay: float, stalled: bool = False, silent: bool = False):
+        self.send_delay = send_delay
+        self.stalled = stalled
+        self.silent = silent
+        self.latencies: list[float] = []
+        self.closed_with: int | None = None
+        self._inbox: asyncio.Queue = asyncio.Queue()
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, text: str):
+        if self.stalled:
+            await asyncio.sleep(3600)
+        await asyncio.sleep(self.send_delay)  # 0 still yields, like a real socket write
+        message = json.loads(text)
+        if message["type"] == "ping":
+            if not self.silent:
+                self._inbox.put_nowait(json.dumps({"type": "pong"}))
+        else:
+            self.latencies.append(time.perf_counter() - message["sent_at"])
+
+    async def receive_text(self) -> str:
+        text = await self._inbox.get()
+        if text is None:
+            raise WebSocketDisconnect()
+        return text
+
+    async def close(self, code: int = 1000):
+        self.closed_with = code
+        self._inbox.put_nowait(None)
+
+
+def percentile(values: list[float], p: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))] if values else 0.0
+
+
+async def fan_out(sockets: int, rounds: int) -> None:
+    manager = ConnectionManager(queue_size=16, ping_interval=3600, send_timeout=5.0)
+    users = [f"user{i}" for i in range(sockets // 2)]
+    clients = {}
+    for i in range(sockets):
+        kind = random.random()
+        delay = random.uniform(0.001, 0.005) if kind < 0.1 else 0.0
+        clients[i] = (users[i // 2], SimulatedSocket(delay, stalled=kind > 0.98))
+    tasks = [asyncio.create_task(manager.serve(ws, user)) for user, ws in clients.values()]
+    await asyncio.sleep(0.1)
+
+    enqueue_times = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for user in users:
+            manager.send_personal(user, {"type": "bench", "sent_at": time.perf_counter()})
+        enqueue_times.append(time.perf_counter() - start)
+        await asyncio.sleep(0.05)
+    healthy = [ws for _user, ws in clients.values() if not ws.stalled]
+    stalled = [ws for _user, ws in clients.values() if ws.stalled]
+    deadline = time.perf_counter() + 30
+    while time.perf_counter() < deadline and any(len(ws.latencies) < rounds for ws in healthy):
+        await asyncio.sleep(0.1)
+    await asyncio.sleep(0.5)  # let eviction closes finish
+
+    latencies = [latency for ws in healthy for latency in ws.latencies]
+    delivered = len(latencies)
+    print(f"fan-out: {sockets} sockets ({len(users)} users x 2), {len(stalled)} stalled, {rounds} rounds")
+    print(f"  enqueue per round: p50 {percentile(enqueue_times, 0.5) * 1000:6.1f} ms  "
+          f"max {max(enqueue_times) * 1000:6.1f} ms")
+    print(f"  delivered to healthy sockets: {delivered}/{len(healthy) * rounds}  "
+          f"latency p50 {percentile(latencies, 0.5) * 1000:6.1f} ms  p99 {percentile(latencies, 0.99) * 1000:6.1f} ms")
+    print(f"  stalled sockets evicted: {sum(ws.closed_with is not None for ws in stalled)}/{len(stalled)}  "
+          f"stats {manager.stats}")
+    await manager.close_all()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+async def idle_eviction(sockets: int) -> None:
+    manager = ConnectionManager(ping_interval=0.2, idle_timeout=0.5)
+    clients: list = [SimulatedSocket(0.0, silent=random.random() < 0.1) for _ in range(sockets)]  # stand-in WebSockets
+    tasks = [asyncio.create_task(manager.serve(ws, f"user{i}")) for i, ws in enumerate(clients)]
+    await asyncio.sleep(1.5)
+    silent = [ws for ws in clients if ws.silent]
+    print(f"heartbeat: {sockets} sockets, {len(silent)} never answer pings")
+    print(f"  silent evicted: {sum(ws.closed_with is not None for ws in silent)}/{len(silent)}  "
+          f"responsive still connected: {manager.connection_count}/{sockets - len(silent)}")
+    await manager.close_all()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def main():
+    sockets = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    random.seed(0)
+    asyncio.run(fan_out(sockets, rounds))
+    asyncio.run(idle_eviction(sockets))
+
+
+if __name__ == "__main__":
+    main()
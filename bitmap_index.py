@@ -0,0 +1,305 @@
+"""In-process bitmap index: streaming service / genre -> movie ids, user -> swiped / liked movie ids.
+
+Bitsets are plain Python ints (bit n set = movie id n), so a filtered deck is one OR over the
+requested services, one OR over the requested genres, an AND of the two and one AND NOT against
+the user's swipes, done in C over machine words. A group's common likes are an AND of its members'
+liked bitsets, smallest first. The index is loaded lazily from the DB and kept current by tmdb_sync
+(movie_services_changed, movie_genres_changed) and the swipe endpoints (swiped), in every worker via
+the notify bus; callers fall back to the ORM query when it is disabled. An update that lands while
+the data it touches is being read from the DB is never lost: a user's swipes are applied on top of
+the load, a service / genre change makes the load run again.
+"""
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import (
+    ReadSessionLocal, Swipe, SwipeDirection, StreamingService, MovieStreamingService, Genre, MovieGenre,
+)
+from notify_bus import bus
+
+
+def iter_bits(bits: int, start: int = 0):
+    """Yield set bit positions >= start in ascending order."""
+    pos = start
+    bits >>= start
+    while bits:
+        low = (bits & -bits).bit_length() - 1
+        pos += low
+        yield pos
+        bits >>= low + 1
+        pos += 1
+
+
+def set_bits(bits: int) -> list[int]:
+    """All set bit positions in ascending order (one pass over the binary string, for dense results)."""
+    digits = bin(bits)[:1:-1]  # least significant bit first
+    positions = []
+    pos = digits.find("1")
+    while pos != -1:
+        positions.append(pos)
+        pos = digits.find("1", pos + 1)
+    return positions
+
+
+def bits_of(ids: Iterable[int]) -> int:
+    """Bitset of the ids, built in a byte buffer (OR-ing bits into an int copies it every time)."""
+    buf = bytearray()
+    for i in ids:
+        byte = i >> 3
+        if byte >= len(buf):
+            buf.extend(bytes(byte + 1 - len(buf)))
+        buf[byte] |= 1 << (i & 7)
+    return int.from_bytes(buf, "little")
+
+
+class MovieBitmapIndex:
+    def __init__(self, max_users: int = 4096):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._service_ids: dict[str, int] = {}       # StreamingService.name -> id
+        self._service_bits: dict[int, int] = {}      # StreamingService.id -> movie bitset
+        self._genre_ids: dict[str, int] = {}         # Genre.name -> id
+        self._genre_bits: dict[int, int] = {}        # Genre.id -> movie bitset
+        self._user_swiped: OrderedDict[int, int] = OrderedDict()  # user id -> swiped bitset (LRU)
+        self._user_liked: OrderedDict[int, int] = OrderedDict()  # user id -> right-swiped bitset (LRU)
+        # user id -> [loads in flight, swipes added meanwhile], so a load that raced a swipe still has it
+        self._loading_swiped: dict[int, list[int]] = {}
+        self._loading_liked: dict[int, list[int]] = {}
+        self._max_users = max_users
+        self._generation = 0  # bumped on every service / genre change, so a load that raced one is redone
+
+    def ensure_loaded(self, db: Session) -> None:
+        if self._loaded:
+            return
+        self._load(db)
+        while not self._loaded:
+            # A service / genre change landed during the load: read again in a fresh snapshot
+            with ReadSessionLocal() as fresh:
+                self._load(fresh)
+
+    def _load(self, db: Session) -> None:
+        with self._lock:
+            generation = self._generation
+        rows = db.execute(
+            select(StreamingService.id, StreamingService.name, MovieStreamingService.movie_id)
+            .join(MovieStreamingService, MovieStreamingService.streaming_service_id == StreamingService.id, isouter=True)
+        ).all()
+        service_ids, service_bits = _group_bits(rows)
+        genre_ids, genre_bits = _group_bits(db.execute(
+            select(Genre.id, Genre.name, MovieGenre.movie_id)
+            .join(MovieGenre, MovieGenre.genre_id == Genre.id, isouter=True)
+        ).all())
+        with self._lock:
+            if not self._loaded and generation == self._generation:
+                self._service_ids = service_ids
+                self._service_bits = service_bits
+                self._genre_ids = genre_ids
+                self._genre_bits = genre_bits
+                self._loaded = True
+
+    def set_movie_services(self, movie_id: int, services: Iterable[tuple[int, str]]) -> None:
+        """Replace a movie's (service id, name) links after a provider sync."""
+        mask = 1 << movie_id
+        with self._lock:
+            self._generation += 1
+            if not self._loaded:
+                return
+            for service_id in self._service_bits:
+                self._service_bits[service_id] &= ~mask
+            for service_id, name in services:
+                self._service_ids[name] = service_id
+                self._service_bits[service_id] = self._service_bits.get(service_id, 0) | mask
+
+    def set_movie_genres(self, movie_id: int, genres: Iterable[tuple[int, str]]) -> None:
+        """Replace a movie's (genre id, name) links after a sync."""
+        mask = 1 << movie_id
+        with self._lock:
+            self._generation += 1
+            if not self._loaded:
+                return
+            for genre_id in self._genre_bits:
+                self._genre_bits[genre_id] &= ~mask
+            for genre_id, name in genres:
+                self._genre_ids[name] = genre_id
+                self._genre_bits[genre_id] = self._genre_bits.get(genre_id, 0) | mask
+
+    def add_swipe(self, user_id: int, movie_id: int, liked: bool = False) -> None:
+        mask = 1 << movie_id
+        with self._lock:
+            for cache, loading, applies in (
+                (self._user_swiped, self._loading_swiped, True), (self._user_liked, self._loading_liked, liked),
+            ):
+                if not applies:
+                    continue
+                if user_id in cache:
+                    cache[user_id] |= mask
+                if user_id in loading:
+                    loading[user_id][1] |= mask
+
+    def _user_bits(self, cache: OrderedDict, loading: dict[int, list[int]], db: Session, user_id: int, stmt) -> int:
+        with self._lock:
+            bits = cache.get(user_id)
+            if bits is not None:
+                cache.move_to_end(user_id)
+                return bits
+            pending = loading.setdefault(user_id, [0, 0])
+            pending[0] += 1
+        try:
+            bits = bits_of(db.execute(stmt).scalars())
+        except BaseException:
+            with self._lock:
+                _done_loading(loading, user_id, pending)
+            raise
+        with self._lock:
+            _done_loading(loading, user_id, pending)
+            bits |= pending[1]  # swipes added while the DB was being read
+            cache[user_id] = bits
+            if len(cache) > self._max_users:
+                cache.popitem(last=False)
+        return bits
+
+    def _swiped(self, db: Session, user_id: int) -> int:
+        return self._user_bits(
+            self._user_swiped, self._loading_swiped, db, user_id, select(Swipe.movie_id).where(Swipe.user_id == user_id)
+        )
+
+    def _liked(self, db: Session, user_id: int) -> int:
+        return self._user_bits(
+            self._user_liked, self._loading_liked, db, user_id,
+            select(Swipe.movie_id).where(Swipe.user_id == user_id, Swipe.direction == SwipeDirection.RIGHT),
+        )
+
+    def common_likes(self, db: Session, user_ids: Iterable[int]) -> int:
+        """Bitset of the movies every user swiped right on: AND of their liked bitsets, smallest first."""
+        liked = sorted((self._liked(db, user_id) for user_id in set(user_ids)), key=int.bit_count)
+        if not liked:
+            return 0
+        common = liked[0]
+        for bits in liked[1:]:
+            if not common:
+                break
+            common &= bits
+        return common
+
+    def rank_by_services(self, db: Session, bits: int, service_names: Optional[list[str]] = None) -> list[int]:
+        """
+        Ids of the movies in `bits`, those on the most streaming services first (only the given
+        services count when some are given), then by id.
+        """
+        self.ensure_loaded(db)
+        with self._lock:
+            if service_names:
+                service_ids = [self._service_ids.get(name) for name in dict.fromkeys(service_names)]
+                service_bits = [self._service_bits.get(service_id, 0) for service_id in service_ids if service_id is not None]
+            else:
+                service_bits = list(self._service_bits.values())
+        shared = dict.fromkeys(set_bits(bits), 0)
+        for services in service_bits:
+            for movie_id in set_bits(bits & services):
+                shared[movie_id] += 1
+        return sorted(shared, key=lambda movie_id: (-shared[movie_id], movie_id))
+
+    def filtered_ids(
+        self,
+        db: Session,
+        user_id: Optional[int],
+        service_names: Optional[list[str]],
+        after: Optional[int] = None,
+        limit: int = 20,
+        genre_names: Optional[list[str]] = None,
+    ) -> list[int]:
+        """
+        Up to `limit` movie ids > after on any of the services and in any of the genres (at least one
+        of the two filters must be given) and not swiped by the user.
+        """
+        self.ensure_loaded(db)
+        with self._lock:
+            candidates = None
+            if service_names:
+                candidates = _union(self._service_ids, self._service_bits, service_names)
+            if genre_names:
+                genres = _union(self._genre_ids, self._genre_bits, genre_names)
+                candidates = genres if candidates is None else candidates & genres
+            candidates = candidates or 0
+        if candidates and user_id is not None:
+            candidates &= ~self._swiped(db, user_id)
+        start = after + 1 if after is not None else 0
+        ids = []
+        for movie_id in iter_bits(candidates, start):
+            ids.append(movie_id)
+            if len(ids) == limit:
+                break
+        return ids
+
+
+def _group_bits(rows) -> tuple[dict[str, int], dict[int, int]]:
+    """(id, name, movie id | None) rows -> ({name: id}, {id: movie bitset})."""
+    ids: dict[str, int] = {}
+    movie_ids: dict[int, list[int]] = {}
+    for key, name, movie_id in rows:
+        ids[name] = key
+        movie_ids.setdefault(key, [])
+        if movie_id is not None:
+            movie_ids[key].append(movie_id)
+    return ids, {key: bits_of(group) for key, group in movie_ids.items()}
+
+
+def _done_loading(loading: dict[int, list[int]], user_id: int, pending: list[int]) -> None:
+    pending[0] -= 1
+    if not pending[0]:
+        del loading[user_id]
+
+
+def _union(ids: dict[str, int], bits: dict[int, int], names: list[str]) -> int:
+    result = 0
+    for name in names:
+        key = ids.get(name)
+        if key is not None:
+            result |= bits.get(key, 0)
+    return result
+
+
+MOVIE_SERVICES_CHANNEL = "movie_services"
+MOVIE_GENRES_CHANNEL = "movie_genres"
+SWIPED_CHANNEL = "swiped"
+movie_index = MovieBitmapIndex(max_users=settings.bitmap_index_max_users)
+
+
+def _on_movie_services(event: dict) -> None:
+    movie_index.set_movie_services(event["movie_id"], [tuple(service) for service in event["services"]])
+
+
+def _on_movie_genres(event: dict) -> None:
+    movie_index.set_movie_genres(event["movie_id"], [tuple(genre) for genre in event["genres"]])
+
+
+def _on_swiped(event: dict) -> None:
+    liked = set(event.get("liked", ()))
+    for movie_id in event["movie_ids"]:
+        movie_index.add_swipe(event["user_id"], movie_id, movie_id in liked)
+
+
+bus.subscribe(MOVIE_SERVICES_CHANNEL, _on_movie_services)
+bus.subscribe(MOVIE_GENRES_CHANNEL, _on_movie_genres)
+bus.subscribe(SWIPED_CHANNEL, _on_swiped)
+
+
+def movie_services_changed(movie_id: int, services: list[tuple[int, str]]) -> None:
+    """Publish a movie's committed (service id, name) links to every worker's index."""
+    bus.publish(MOVIE_SERVICES_CHANNEL, {"movie_id": movie_id, "services": list(services)})
+
+
+def movie_genres_changed(movie_id: int, genres: list[tuple[int, str]]) -> None:
+    """Publish a movie's committed (genre id, name) links to every worker's index."""
+    bus.publish(MOVIE_GENRES_CHANNEL, {"movie_id": movie_id, "genres": list(genres)})
+
+
+def swiped(user_id: int, movie_ids: list[int], liked: Iterable[int] = ()) -> None:
+    """Publish a user's committed swipes (`liked` = the right swipes among them) to every worker's index."""
+    if movie_ids:
+        bus.publish(SWIPED_CHANNEL, {"user_id": user_id, "movie_ids": movie_ids, "liked": list(liked)})
@@ -0,0 +1,83 @@
+"""Pre-encoded movie cards: movie id -> MovieResponse JSON bytes, and responses built from them.
+
+A card is validated and encoded once (pydantic's JSON serializer) and cached; list and deck
+responses are assembled by joining the cached fragments, skipping per-request dict building,
+validation and encoding. Each entry remembers the movie's http_cache version when it was read,
+so a tmdb_sync update (which touches movie:<id>) makes it stale without explicit invalidation.
+"""
+import threading
+from collections import OrderedDict
+from typing import Iterable, Optional
+
+from fastapi import Response
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from config import settings
+from catalog import movie_cards
+from database import Movie
+from http_cache import versions, movie_key
+from models import MovieResponse
+
+
+class JSONBytesResponse(Response):
+    """JSON response whose body is already-encoded bytes (no serialization at send time)."""
+    media_type = "application/json"
+
+    def render(self, content: bytes) -> bytes:
+        return content
+
+
+def json_array(fragments: Iterable[bytes]) -> bytes:
+    return b"[" + b",".join(fragments) + b"]"
+
+
+def deck_body(fragments: list[bytes], next_cursor: Optional[int]) -> bytes:
+    """DeckResponse JSON: {"movies": [...], "next_cursor": n}."""
+    cursor = b"null" if next_cursor is None else str(next_cursor).encode()
+    return b'{"movies":' + json_array(fragments) + b',"next_cursor":' + cursor + b"}"
+
+
+class MovieCardCache:
+    def __init__(self, max_entries: int = 20000):
+        self._lock = threading.Lock()
+        self._cards: OrderedDict[int, tuple[int, bytes]] = OrderedDict()  # id -> (version, JSON)
+        self._max_entries = max_entries
+        self.stats = {"hits": 0, "misses": 0}
+
+    def get_many(self, db: Session, movie_ids: list[int]) -> list[bytes]:
+        """Encoded cards for the given ids, in the given order; unknown ids are skipped."""
+        found: dict[int, bytes] = {}
+        missing: dict[int, int] = {}  # id -> version read before loading
+        with self._lock:
+            for movie_id in movie_ids:
+                version = versions.get(movie_key(movie_id))
+                entry = self._cards.get(movie_id)
+                if entry and entry[0] == version:
+                    self._cards.move_to_end(movie_id)
+                    found[movie_id] = entry[1]
+                else:
+                    missing[movie_id] = version
+            self.stats["hits"] += len(found)
+            self.stats["misses"] += len(missing)
+        if missing:
+            movies = db.execute(select(Movie).where(Movie.id.in_(list(missing)))).scalars().all()
+            loaded = {
+                card["id"]: MovieResponse.model_validate(card).model_dump_json().encode()
+                for card in movie_cards(db, movies)
+            }
+            with self._lock:
+                for movie_id, encoded in loaded.items():
+                    self._cards[movie_id] = (missing[movie_id], encoded)
+                    self._cards.move_to_end(movie_id)
+                while len(self._cards) > self._max_entries:
+                    self._cards.popitem(last=False)
+            found.update(loaded)
+        return [found[movie_id] for movie_id in movie_ids if movie_id in found]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cards.clear()
+
+
+card_cache = MovieCardCache(settings.card_cache_max_entries)
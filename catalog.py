@@ -0,0 +1,184 @@
+"""Catalog read layer: movie cards, deck pages and the matches feed in a fixed number of queries."""
+from collections import defaultdict
+from typing import Iterable, Optional, Sequence
+
+from sqlalchemy import select, case, or_, and_, exists, func, join
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from database import Movie, StreamingService, MovieStreamingService, Genre, MovieGenre, Match, User, Swipe
+
+
+def services_for_movies_stmt(movie_ids: Iterable[int]):
+    """One SELECT returning (movie_id, StreamingService) for every link of the given movies."""
+    return (
+        select(MovieStreamingService.movie_id, StreamingService)
+        .join(StreamingService, StreamingService.id == MovieStreamingService.streaming_service_id)
+        .where(MovieStreamingService.movie_id.in_(list(movie_ids)))
+        .order_by(MovieStreamingService.movie_id, MovieStreamingService.id)
+    )
+
+
+def group_services(rows) -> dict[int, list[StreamingService]]:
+    """Group (movie_id, StreamingService) rows into {movie_id: [services]}."""
+    services: dict[int, list[StreamingService]] = defaultdict(list)
+    for movie_id, service in rows:
+        services[movie_id].append(service)
+    return services
+
+
+def movie_card(movie: Movie, streaming_services: list[StreamingService]) -> dict:
+    """Plain dict matching MovieResponse (never copies ORM internal state)."""
+    return {
+        "id": movie.id,
+        "title": movie.title,
+        "genre": movie.genre,
+        "rating": movie.rating,
+        "description": movie.description,
+        "poster_url": movie.poster_url,
+        "release_year": movie.release_year,
+        "imdb_rating": movie.imdb_rating,
+        "streaming_services": streaming_services,
+    }
+
+
+def load_services(db: Session, movie_ids: Iterable[int]) -> dict[int, list[StreamingService]]:
+    """Streaming services for many movies in a single query."""
+    movie_ids = list(dict.fromkeys(movie_ids))
+    if not movie_ids:
+        return {}
+    return group_services(db.execute(services_for_movies_stmt(movie_ids)).all())
+
+
+def movie_cards(db: Session, movies: Sequence[Movie]) -> list[dict]:
+    """Cards for an already-loaded page of movies: one extra query regardless of page size."""
+    cards = [movie_card(m, []) for m in movies]
+    services = load_services(db, (card["id"] for card in cards))
+    for card in cards:
+        card["streaming_services"] = services.get(card["id"], [])
+    return cards
+
+
+def movie_filters(movie_id, service_names: Optional[list[str]] = None, genre_names: Optional[list[str]] = None) -> list:
+    """
+    WHERE clauses keeping movies on any of the services and in any of the genres. Each is an IN over
+    its link table's (service / genre, movie) index, so the planner can drive from the more selective
+    filter and probe the other instead of scanning movies.
+    """
+    clauses = []
+    if service_names:
+        clauses.append(movie_id.in_(
+            select(MovieStreamingService.movie_id)
+            .join(StreamingService, StreamingService.id == MovieStreamingService.streaming_service_id)
+            .where(StreamingService.name.in_(service_names))
+        ))
+    if genre_names:
+        clauses.append(movie_id.in_(
+            select(MovieGenre.movie_id)
+            .join(Genre, Genre.id == MovieGenre.genre_id)
+            .where(Genre.name.in_(genre_names))
+        ))
+    return clauses
+
+
+def deck_stmt(
+    user_id: Optional[int],
+    after: Optional[int] = None,
+    limit: int = 20,
+    service_names: Optional[list[str]] = None,
+    genre_names: Optional[list[str]] = None,
+):
+    """
+    Ids of the next `limit` movies with id > `after` that the user hasn't swiped, in id order.
+    Walks the movies primary key from the cursor and probes uq_swipes_user_movie per candidate
+    (NOT EXISTS anti-join), so cost depends on page size, not on the size of the swipe history.
+    """
+    stmt = select(Movie.id)
+    if after is not None:
+        stmt = stmt.where(Movie.id > after)
+    if user_id is not None:
+        stmt = stmt.where(
+            ~exists().where(Swipe.user_id == user_id, Swipe.movie_id == Movie.id)
+        )
+    stmt = stmt.where(*movie_filters(Movie.id, service_names, genre_names))
+    return stmt.order_by(Movie.id).limit(limit)
+
+
+def get_deck_ids(
+    db: Session,
+    user_id: Optional[int],
+    after: Optional[int] = None,
+    limit: int = 20,
+    service_names: Optional[list[str]] = None,
+    genre_names: Optional[list[str]] = None,
+) -> tuple[list[int], Optional[int]]:
+    """One deck page as (movie ids, next_cursor); next_cursor is None once the deck is exhausted."""
+    movie_ids = list(db.execute(deck_stmt(user_id, after, limit, service_names, genre_names)).scalars())
+    next_cursor = movie_ids[-1] if len(movie_ids) == limit else None
+    return movie_ids, next_cursor
+
+
+def match_feed_stmt(user_id: int, since: Optional[int] = None):
+    """
+    One SELECT for the matches feed: the user's unread count LEFT JOIN (Match ⋈ friend ⋈ Movie ⟕ services)
+    for matches with id > since. Rows are (unread, Match, friend, Movie, StreamingService | None), one per
+    match and service; a single row of Nones after the count when there is nothing new.
+    """
+    mine = or_(Match.user1_id == user_id, Match.user2_id == user_id)
+    unread = (
+        select(func.count().label("unread"))
+        .select_from(Match)
+        .where(or_(
+            and_(Match.user1_id == user_id, Match.notified_user1.isnot(True)),
+            and_(Match.user2_id == user_id, Match.notified_user2.isnot(True)),
+        ))
+        .subquery()
+    )
+    friend_id = case((Match.user1_id == user_id, Match.user2_id), else_=Match.user1_id)
+    feed = (
+        join(Match, User, User.id == friend_id)
+        .join(Movie, Movie.id == Match.movie_id)
+        .outerjoin(MovieStreamingService, MovieStreamingService.movie_id == Movie.id)
+        .outerjoin(StreamingService, StreamingService.id == MovieStreamingService.streaming_service_id)
+    )
+    on = and_(mine, Match.id > since) if since is not None else mine
+    return (
+        select(unread.c.unread, Match, User, Movie, StreamingService)
+        .select_from(unread.outerjoin(feed, on))
+        .order_by(Match.id, MovieStreamingService.id)
+    )
+
+
+def match_feed(rows) -> tuple[list[dict], int]:
+    """Assemble match_feed_stmt rows into (dicts matching MatchResponse, unread count)."""
+    unread = 0
+    entries: dict[int, dict] = {}
+    for unread, match, friend, movie, service in rows:
+        if match is None:
+            continue
+        entry = entries.get(match.id)
+        if entry is None:
+            entry = entries[match.id] = {
+                "id": match.id,
+                "user1_id": match.user1_id,
+                "user2_id": match.user2_id,
+                "movie_id": match.movie_id,
+                "notified_user1": match.notified_user1,
+                "notified_user2": match.notified_user2,
+                "created_at": match.created_at,
+                "movie": movie_card(movie, []),
+                "friend": friend,
+            }
+        if service is not None:
+            entry["movie"]["streaming_services"].append(service)
+    return list(entries.values()), unread
+
+
+def get_match_feed(db: Session, user_id: int, since: Optional[int] = None) -> tuple[list[dict], int]:
+    """Matches newer than `since` (all if None) with friend, movie and services, plus the unread count: one query."""
+    return match_feed(db.execute(match_feed_stmt(user_id, since)).all())
+
+
+# Async variant for `async def` endpoints: same statement, awaited on an AsyncSession
+async def get_match_feed_async(db: AsyncSession, user_id: int, since: Optional[int] = None) -> tuple[list[dict], int]:
+    return match_feed((await db.execute(match_feed_stmt(user_id, since))).all())
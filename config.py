@@ -3,9 +3,65 @@ from pydantic_settings import BaseSettings
 
 
 class Settings(BaseSettings):
+    database_url: str = "sqlite:///./movie_tinder.db"
+    db_busy_timeout_ms: int = 20000  # wait instead of failing with "database is locked"
+    db_mmap_size: int = 256 * 1024 * 1024
+    db_cache_size_kib: int = 64 * 1024  # per connection
+    db_read_pool_size: int = 8
+    db_read_max_overflow: int = 8
+    db_write_pool_timeout: float = 30.0  # seconds a writer waits for the single write connection
+
     tmdb_api_key: str = ""
     tmdb_base_url: str = "https://api.themoviedb.org/3"
     tmdb_region: str = "US"
+    tmdb_timeout: float = 10.0
+    tmdb_max_concurrency: int = 8  # concurrent requests (and pooled keep-alive connections) per client
+    tmdb_max_retries: int = 3
+    tmdb_backoff_base: float = 0.5  # seconds; retry n waits up to base * 2^n (jittered)
+    tmdb_backoff_max: float = 8.0
+    # Read-through TMDB cache (memory LRU + SQLite file); TTLs in seconds
+    tmdb_cache_path: str = "tmdb_cache.db"
+    tmdb_cache_max_entries: int = 10000
+    tmdb_cache_ttl_search: float = 7 * 24 * 3600
+    tmdb_cache_ttl_details: float = 7 * 24 * 3600
+    tmdb_cache_ttl_providers: float = 24 * 3600
+    tmdb_cache_ttl_popular: float = 3600
+    tmdb_cache_ttl_genres: float = 7 * 24 * 3600
+    tmdb_cache_ttl_negative: float = 3600
+    # Popular pages queued ahead of each /api/load-more-movies request
+    catalog_prefetch_pages: int = 2
+    # Group commit for POST /api/swipes/ (False = one commit per request)
+    swipe_group_commit: bool = True
+    swipe_flush_interval_ms: float = 5
+    swipe_max_batch: int = 500
+    # In-memory bitmap index for streaming-service deck filtering (False = ORM query only)
+    use_bitmap_index: bool = True
+    bitmap_index_max_users: int = 4096
+    # LRU of username -> (id, invite code); unknown usernames are remembered for a short TTL
+    user_cache_max_entries: int = 10000
+    user_cache_negative_ttl: float = 5.0
+    # Pre-encoded movie card JSON kept in memory
+    card_cache_max_entries: int = 20000
+    # WebSocket notifications: per-socket send queue, slow consumers ("disconnect" or "drop" oldest), heartbeat
+    ws_send_queue_size: int = 64
+    ws_slow_consumer_policy: str = "disconnect"
+    ws_ping_interval: float = 20.0
+    ws_idle_timeout: float = 60.0
+    ws_send_timeout: float = 10.0
+    # Cross-worker event bus ("sqlite" outbox file shared by the workers, or "memory" for one process)
+    notify_backend: str = "sqlite"
+    notify_bus_path: str = "movie_tinder_bus.db"
+    notify_poll_interval_ms: float = 50
+    notify_retention: float = 300.0  # seconds events are kept in the outbox
+    # Typeahead search: how many FTS matches per tier are ranked (bounds the cost of short, broad prefixes)
+    search_candidates: int = 200
+    # Collaborative-filtering deck ranking (recommender.py); False = decks in catalog order
+    deck_ranking: bool = True
+    recommender_neighbors: int = 50  # top-K similar movies kept per movie
+    recommender_workers: int = 0  # processes computing similarities; 0 = one per CPU
+    recommender_block_size: int = 1024  # movies per similarity block (bounds worker memory)
+    # Group watch sessions: largest group, creator included
+    group_session_max_members: int = 20
 
     class Config:
         env_file = ".env"
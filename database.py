@@ -1,19 +1,72 @@
-from sqlalchemy import create_engine, Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Enum as SQLEnum, text
+from sqlalchemy import create_engine, event, Column, Integer, String, Boolean, DateTime, ForeignKey, Text, Enum as SQLEnum, Index, text
 from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from sqlalchemy.orm import sessionmaker, relationship
 from datetime import datetime
 import enum
 
-SQLALCHEMY_DATABASE_URL = "sqlite:///./movie_tinder.db"
+from config import settings
 
-# Timeout 20s so concurrent requests (swipe + load-more + get_movies) wait instead of "database is locked"
-# WAL mode allows one writer + multiple readers and reduces lock contention
+SQLALCHEMY_DATABASE_URL = settings.database_url
+
+
+def _configure_sqlite(dbapi_conn, read_only: bool) -> None:
+    """Per-connection PRAGMAs (most SQLite settings don't persist in the file)."""
+    cursor = dbapi_conn.cursor()
+    if not read_only:
+        # WAL allows one writer + multiple readers; it persists in the file, so only writers set it
+        cursor.execute("PRAGMA journal_mode=WAL")
+    # NORMAL is durable across app crashes in WAL mode; only an OS crash can lose the last commits
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute(f"PRAGMA busy_timeout={int(settings.db_busy_timeout_ms)}")
+    cursor.execute(f"PRAGMA mmap_size={int(settings.db_mmap_size)}")
+    cursor.execute(f"PRAGMA cache_size={-int(settings.db_cache_size_kib)}")  # negative = KiB
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    if read_only:
+        cursor.execute("PRAGMA query_only=ON")
+    cursor.close()
+
+
+# Writer: a single pooled connection, so writes queue in the pool instead of spinning on
+# "database is locked". Readers: their own pool of query_only connections; in WAL mode they
+# never wait on the writer (e.g. sync_popular_movies).
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
-    connect_args={"check_same_thread": False, "timeout": 20},
+    connect_args={"check_same_thread": False, "timeout": settings.db_busy_timeout_ms / 1000},
+    pool_size=1,
+    max_overflow=0,
+    pool_timeout=settings.db_write_pool_timeout,
     pool_pre_ping=True,
 )
+read_engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    connect_args={"check_same_thread": False, "timeout": settings.db_busy_timeout_ms / 1000},
+    pool_size=settings.db_read_pool_size,
+    max_overflow=settings.db_read_max_overflow,
+    pool_pre_ping=True,
+)
+event.listen(engine, "connect", lambda dbapi_conn, _record: _configure_sqlite(dbapi_conn, read_only=False))
+event.listen(read_engine, "connect", lambda dbapi_conn, _record: _configure_sqlite(dbapi_conn, read_only=True))
+
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+ReadSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=read_engine)
+
+# Async (aiosqlite) read pool for `async def` endpoints: DB waits don't occupy Starlette's threadpool.
+# Async endpoints still write through the sync writer (swipe writer thread / writer pool).
+async_read_engine = create_async_engine(
+    SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1),
+    connect_args={"timeout": settings.db_busy_timeout_ms / 1000},
+    poolclass=AsyncAdaptedQueuePool,
+    pool_size=settings.db_read_pool_size,
+    max_overflow=settings.db_read_max_overflow,
+    pool_pre_ping=True,
+)
+event.listen(
+    async_read_engine.sync_engine, "connect",
+    lambda dbapi_conn, _record: _configure_sqlite(dbapi_conn, read_only=True),
+)
+AsyncReadSessionLocal = async_sessionmaker(async_read_engine, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
@@ -91,6 +144,12 @@ class Movie(Base):
 
 class Swipe(Base):
     __tablename__ = "swipes"
+    # One swipe per (user, movie); also the index the deck anti-join probes.
+    # (user, direction, movie) covers reading a user's likes in id order (group sessions, bitmap index)
+    __table_args__ = (
+        Index("uq_swipes_user_movie", "user_id", "movie_id", unique=True),
+        Index("ix_swipes_user_direction_movie", "user_id", "direction", "movie_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -112,6 +171,15 @@ class Swipe(Base):
 
 class Match(Base):
     __tablename__ = "matches"
+    # user1_id < user2_id; makes match creation idempotent (INSERT ... ON CONFLICT DO NOTHING)
+    # Per-side indexes serve the matches feed (user and id > since), partial ones the unread count
+    __table_args__ = (
+        Index("uq_matches_users_movie", "user1_id", "user2_id", "movie_id", unique=True),
+        Index("ix_matches_user1_id", "user1_id"),
+        Index("ix_matches_user2_id", "user2_id"),
+        Index("ix_matches_user1_unread", "user1_id", sqlite_where=text("notified_user1 IS NOT 1")),
+        Index("ix_matches_user2_unread", "user2_id", sqlite_where=text("notified_user2 IS NOT 1")),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user1_id = Column(Integer, ForeignKey("users.id"), nullable=False)
@@ -138,6 +206,11 @@ class StreamingService(Base):
 
 class MovieStreamingService(Base):
     __tablename__ = "movie_streaming_services"
+    __table_args__ = (
+        Index("ix_movie_streaming_services_movie_service", "movie_id", "streaming_service_id"),
+        # Service filters: service -> movies in id order
+        Index("ix_movie_streaming_services_service_movie", "streaming_service_id", "movie_id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     movie_id = Column(Integer, ForeignKey("movies.id"), nullable=False)
@@ -147,6 +220,23 @@ class MovieStreamingService(Base):
     streaming_service = relationship("StreamingService", back_populates="movies")
 
 
+class Genre(Base):
+    __tablename__ = "genres"
+
+    id = Column(Integer, primary_key=True, index=True)
+    name = Column(String, unique=True, nullable=False)
+    tmdb_id = Column(Integer, index=True, nullable=True)  # TMDB genre id (None for genres we named ourselves)
+
+
+class MovieGenre(Base):
+    """Movie <-> genre link; the primary key serves movie -> genres, the index genre filters."""
+    __tablename__ = "movie_genres"
+    __table_args__ = (Index("ix_movie_genres_genre_movie", "genre_id", "movie_id"),)
+
+    movie_id = Column(Integer, ForeignKey("movies.id"), primary_key=True)
+    genre_id = Column(Integer, ForeignKey("genres.id"), primary_key=True)
+
+
 class WatchSession(Base):
     __tablename__ = "watch_sessions"
 
@@ -159,30 +249,185 @@ class WatchSession(Base):
     user2 = relationship("User", foreign_keys=[user2_id], back_populates="watch_sessions_as_user2")
 
 
+class GroupSession(Base):
+    """A watch session of several friends (WatchSession is pairwise); members in group_session_members."""
+    __tablename__ = "group_sessions"
+
+    id = Column(Integer, primary_key=True, index=True)
+    created_by = Column(Integer, ForeignKey("users.id"), nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class GroupSessionMember(Base):
+    """Session -> members on the primary key, user -> sessions on the index."""
+    __tablename__ = "group_session_members"
+    __table_args__ = (Index("ix_group_session_members_user_session", "user_id", "session_id"),)
+
+    session_id = Column(Integer, ForeignKey("group_sessions.id"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+
+
+class UserDeck(Base):
+    """Marks a user whose swipe deck has been materialized into deck_entries."""
+    __tablename__ = "user_decks"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    built_at = Column(DateTime, default=datetime.utcnow)
+    # Some deck_entries.score moved since rank_score was frozen; the next ranked pass re-freezes
+    scores_changed = Column(Boolean, nullable=False, default=False, server_default="0")
+
+
+class DeckEntry(Base):
+    """
+    One candidate (not yet swiped) movie in a user's deck; (user_id, movie_id) order is deck order,
+    or (rank_score desc, movie_id) when decks are ranked by the recommender.
+    """
+    __tablename__ = "deck_entries"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    movie_id = Column(Integer, ForeignKey("movies.id"), primary_key=True)
+    score = Column(Integer, nullable=False, default=0, server_default="0")  # similarity points (deck.py)
+    rank_score = Column(Integer, nullable=False, default=0, server_default="0")  # score frozen for a ranked pass
+
+
+Index("ix_deck_entries_user_rank", DeckEntry.user_id, DeckEntry.rank_score.desc(), DeckEntry.movie_id)
+
+
+class MovieNeighbor(Base):
+    """Top-K most similar movies of a movie (recommender.py), score in similarity points."""
+    __tablename__ = "movie_neighbors"
+
+    movie_id = Column(Integer, ForeignKey("movies.id"), primary_key=True)
+    neighbor_id = Column(Integer, ForeignKey("movies.id"), primary_key=True)
+    score = Column(Integer, nullable=False)
+
+
+class NotificationEvent(Base):
+    """Durable per-user outbox entry; the id is the sequence number clients acknowledge."""
+    __tablename__ = "notification_events"
+    __table_args__ = (
+        Index("ix_notification_events_user_id_id", "user_id", "id"),
+        Index("ix_notification_events_match_id", "match_id"),
+        {"sqlite_autoincrement": True},  # acked rows are deleted; seqs must never be reused
+    )
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    type = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON object sent to the client (plus "type" and "seq")
+    match_id = Column(Integer, ForeignKey("matches.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+
+class NotificationCursor(Base):
+    """Highest notification sequence number the user has acknowledged."""
+    __tablename__ = "notification_cursors"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    acked_seq = Column(Integer, nullable=False, default=0)
+
+
+# Full-text index over the catalog (search.py). External content: the text lives only in movies,
+# triggers keep the index in step with every insert, update and delete.
+MOVIES_FTS_DDL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS movies_fts USING fts5("
+    "title, original_title, description, content='movies', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    "CREATE TRIGGER IF NOT EXISTS movies_fts_ai AFTER INSERT ON movies BEGIN "
+    "INSERT INTO movies_fts (rowid, title, original_title, description) "
+    "VALUES (new.id, new.title, new.original_title, new.description); END",
+    "CREATE TRIGGER IF NOT EXISTS movies_fts_ad AFTER DELETE ON movies BEGIN "
+    "INSERT INTO movies_fts (movies_fts, rowid, title, original_title, description) "
+    "VALUES ('delete', old.id, old.title, old.original_title, old.description); END",
+    "CREATE TRIGGER IF NOT EXISTS movies_fts_au AFTER UPDATE OF title, original_title, description ON movies BEGIN "
+    "INSERT INTO movies_fts (movies_fts, rowid, title, original_title, description) "
+    "VALUES ('delete', old.id, old.title, old.original_title, old.description); "
+    "INSERT INTO movies_fts (rowid, title, original_title, description) "
+    "VALUES (new.id, new.title, new.original_title, new.description); END",
+]
+
+
 # Create all tables and add new columns to existing tables (migration)
 def init_db():
     Base.metadata.create_all(bind=engine)
-    # Enable WAL for better concurrent read/write (avoids "database is locked")
-    with engine.connect() as conn:
-        conn.execute(text("PRAGMA journal_mode=WAL"))
-        conn.commit()
-    # Add new Movie columns if they don't exist (for existing DBs)
+    # Add new columns if they don't exist (for existing DBs)
     with engine.connect() as conn:
         for _name, sql in [
             ("tmdb_id", "ALTER TABLE movies ADD COLUMN tmdb_id INTEGER"),
             ("original_title", "ALTER TABLE movies ADD COLUMN original_title VARCHAR"),
+            ("deck_entries.score", "ALTER TABLE deck_entries ADD COLUMN score INTEGER NOT NULL DEFAULT 0"),
+            ("deck_entries.rank_score", "ALTER TABLE deck_entries ADD COLUMN rank_score INTEGER NOT NULL DEFAULT 0"),
+            ("user_decks.scores_changed", "ALTER TABLE user_decks ADD COLUMN scores_changed BOOLEAN NOT NULL DEFAULT 1"),
+        ]:
+            try:
+                conn.execute(text(sql))
+                conn.commit()
+            except Exception:
+                conn.rollback()
+    # Indexes declared on the models only get created with new tables; add them to existing DBs.
+    # The unique swipe/match indexes fail (and are skipped) if an old DB already holds duplicates.
+    with engine.connect() as conn:
+        for sql in [
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_swipes_user_movie ON swipes (user_id, movie_id)",
+            "CREATE INDEX IF NOT EXISTS ix_swipes_user_direction_movie ON swipes (user_id, direction, movie_id)",
+            "CREATE INDEX IF NOT EXISTS ix_movie_streaming_services_movie_service "
+            "ON movie_streaming_services (movie_id, streaming_service_id)",
+            "CREATE INDEX IF NOT EXISTS ix_movie_streaming_services_service_movie "
+            "ON movie_streaming_services (streaming_service_id, movie_id)",
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_matches_users_movie ON matches (user1_id, user2_id, movie_id)",
+            "CREATE INDEX IF NOT EXISTS ix_matches_user1_id ON matches (user1_id)",
+            "CREATE INDEX IF NOT EXISTS ix_matches_user2_id ON matches (user2_id)",
+            "CREATE INDEX IF NOT EXISTS ix_matches_user1_unread ON matches (user1_id) WHERE notified_user1 IS NOT 1",
+            "CREATE INDEX IF NOT EXISTS ix_matches_user2_unread ON matches (user2_id) WHERE notified_user2 IS NOT 1",
+            "DROP INDEX IF EXISTS ix_deck_entries_user_score",  # ranked reads moved to rank_score
+            "CREATE INDEX IF NOT EXISTS ix_deck_entries_user_rank ON deck_entries (user_id, rank_score DESC, movie_id)",
         ]:
             try:
                 conn.execute(text(sql))
                 conn.commit()
             except Exception:
                 conn.rollback()
+    # Genres of movies from before the genre tables: link each movie to its free-text Movie.genre
+    with engine.connect() as conn:
+        if not conn.execute(text("SELECT 1 FROM movie_genres LIMIT 1")).first():
+            conn.execute(text(
+                "INSERT OR IGNORE INTO genres (name) "
+                "SELECT DISTINCT genre FROM movies WHERE genre IS NOT NULL AND genre NOT IN ('', 'Unknown')"
+            ))
+            conn.execute(text(
+                "INSERT OR IGNORE INTO movie_genres (movie_id, genre_id) "
+                "SELECT movies.id, genres.id FROM movies JOIN genres ON genres.name = movies.genre"
+            ))
+            conn.commit()
+    # Full-text index: created once, then filled from the existing catalog (later rows arrive via triggers)
+    with engine.connect() as conn:
+        exists = conn.execute(text("SELECT 1 FROM sqlite_master WHERE name = 'movies_fts'")).first()
+        for sql in MOVIES_FTS_DDL:
+            conn.execute(text(sql))
+        if not exists:
+            conn.execute(text("INSERT INTO movies_fts (movies_fts) VALUES ('rebuild')"))
+        conn.commit()
 
 
-# Dependency to get DB session
+# Dependency to get DB session (writer)
 def get_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
+
+
+# Dependency to get a read-only DB session for GET endpoints
+def get_read_db():
+    db = ReadSessionLocal()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+# Dependency to get a read-only AsyncSession for async endpoints
+async def get_async_read_db():
+    async with AsyncReadSessionLocal() as db:
+        yield db
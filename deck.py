@@ -0,0 +1,192 @@
+"""Materialized per-user swipe decks: candidate movie ids built once, popped on swipe, topped up on sync.
+
+Ranked decks: each entry's score is the sum of the similarity points (movie_neighbors, built by
+recommender.py) it gets from movies the user swiped right on. Scores are kept up to date
+incrementally as right swipes come in, and rebuilt per user with rescore_decks.
+
+Ranked pages are read and paged by rank_score, a copy of score frozen when a pass over the deck
+starts (a page without a cursor). A like raises its neighbors' score, not their place in the pass
+being read, so the keyset cursor never jumps over them; they move up in the next pass.
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import select, exists, literal, delete, update, func, or_, and_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from catalog import movie_filters
+from database import SessionLocal, Movie, Swipe, SwipeDirection, DeckEntry, UserDeck, MovieNeighbor
+
+SCORE_SCALE = 1000  # similarity points per unit of cosine similarity
+MAX_SCORE = 2 ** 20 - 1  # deck scores saturate here, so ranked cursors stay below 2^53 (safe JS integers)
+_CURSOR_SHIFT = 32
+
+
+def deck_cursor(score: int, movie_id: int) -> int:
+    """Keyset cursor of a ranked deck position, as one integer (score in the high bits)."""
+    return (score << _CURSOR_SHIFT) | movie_id
+
+
+def split_deck_cursor(cursor: int) -> tuple[int, int]:
+    """(score, movie_id) of a ranked deck cursor."""
+    return cursor >> _CURSOR_SHIFT, cursor & ((1 << _CURSOR_SHIFT) - 1)
+
+
+def ensure_deck(db: Session, user_id: int) -> None:
+    """
+    Build the user's deck (all movies they haven't swiped) if it doesn't exist yet.
+    `db` may be a read-only session: the build runs in its own writer session.
+    """
+    if db.get(UserDeck, user_id):
+        return
+    candidates = select(literal(user_id), Movie.id).where(
+        ~exists().where(Swipe.user_id == user_id, Swipe.movie_id == Movie.id)
+    )
+    with SessionLocal() as write_db:
+        write_db.execute(
+            insert(DeckEntry).from_select(["user_id", "movie_id"], candidates).on_conflict_do_nothing()
+        )
+        write_db.execute(insert(UserDeck).values(user_id=user_id).on_conflict_do_nothing())
+        rescore_decks(write_db, [user_id])
+        write_db.commit()
+
+
+def pop_cards(db: Session, user_id: int, movie_ids: Iterable[int]) -> None:
+    """Remove swiped movies from the user's deck. Does not commit: runs inside the swipes' transaction."""
+    movie_ids = list(movie_ids)
+    if movie_ids:
+        db.execute(delete(DeckEntry).where(DeckEntry.user_id == user_id, DeckEntry.movie_id.in_(movie_ids)))
+
+
+def _apply_scores(db: Session, points) -> None:
+    """Add a (user_id, neighbor_id, points) subquery onto the matching deck entries."""
+    db.execute(
+        update(DeckEntry)
+        .where(DeckEntry.user_id == points.c.user_id, DeckEntry.movie_id == points.c.neighbor_id)
+        .values(score=func.min(DeckEntry.score + points.c.points, MAX_SCORE))
+    )
+
+
+def _like_points(swipe_filter):
+    """Similarity points per (user, neighbor movie) from the right swipes matching swipe_filter."""
+    return (
+        select(Swipe.user_id, MovieNeighbor.neighbor_id, func.sum(MovieNeighbor.score).label("points"))
+        .join(MovieNeighbor, MovieNeighbor.movie_id == Swipe.movie_id)
+        .where(swipe_filter, Swipe.direction == SwipeDirection.RIGHT)
+        .group_by(Swipe.user_id, MovieNeighbor.neighbor_id)
+        .subquery()
+    )
+
+
+def add_swipe_scores(db: Session, swipe_ids: Iterable[int]) -> None:
+    """Raise deck scores of the neighbors of newly liked movies (left swipes are ignored). Does not commit."""
+    swipe_ids = list(swipe_ids)
+    if swipe_ids:
+        _apply_scores(db, _like_points(Swipe.id.in_(swipe_ids)))
+        db.execute(
+            update(UserDeck)
+            .where(UserDeck.user_id.in_(select(Swipe.user_id).where(Swipe.id.in_(swipe_ids))))
+            .values(scores_changed=True)
+        )
+
+
+def rescore_decks(db: Session, user_ids: Iterable[int]) -> None:
+    """Recompute the users' deck scores from all their right swipes (after movie_neighbors changed). Does not commit."""
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    db.execute(update(DeckEntry).where(DeckEntry.user_id.in_(user_ids), DeckEntry.score != 0).values(score=0))
+    _apply_scores(db, _like_points(Swipe.user_id.in_(user_ids)))
+    db.execute(update(UserDeck).where(UserDeck.user_id.in_(user_ids)).values(scores_changed=True))
+
+
+def start_ranked_pass(db: Session, user_id: int) -> None:
+    """
+    Freeze the user's current deck scores as the order of a new ranked pass, if any moved since the last one.
+    `db` may be a read-only session: the copy runs in its own writer session.
+    """
+    if not db.execute(select(UserDeck.scores_changed).where(UserDeck.user_id == user_id)).scalar():
+        return
+    with SessionLocal() as write_db:
+        write_db.execute(
+            update(DeckEntry)
+            .where(DeckEntry.user_id == user_id, DeckEntry.rank_score != DeckEntry.score)
+            .values(rank_score=DeckEntry.score)
+        )
+        write_db.execute(update(UserDeck).where(UserDeck.user_id == user_id).values(scores_changed=False))
+        write_db.commit()
+
+
+def add_movies_to_decks(db: Session, movie_ids: Iterable[int]) -> None:
+    """Append newly added catalog movies to every materialized deck (skipping ones already swiped). Commits."""
+    movie_ids = list(movie_ids)
+    if not movie_ids:
+        return
+    candidates = (
+        select(UserDeck.user_id, Movie.id)
+        .join(Movie, Movie.id.in_(movie_ids))
+        .where(~exists().where(Swipe.user_id == UserDeck.user_id, Swipe.movie_id == Movie.id))
+    )
+    db.execute(
+        insert(DeckEntry).from_select(["user_id", "movie_id"], candidates).on_conflict_do_nothing()
+    )
+    db.commit()
+
+
+def deck_entries_stmt(
+    user_id: int,
+    after: Optional[int] = None,
+    limit: int = 20,
+    service_names: Optional[list[str]] = None,
+    genre_names: Optional[list[str]] = None,
+):
+    """Range read of the user's deck on the deck_entries primary key, starting after the cursor."""
+    stmt = select(DeckEntry.movie_id).where(DeckEntry.user_id == user_id)
+    if after is not None:
+        stmt = stmt.where(DeckEntry.movie_id > after)
+    stmt = stmt.where(*movie_filters(DeckEntry.movie_id, service_names, genre_names))
+    return stmt.order_by(DeckEntry.movie_id).limit(limit)
+
+
+def ranked_deck_entries_stmt(
+    user_id: int,
+    after: Optional[int] = None,
+    limit: int = 20,
+    service_names: Optional[list[str]] = None,
+    genre_names: Optional[list[str]] = None,
+):
+    """Range read of the user's deck on ix_deck_entries_user_rank (best first), starting after the ranked cursor."""
+    stmt = select(DeckEntry.movie_id, DeckEntry.rank_score).where(DeckEntry.user_id == user_id)
+    if after is not None:
+        score, movie_id = split_deck_cursor(after)
+        stmt = stmt.where(or_(
+            DeckEntry.rank_score < score, and_(DeckEntry.rank_score == score, DeckEntry.movie_id > movie_id)
+        ))
+    stmt = stmt.where(*movie_filters(DeckEntry.movie_id, service_names, genre_names))
+    return stmt.order_by(DeckEntry.rank_score.desc(), DeckEntry.movie_id).limit(limit)
+
+
+def get_user_deck_ids(
+    db: Session,
+    user_id: int,
+    after: Optional[int] = None,
+    limit: int = 20,
+    service_names: Optional[list[str]] = None,
+    genre_names: Optional[list[str]] = None,
+    ranked: bool = False,
+) -> tuple[list[int], Optional[int]]:
+    """
+    One page of the user's materialized deck as (movie ids, next_cursor), building the deck on first use.
+    Ranked pages are ordered by the pass's frozen scores and use deck_cursor() cursors; a page
+    without a cursor starts a new pass.
+    """
+    ensure_deck(db, user_id)
+    if ranked and after is None:
+        start_ranked_pass(db, user_id)
+    if not ranked:
+        movie_ids = list(db.execute(deck_entries_stmt(user_id, after, limit, service_names, genre_names)).scalars())
+        next_cursor = movie_ids[-1] if len(movie_ids) == limit else None
+        return movie_ids, next_cursor
+    rows = db.execute(ranked_deck_entries_stmt(user_id, after, limit, service_names, genre_names)).all()
+    next_cursor = deck_cursor(rows[-1].rank_score, rows[-1].movie_id) if len(rows) == limit else None
+    return [row.movie_id for row in rows], next_cursor
@@ -0,0 +1,64 @@
+"""In-memory friend graph: user id -> set of friend ids.
+
+A user's friend set is loaded from the DB the first time it is asked for and kept current by
+accept_friend_request (friendship_added, which reaches every worker over the notify bus), so
+are_friends, the friends list and watch sessions don't re-query friendships. Match detection
+doesn't use it: a missed update there would lose a match for good, so it joins friendships in SQL.
+"""
+import threading
+
+from sqlalchemy import select, or_
+from sqlalchemy.orm import Session
+
+from database import Friendship
+from notify_bus import bus
+
+
+class FriendGraph:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._friends: dict[int, frozenset[int]] = {}
+        self._generation = 0  # bumped on every change, so a load that raced a change isn't cached
+
+    def friends_of(self, db: Session, user_id: int) -> frozenset[int]:
+        with self._lock:
+            friends = self._friends.get(user_id)
+            generation = self._generation
+        if friends is not None:
+            return friends
+        rows = db.execute(
+            select(Friendship.user1_id, Friendship.user2_id)
+            .where(or_(Friendship.user1_id == user_id, Friendship.user2_id == user_id))
+        ).all()
+        friends = frozenset(user2_id if user1_id == user_id else user1_id for user1_id, user2_id in rows)
+        with self._lock:
+            if generation == self._generation:
+                self._friends[user_id] = friends
+        return friends
+
+    def are_friends(self, db: Session, user1_id: int, user2_id: int) -> bool:
+        return user2_id in self.friends_of(db, user1_id)
+
+    def add_friendship(self, user1_id: int, user2_id: int) -> None:
+        """Record a committed friendship (users not loaded yet will pick it up from the DB)."""
+        with self._lock:
+            self._generation += 1
+            for user_id, friend_id in ((user1_id, user2_id), (user2_id, user1_id)):
+                friends = self._friends.get(user_id)
+                if friends is not None:
+                    self._friends[user_id] = friends | {friend_id}
+
+    def clear(self) -> None:
+        with self._lock:
+            self._generation += 1
+            self._friends.clear()
+
+
+FRIENDSHIP_CHANNEL = "friendship"
+friend_graph = FriendGraph()
+bus.subscribe(FRIENDSHIP_CHANNEL, lambda event: friend_graph.add_friendship(event["user1_id"], event["user2_id"]))
+
+
+def friendship_added(user1_id: int, user2_id: int) -> None:
+    """Update the friend graph of every worker after a friendship is committed."""
+    bus.publish(FRIENDSHIP_CHANNEL, {"user1_id": user1_id, "user2_id": user2_id})
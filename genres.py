@@ -0,0 +1,50 @@
+"""Normalized genres: the genres / movie_genres tables, filled from TMDB during sync.
+
+TMDB list results (popular, search) only carry genre_ids; names come from movie details when we
+have them, otherwise from TMDB's genre list (cached). Genres are keyed by name, so TMDB genres and
+the ones seeded from Movie.genre share rows.
+"""
+from typing import Iterable, Optional
+
+from sqlalchemy import select, delete, func
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from database import Genre, MovieGenre
+from tmdb_cache import get_genres
+
+
+def tmdb_genres(data: Optional[dict]) -> list[tuple[int, str]]:
+    """(TMDB genre id, name) of a TMDB movie: details carry genres, list results genre_ids."""
+    if not data:
+        return []
+    if data.get("genres"):
+        return [(genre["id"], genre["name"]) for genre in data["genres"] if genre.get("id") and genre.get("name")]
+    genre_ids = data.get("genre_ids") or []
+    if not genre_ids:
+        return []
+    names = {genre["id"]: genre["name"] for genre in get_genres() if genre.get("id") and genre.get("name")}
+    return [(genre_id, names[genre_id]) for genre_id in genre_ids if genre_id in names]
+
+
+def upsert_genres(db: Session, genres: Iterable[tuple[Optional[int], str]]) -> dict[str, int]:
+    """Make sure every (TMDB id, name) genre exists; returns {name: Genre.id}. Does not commit."""
+    rows = {name: tmdb_id for tmdb_id, name in genres}
+    if not rows:
+        return {}
+    stmt = insert(Genre)
+    db.execute(
+        stmt.on_conflict_do_update(
+            index_elements=["name"], set_={"tmdb_id": func.coalesce(Genre.tmdb_id, stmt.excluded.tmdb_id)}
+        ),
+        [{"name": name, "tmdb_id": tmdb_id} for name, tmdb_id in rows.items()],
+    )
+    return {name: genre_id for name, genre_id in db.execute(select(Genre.name, Genre.id).where(Genre.name.in_(list(rows))))}
+
+
+def set_movie_genres(db: Session, movie_id: int, genre_ids: Iterable[int]) -> None:
+    """Replace a movie's genre links. Does not commit."""
+    db.execute(delete(MovieGenre).where(MovieGenre.movie_id == movie_id))
+    links = [{"movie_id": movie_id, "genre_id": genre_id} for genre_id in dict.fromkeys(genre_ids)]
+    if links:
+        db.execute(insert(MovieGenre).on_conflict_do_nothing(), links)
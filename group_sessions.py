@@ -0,0 +1,89 @@
+"""Group watch sessions: N friends, and the movies every member swiped right on.
+
+The common likes are an intersection of per-user liked sets, never a join of `swipes` with itself
+once per member. With the bitmap index they are an AND of cached liked bitsets, smallest first;
+without it one INTERSECT of the members' likes, each a range read on ix_swipes_user_direction_movie.
+Results are ranked by shared streaming availability: movies on more of the services first.
+"""
+from datetime import datetime
+from typing import Iterable, Optional
+
+from sqlalchemy import select, insert, func, intersect
+from sqlalchemy.orm import Session
+
+from config import settings
+from bitmap_index import movie_index
+from database import (
+    Swipe, SwipeDirection, User, StreamingService, MovieStreamingService, GroupSession, GroupSessionMember,
+)
+
+RANK_CHUNK = 5000  # movie ids per availability query (SQLite bound parameter limit)
+
+
+def create_group_session(db: Session, created_by: int, member_ids: Iterable[int]) -> tuple[int, datetime]:
+    """Insert a session with its members (the creator included); returns its (id, created_at). Does not commit."""
+    session_id, created_at = db.execute(
+        insert(GroupSession).values(created_by=created_by).returning(GroupSession.id, GroupSession.created_at)
+    ).one()
+    db.execute(insert(GroupSessionMember), [
+        {"session_id": session_id, "user_id": user_id} for user_id in dict.fromkeys([created_by, *member_ids])
+    ])
+    return session_id, created_at
+
+
+def session_members(db: Session, session_ids: Iterable[int]) -> dict[int, list[User]]:
+    """session id -> member users, in one query."""
+    members: dict[int, list[User]] = {}
+    rows = db.execute(
+        select(GroupSessionMember.session_id, User)
+        .join(User, User.id == GroupSessionMember.user_id)
+        .where(GroupSessionMember.session_id.in_(list(session_ids)))
+        .order_by(GroupSessionMember.session_id, User.id)
+    ).all()
+    for session_id, user in rows:
+        members.setdefault(session_id, []).append(user)
+    return members
+
+
+def user_session_ids(db: Session, user_id: int) -> list[int]:
+    """Ids of the sessions the user is a member of, newest first."""
+    return list(db.execute(
+        select(GroupSessionMember.session_id)
+        .where(GroupSessionMember.user_id == user_id)
+        .order_by(GroupSessionMember.session_id.desc())
+    ).scalars())
+
+
+def _common_likes(db: Session, user_ids: Iterable[int]) -> list[int]:
+    return list(db.execute(intersect(*[
+        select(Swipe.movie_id).where(Swipe.user_id == user_id, Swipe.direction == SwipeDirection.RIGHT)
+        for user_id in set(user_ids)
+    ])).scalars())
+
+
+def _rank_by_services(db: Session, movie_ids: list[int], service_names: Optional[list[str]]) -> list[int]:
+    shared = dict.fromkeys(movie_ids, 0)
+    for start in range(0, len(movie_ids), RANK_CHUNK):
+        stmt = (
+            select(MovieStreamingService.movie_id, func.count())
+            .where(MovieStreamingService.movie_id.in_(movie_ids[start:start + RANK_CHUNK]))
+            .group_by(MovieStreamingService.movie_id)
+        )
+        if service_names:
+            stmt = stmt.join(
+                StreamingService, StreamingService.id == MovieStreamingService.streaming_service_id
+            ).where(StreamingService.name.in_(service_names))
+        for movie_id, count in db.execute(stmt):
+            shared[movie_id] = count
+    return sorted(shared, key=lambda movie_id: (-shared[movie_id], movie_id))
+
+
+def group_movie_ids(
+    db: Session, user_ids: list[int], service_names: Optional[list[str]] = None, limit: int = 20
+) -> list[int]:
+    """Up to `limit` ids of movies every user swiped right on, on the most (given) streaming services first."""
+    if settings.use_bitmap_index:
+        common = movie_index.common_likes(db, user_ids)
+        return movie_index.rank_by_services(db, common, service_names)[:limit] if common else []
+    common = _common_likes(db, user_ids)
+    return _rank_by_services(db, common, service_names)[:limit] if common else []
@@ -0,0 +1,112 @@
+"""Conditional GET support: per-resource version counters, ETags and 304 Not Modified.
+
+Write paths touch() the resources they change; the versions are bumped when the session commits
+(and forgotten on rollback). Read endpoints derive their ETag from the current version before
+touching the DB, so a matching If-None-Match is answered with 304 from memory, and a response
+read just after a bump is at least as new as its ETag. Versions are per process and restart
+from zero, so the ETag also carries a per-process epoch. Bumps are broadcast on the notify bus so every worker
+invalidates (though a 304 is only possible from the worker that issued the ETag).
+"""
+import os
+import secrets
+import threading
+from typing import Optional
+
+from fastapi import Request, Response
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from notify_bus import bus
+
+# Cache-Control per kind of resource: shared catalog data may be reused briefly,
+# per-user data must be revalidated (cheaply, via ETag) on every use
+PUBLIC_SHORT = "public, max-age=60"
+PRIVATE_REVALIDATE = "private, no-cache"
+REVALIDATE = "no-cache"
+
+
+class ResourceVersions:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._versions: dict[str, int] = {}
+        self.epoch = secrets.token_hex(4)
+
+    def get(self, key: str) -> int:
+        return self._versions.get(key, 0)
+
+    def bump(self, *keys: str, propagate: bool = True) -> None:
+        with self._lock:
+            for key in keys:
+                self._versions[key] = self._versions.get(key, 0) + 1
+        if propagate and keys:
+            bus.publish(VERSIONS_CHANNEL, {"keys": sorted(keys)}, local=False)
+
+    def etag(self, key: str, variant: str = "") -> str:
+        tag = f"{self.epoch}-{self.get(key)}"
+        return f'W/"{tag}-{variant}"' if variant else f'W/"{tag}"'
+
+
+VERSIONS_CHANNEL = "versions"
+versions = ResourceVersions()
+bus.subscribe(VERSIONS_CHANNEL, lambda event: versions.bump(*event["keys"], propagate=False))
+
+
+STREAMING_SERVICES = "streaming_services"
+GENRES = "genres"
+
+
+def movie_key(movie_id: int) -> str:
+    return f"movie:{movie_id}"
+
+
+def friends_key(user_id: int) -> str:
+    return f"friends:{user_id}"
+
+
+def matches_key(user_id: int) -> str:
+    return f"matches:{user_id}"
+
+
+def touch(db: Session, *keys: str) -> None:
+    """Mark resources as changed by this session's transaction; their versions are bumped on commit."""
+    db.info.setdefault("touched_resources", set()).update(keys)
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_touched(session: Session) -> None:
+    keys = session.info.pop("touched_resources", None)
+    if keys:
+        versions.bump(*keys)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_touched(session: Session) -> None:
+    session.info.pop("touched_resources", None)
+
+
+def _opaque(tag: str) -> str:
+    return tag.strip().removeprefix("W/")
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison (W/ prefixes ignored), as RFC 9110 requires for If-None-Match."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return _opaque(etag) in {_opaque(tag) for tag in if_none_match.split(",")}
+
+
+def conditional(request: Request, response: Response, etag: str, cache_control: str) -> Optional[Response]:
+    """304 response if the client's If-None-Match matches `etag`; otherwise set the caching headers and return None."""
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def file_etag(path: str) -> str:
+    """ETag for a static file from its mtime and size."""
+    stat = os.stat(path)
+    return f'W/"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
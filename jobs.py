@@ -0,0 +1,143 @@
+"""In-process background queue for catalog loading (TMDB popular pages).
+
+One worker thread (SQLite has a single writer anyway) drains a FIFO of page jobs.
+Submitting a page that is already queued or running returns the existing job, and each
+submission also queues the next few pages so decks are topped up ahead of demand.
+
+A job runs in the worker process that queued it, but every change of its status is published
+on the notify bus, so GET /api/jobs/{id} answers from any worker (within a bus poll interval).
+"""
+import queue
+import threading
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from datetime import datetime
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal
+from notify_bus import bus
+from tmdb_sync import sync_popular_movies
+
+JOBS_CHANNEL = "catalog_job"
+
+
+@dataclass
+class Job:
+    id: str
+    page: int
+    status: str = "queued"  # queued, running, done, failed
+    added: int = 0
+    error: Optional[str] = None
+    created_at: datetime = field(default_factory=datetime.utcnow)
+    finished_at: Optional[datetime] = None
+
+
+class CatalogJobQueue:
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        sync_page: Callable[[Session, int], int],
+        prefetch_pages: int = 2,
+        max_jobs: int = 1000,
+    ):
+        self._session_factory = session_factory
+        self._sync_page = sync_page
+        self._prefetch_pages = prefetch_pages
+        self._max_jobs = max_jobs
+        self._lock = threading.Lock()
+        self._jobs: OrderedDict[str, Job] = OrderedDict()
+        self._active: dict[int, Job] = {}  # page -> queued/running job
+        self._queue: queue.Queue[Optional[Job]] = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+
+    def _start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="catalog-jobs", daemon=True)
+            self._thread.start()
+
+    def _remember(self, job: Job) -> None:
+        """Caller holds the lock."""
+        self._jobs[job.id] = job
+        while len(self._jobs) > self._max_jobs:
+            self._jobs.popitem(last=False)
+
+    def _enqueue(self, page: int) -> Job:
+        """Caller holds the lock."""
+        job = self._active.get(page)
+        if job:
+            return job
+        job = Job(id=uuid.uuid4().hex, page=page)
+        self._remember(job)
+        self._active[page] = job
+        self._queue.put(job)
+        job_changed(job)
+        return job
+
+    def submit(self, page: int) -> Job:
+        """Queue a page (deduped against queued/running jobs) plus the next prefetch_pages pages."""
+        with self._lock:
+            self._start()
+            job = self._enqueue(page)
+            for ahead in range(page + 1, page + 1 + self._prefetch_pages):
+                self._enqueue(ahead)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def record(self, job: Job) -> None:
+        """Store the status of a job another worker runs."""
+        with self._lock:
+            self._remember(job)
+
+    def stop(self) -> None:
+        if self._thread and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+    def _run(self) -> None:
+        while True:
+            job = self._queue.get()
+            if job is None:
+                return
+            job.status = "running"
+            job_changed(job)
+            db = self._session_factory()
+            try:
+                job.added = self._sync_page(db, job.page)
+                job.status = "done"
+            except Exception as e:
+                job.error = str(e) or type(e).__name__
+                job.status = "failed"
+            finally:
+                db.close()
+                job.finished_at = datetime.utcnow()
+                with self._lock:
+                    self._active.pop(job.page, None)
+                job_changed(job)
+
+
+def job_changed(job: Job) -> None:
+    """Publish a job's status to the other workers (this one holds the Job itself)."""
+    bus.publish(JOBS_CHANNEL, {
+        **asdict(job),
+        "created_at": job.created_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+    }, local=False)
+
+
+def job_from_event(event: dict) -> Job:
+    return Job(**{
+        **event,
+        "created_at": datetime.fromisoformat(event["created_at"]),
+        "finished_at": datetime.fromisoformat(event["finished_at"]) if event["finished_at"] else None,
+    })
+
+
+catalog_jobs = CatalogJobQueue(SessionLocal, sync_popular_movies, prefetch_pages=settings.catalog_prefetch_pages)
+bus.subscribe(JOBS_CHANNEL, lambda event: catalog_jobs.record(job_from_event(event)))
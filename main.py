@@ -1,26 +1,48 @@
-from fastapi import FastAPI, Depends, HTTPException, status, Query, WebSocket, WebSocketDisconnect, Request
+from fastapi import FastAPI, Depends, HTTPException, status, Query, WebSocket, Request, Response
 from fastapi.staticfiles import StaticFiles
 from fastapi.responses import HTMLResponse, JSONResponse
 import asyncio
 import json
-from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import and_, or_, case, select, update
 from typing import List, Optional
 import secrets
 import string
 from datetime import datetime
 
 from database import (
-    get_db, init_db, User, Movie, Swipe, Match, FriendRequest,
-    Friendship, StreamingService, MovieStreamingService, WatchSession,
+    get_db, get_read_db, get_async_read_db, async_read_engine, AsyncReadSessionLocal, SessionLocal, init_db, User, Movie, Swipe, Match, FriendRequest,
+    Friendship, StreamingService, Genre, WatchSession, GroupSession, GroupSessionMember,
     SwipeDirection
 )
-from tmdb_sync import sync_movie_from_tmdb, sync_movie_by_title, sync_popular_movies
+from tmdb_sync import sync_movie_from_tmdb, sync_movie_by_title
+from catalog import get_deck_ids, get_match_feed_async, movie_filters
+from deck import get_user_deck_ids
+from search import search_movie_ids
+from group_sessions import create_group_session, session_members, user_session_ids, group_movie_ids
+from bitmap_index import movie_index
+from friend_graph import friend_graph, friendship_added
+from user_cache import user_cache, user_created
+from notify_bus import bus
+from realtime import connection_manager
+from card_cache import card_cache, JSONBytesResponse, json_array, deck_body
+from http_cache import (
+    versions, conditional, touch, file_etag, movie_key, friends_key, matches_key, STREAMING_SERVICES, GENRES,
+    PUBLIC_SHORT, PRIVATE_REVALIDATE, REVALIDATE
+)
+from config import settings
+from tmdb_cache import cache as tmdb_cache
+from jobs import catalog_jobs
+from outbox import NOTIFICATION_CHANNEL, REPLAY_PAGE_SIZE, events_after, acked_seq, ack
+from swipes import record_swipes
+from swipe_writer import swipe_writer, publish_committed
 from models import (
     UserCreate, UserResponse, FriendRequestCreate, FriendRequestResponse,
     FriendshipResponse, MovieResponse, SwipeCreate, SwipeResponse,
-    MatchResponse, WatchSessionCreate, WatchSessionResponse, MovieFilter,
-    StreamingServiceResponse
+    MatchResponse, WatchSessionCreate, WatchSessionResponse, GroupSessionCreate, GroupSessionResponse, MovieFilter,
+    StreamingServiceResponse, GenreResponse, DeckResponse, JobResponse, SwipeBatchCreate, SwipeBatchItemResult
 )
 
 app = FastAPI(title="Movie Tinder API", version="1.0.0")
@@ -33,49 +55,28 @@ app.mount("/static", StaticFiles(directory="static"), name="static")
 
 
 @app.on_event("startup")
-async def store_event_loop():
+async def start_notifications():
     app.state.loop = asyncio.get_running_loop()
+    bus.start()
 
 
-# WebSocket connection manager for real-time notifications
-class ConnectionManager:
-    def __init__(self):
-        self._connections: dict[str, WebSocket] = {}
-
-    async def connect(self, websocket: WebSocket, username: str) -> None:
-        await websocket.accept()
-        self._connections[username] = websocket
-
-    def disconnect(self, username: str) -> None:
-        self._connections.pop(username, None)
-
-    async def send_personal(self, username: str, message: dict) -> None:
-        ws = self._connections.get(username)
-        if ws:
-            try:
-                await ws.send_text(json.dumps(message))
-            except Exception:
-                self.disconnect(username)
+@app.on_event("shutdown")
+async def stop_background_jobs():
+    await run_in_threadpool(catalog_jobs.stop)
+    await run_in_threadpool(swipe_writer.stop)
+    await run_in_threadpool(bus.stop)
+    await connection_manager.close_all()
+    await async_read_engine.dispose()
 
 
-connection_manager = ConnectionManager()
+def deliver_notification(event: dict) -> None:
+    """Bus handler (any thread): send an outbox event to this worker's sockets of the user, on its event loop."""
+    loop = getattr(app.state, "loop", None)
+    if loop:
+        loop.call_soon_threadsafe(connection_manager.send_personal, event["username"], event["message"])
 
 
-async def notify_new_match(
-    user1_username: str,
-    user2_username: str,
-    match_id: int,
-    movie_title: str,
-) -> None:
-    """Send new_match notification to both users (each sees the other as friend)."""
-    await connection_manager.send_personal(
-        user1_username,
-        {"type": "new_match", "match_id": match_id, "movie_title": movie_title, "friend_username": user2_username},
-    )
-    await connection_manager.send_personal(
-        user2_username,
-        {"type": "new_match", "match_id": match_id, "movie_title": movie_title, "friend_username": user1_username},
-    )
+bus.subscribe(NOTIFICATION_CHANNEL, deliver_notification)
 
 
 # Helper function to generate invite code
@@ -94,15 +95,23 @@ def get_user_by_invite_code(db: Session, invite_code: str):
     return db.query(User).filter(User.invite_code == invite_code).first()
 
 
+# Helper function to parse the JSON-encoded streaming_services filter (bad input means no filter)
+def parse_name_filter(names: Optional[str]) -> Optional[list[str]]:
+    """A JSON list of names from a query parameter (streaming_services, genres); None if absent or empty."""
+    if not names:
+        return None
+    try:
+        names_list = json.loads(names)
+    except ValueError:
+        return None
+    if isinstance(names_list, list) and len(names_list) > 0:
+        return names_list
+    return None
+
+
 # Helper function to check if users are friends
 def are_friends(db: Session, user1_id: int, user2_id: int) -> bool:
-    friendship = db.query(Friendship).filter(
-        or_(
-            and_(Friendship.user1_id == user1_id, Friendship.user2_id == user2_id),
-            and_(Friendship.user1_id == user2_id, Friendship.user2_id == user1_id)
-        )
-    ).first()
-    return friendship is not None
+    return friend_graph.are_friends(db, user1_id, user2_id)
 
 
 # USER ENDPOINTS
@@ -121,11 +130,12 @@ def create_user(user: UserCreate, db: Session = Depends(get_db)):
     db.add(db_user)
     db.commit()
     db.refresh(db_user)
+    user_created(user.username)
     return db_user
 
 
 @app.get("/api/users/{username}", response_model=UserResponse)
-def get_user(username: str, db: Session = Depends(get_db)):
+def get_user(username: str, db: Session = Depends(get_read_db)):
     user = get_user_by_username(db, username)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
@@ -133,14 +143,14 @@ def get_user(username: str, db: Session = Depends(get_db)):
 
 
 @app.get("/api/users/", response_model=List[UserResponse])
-def list_users(db: Session = Depends(get_db)):
+def list_users(db: Session = Depends(get_read_db)):
     return db.query(User).all()
 
 
 # FRIEND ENDPOINTS
 @app.post("/api/friends/request", response_model=FriendRequestResponse)
 def send_friend_request(request: FriendRequestCreate, current_username: str = Query(...), db: Session = Depends(get_db)):
-    current_user = get_user_by_username(db, current_username)
+    current_user = user_cache.get(db, current_username)
     if not current_user:
         raise HTTPException(status_code=404, detail="Current user not found")
     
@@ -181,62 +191,87 @@ def send_friend_request(request: FriendRequestCreate, current_username: str = Qu
 
 @app.post("/api/friends/accept/{request_id}")
 def accept_friend_request(request_id: int, current_username: str, db: Session = Depends(get_db)):
-    current_user = get_user_by_username(db, current_username)
+    current_user = user_cache.get(db, current_username)
     if not current_user:
         raise HTTPException(status_code=404, detail="Current user not found")
     
-    friend_request = db.query(FriendRequest).filter(FriendRequest.id == request_id).first()
+    friend_request = db.execute(
+        select(FriendRequest.sender_id, FriendRequest.receiver_id, FriendRequest.status)
+        .where(FriendRequest.id == request_id)
+    ).first()
     if not friend_request:
         raise HTTPException(status_code=404, detail="Friend request not found")
+    sender_id, receiver_id, request_status = friend_request
     
-    if friend_request.receiver_id != current_user.id:
+    if receiver_id != current_user.id:
         raise HTTPException(status_code=403, detail="Not authorized to accept this request")
     
-    if friend_request.status != "pending":
+    if request_status != "pending":
         raise HTTPException(status_code=400, detail="Request already processed")
     
     # Create friendship
     friendship = Friendship(
-        user1_id=min(friend_request.sender_id, friend_request.receiver_id),
-        user2_id=max(friend_request.sender_id, friend_request.receiver_id)
+        user1_id=min(sender_id, receiver_id),
+        user2_id=max(sender_id, receiver_id)
     )
     db.add(friendship)
     
     # Update request status
-    friend_request.status = "accepted"
+    db.execute(update(FriendRequest).where(FriendRequest.id == request_id).values(status="accepted"))
+    touch(db, friends_key(sender_id), friends_key(receiver_id))
     db.commit()
+    friendship_added(sender_id, receiver_id)
     
     return {"message": "Friend request accepted"}
 
 
 @app.get("/api/friends/", response_model=List[FriendshipResponse])
-def get_friends(current_username: str = Query(...), db: Session = Depends(get_db)):
-    current_user = get_user_by_username(db, current_username)
+async def get_friends(
+    request: Request,
+    response: Response,
+    current_username: str = Query(...),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    current_user = await user_cache.get_async(db, current_username)
     if not current_user:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    friendships = db.query(Friendship).filter(
-        or_(Friendship.user1_id == current_user.id, Friendship.user2_id == current_user.id)
-    ).all()
-    
-    result = []
-    for friendship in friendships:
-        friend_id = friendship.user2_id if friendship.user1_id == current_user.id else friendship.user1_id
-        friend = db.query(User).filter(User.id == friend_id).first()
-        result.append({
+    not_modified = conditional(request, response, versions.etag(friends_key(current_user.id)), PRIVATE_REVALIDATE)
+    if not_modified:
+        return not_modified
+
+    friend_ids = await db.run_sync(friend_graph.friends_of, current_user.id)
+    if not friend_ids:
+        return []
+
+    # Friendships and the friend on the other side, in one join over the cached friend ids
+    friend = aliased(User)
+    rows = (await db.execute(
+        select(Friendship, friend)
+        .join(friend, friend.id == case(
+            (Friendship.user1_id == current_user.id, Friendship.user2_id), else_=Friendship.user1_id
+        ))
+        .where(
+            friend.id.in_(friend_ids),
+            or_(Friendship.user1_id == current_user.id, Friendship.user2_id == current_user.id),
+        )
+        .order_by(Friendship.id)
+    )).all()
+
+    return [
+        {
             "id": friendship.id,
             "user1_id": friendship.user1_id,
             "user2_id": friendship.user2_id,
             "created_at": friendship.created_at,
-            "friend": friend
-        })
-    
-    return result
+            "friend": friend_user
+        }
+        for friendship, friend_user in rows
+    ]
 
 
 @app.get("/api/friends/requests", response_model=List[FriendRequestResponse])
-def get_friend_requests(current_username: str, db: Session = Depends(get_db)):
-    current_user = get_user_by_username(db, current_username)
+def get_friend_requests(current_username: str, db: Session = Depends(get_read_db)):
+    current_user = user_cache.get(db, current_username)
     if not current_user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -250,187 +285,143 @@ def get_friend_requests(current_username: str, db: Session = Depends(get_db)):
 
 # MOVIE ENDPOINTS
 @app.get("/api/movies/", response_model=List[MovieResponse])
-def get_movies(
+async def get_movies(
     skip: int = 0,
     limit: int = 100,
     current_username: Optional[str] = Query(None),
     streaming_services: Optional[str] = Query(None),
-    db: Session = Depends(get_db)
+    genres: Optional[str] = Query(None),
+    db: AsyncSession = Depends(get_async_read_db)
 ):
-    query = db.query(Movie)
-    
-    # Filter by streaming services if provided
-    if streaming_services:
-        try:
-            import json
-            services_list = json.loads(streaming_services)
-            if isinstance(services_list, list) and len(services_list) > 0:
-                query = query.join(MovieStreamingService).join(StreamingService).filter(
-                    StreamingService.name.in_(services_list)
-                ).distinct()
-        except:
-            pass
+    # On any of the streaming services and in any of the genres, if given (indexed IN subqueries)
+    stmt = select(Movie.id).where(
+        *movie_filters(Movie.id, parse_name_filter(streaming_services), parse_name_filter(genres))
+    )
     
     # Exclude movies user has already swiped on
     if current_username:
-        current_user = get_user_by_username(db, current_username)
+        current_user = await user_cache.get_async(db, current_username)
         if current_user:
-            swiped_movie_ids = db.query(Swipe.movie_id).filter(Swipe.user_id == current_user.id).subquery()
-            query = query.filter(~Movie.id.in_(swiped_movie_ids))
-    
-    movies = query.offset(skip).limit(limit).all()
+            swiped_movie_ids = select(Swipe.movie_id).where(Swipe.user_id == current_user.id)
+            stmt = stmt.where(~Movie.id.in_(swiped_movie_ids))
     
-    # Load streaming services for each movie
-    result = []
-    for movie in movies:
-        streaming_services = db.query(StreamingService).join(MovieStreamingService).filter(
-            MovieStreamingService.movie_id == movie.id
-        ).all()
-        movie_dict = {
-            "id": movie.id,
-            "title": movie.title,
-            "genre": movie.genre,
-            "rating": movie.rating,
-            "description": movie.description,
-            "poster_url": movie.poster_url,
-            "release_year": movie.release_year,
-            "imdb_rating": movie.imdb_rating,
-            "streaming_services": streaming_services
-        }
-        result.append(movie_dict)
-    
-    return result
+    movie_ids = list((await db.execute(stmt.offset(skip).limit(limit))).scalars())
+    return JSONBytesResponse(json_array(await db.run_sync(card_cache.get_many, movie_ids)))
+
+
+@app.get("/api/movies/deck", response_model=DeckResponse)
+def get_deck(
+    after: Optional[int] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_username: Optional[str] = Query(None),
+    streaming_services: Optional[str] = Query(None),
+    genres: Optional[str] = Query(None),
+    db: Session = Depends(get_read_db)
+):
+    """Next unswiped movies after the `after` cursor (keyset pagination, no OFFSET / NOT IN)."""
+    services_list = parse_name_filter(streaming_services)
+    genres_list = parse_name_filter(genres)
+    user_id = None
+    if current_username:
+        current_user = user_cache.get(db, current_username)
+        if not current_user:
+            raise HTTPException(status_code=404, detail="User not found")
+        user_id = current_user.id
+
+    if user_id is not None and settings.deck_ranking:
+        # Materialized deck ranked by similarity to the user's likes; filters applied on the ranked range read
+        movie_ids, next_cursor = get_user_deck_ids(db, user_id, after, limit, services_list, genres_list, ranked=True)
+    elif (services_list or genres_list) and settings.use_bitmap_index:
+        # OR of service bitmaps AND OR of genre bitmaps AND NOT the user's swiped bitmap
+        movie_ids = movie_index.filtered_ids(db, user_id, services_list, after, limit, genres_list)
+        next_cursor = movie_ids[-1] if len(movie_ids) == limit else None
+    elif user_id is not None:
+        # Logged-in users read their materialized deck (built on first request)
+        movie_ids, next_cursor = get_user_deck_ids(db, user_id, after, limit, services_list, genres_list)
+    else:
+        movie_ids, next_cursor = get_deck_ids(db, None, after, limit, services_list, genres_list)
+    # Assembled from cached pre-encoded cards
+    return JSONBytesResponse(deck_body(card_cache.get_many(db, movie_ids), next_cursor))
+
+
+@app.get("/api/movies/search", response_model=List[MovieResponse])
+async def search_movies(
+    q: str = Query(..., min_length=1, max_length=200),
+    limit: int = Query(20, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """Typeahead: movies whose title, original title or description contain every word of q (the last one as a prefix), best first."""
+    movie_ids = await db.run_sync(search_movie_ids, q, limit)
+    return JSONBytesResponse(json_array(await db.run_sync(card_cache.get_many, movie_ids)))
 
 
 @app.get("/api/movies/{movie_id}", response_model=MovieResponse)
-def get_movie(movie_id: int, db: Session = Depends(get_db)):
-    movie = db.query(Movie).filter(Movie.id == movie_id).first()
-    if not movie:
+def get_movie(movie_id: int, request: Request, response: Response, db: Session = Depends(get_read_db)):
+    not_modified = conditional(request, response, versions.etag(movie_key(movie_id)), PUBLIC_SHORT)
+    if not_modified:
+        return not_modified
+    cards = card_cache.get_many(db, [movie_id])
+    if not cards:
         raise HTTPException(status_code=404, detail="Movie not found")
-    
-    streaming_services = db.query(StreamingService).join(MovieStreamingService).filter(
-        MovieStreamingService.movie_id == movie.id
-    ).all()
-    
-    return {
-        "id": movie.id,
-        "title": movie.title,
-        "genre": movie.genre,
-        "rating": movie.rating,
-        "description": movie.description,
-        "poster_url": movie.poster_url,
-        "release_year": movie.release_year,
-        "imdb_rating": movie.imdb_rating,
-        "streaming_services": streaming_services
-    }
+    return JSONBytesResponse(cards[0], headers=response.headers)
 
 
 # SWIPE ENDPOINTS
 @app.post("/api/swipes/", response_model=SwipeResponse)
-def create_swipe(
+async def create_swipe(
     swipe: SwipeCreate,
     current_username: str = Query(...),
-    request: Request = None,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_read_db),
 ):
-    _app = request.app if request else None
-    current_user = get_user_by_username(db, current_username)
+    # Reads use the async read pool; the write goes through the single writer, never this session
+    current_user = await user_cache.get_async(db, current_username)
     if not current_user:
         raise HTTPException(status_code=404, detail="User not found")
-    
-    # Check if movie exists
-    movie = db.query(Movie).filter(Movie.id == swipe.movie_id).first()
-    if not movie:
+
+    if settings.swipe_group_commit:
+        # Coalesced with other requests' swipes into one transaction by the writer thread; awaited, not blocked on
+        result = await asyncio.wrap_future(swipe_writer.submit(current_user.id, swipe.movie_id, swipe.direction))
+    else:
+        result = await run_in_threadpool(record_swipe_now, current_user.id, swipe.movie_id, swipe.direction)
+
+    if result.status == "movie_not_found":
         raise HTTPException(status_code=404, detail="Movie not found")
-    
-    # Check if user already swiped on this movie
-    existing_swipe = db.query(Swipe).filter(
-        Swipe.user_id == current_user.id,
-        Swipe.movie_id == swipe.movie_id
-    ).first()
-    
-    if existing_swipe:
+    if result.status == "duplicate":
         raise HTTPException(status_code=400, detail="Already swiped on this movie")
-    
-    db_swipe = Swipe(
-        user_id=current_user.id,
-        movie_id=swipe.movie_id,
-        direction=swipe.direction
-    )
-    db.add(db_swipe)
-    db.commit()
-    db.refresh(db_swipe)
-    
-    # Check for matches if swiped right
-    if swipe.direction == SwipeDirection.RIGHT:
-        check_for_matches(db, current_user.id, swipe.movie_id, _app)
-    
-    return db_swipe
+    return result.swipe
 
 
-def check_for_matches(db: Session, user_id: int, movie_id: int, app=None):
-    """Check if swiping right creates a match with any friend. Notifies both users via WebSocket if connected."""
-    # Get all friends
-    friendships = db.query(Friendship).filter(
-        or_(Friendship.user1_id == user_id, Friendship.user2_id == user_id)
-    ).all()
-    
-    friend_ids = []
-    for friendship in friendships:
-        friend_id = friendship.user2_id if friendship.user1_id == user_id else friendship.user1_id
-        friend_ids.append(friend_id)
-    
-    # Check if any friend also swiped right on this movie
-    for friend_id in friend_ids:
-        friend_swipe = db.query(Swipe).filter(
-            Swipe.user_id == friend_id,
-            Swipe.movie_id == movie_id,
-            Swipe.direction == SwipeDirection.RIGHT
-        ).first()
-        
-        if friend_swipe:
-            # Check if match already exists
-            existing_match = db.query(Match).filter(
-                or_(
-                    and_(Match.user1_id == user_id, Match.user2_id == friend_id, Match.movie_id == movie_id),
-                    and_(Match.user1_id == friend_id, Match.user2_id == user_id, Match.movie_id == movie_id)
-                )
-            ).first()
-            
-            if not existing_match:
-                # Create match
-                match = Match(
-                    user1_id=min(user_id, friend_id),
-                    user2_id=max(user_id, friend_id),
-                    movie_id=movie_id
-                )
-                db.add(match)
-                db.commit()
-                db.refresh(match)
-                movie_row = db.query(Movie).filter(Movie.id == movie_id).first()
-                user1 = db.query(User).filter(User.id == match.user1_id).first()
-                user2 = db.query(User).filter(User.id == match.user2_id).first()
-                movie_title = movie_row.title if movie_row else ""
-
-                # Notify both users in real time (best-effort, non-blocking)
-                loop = getattr(getattr(app, "state", None), "loop", None) if app else None
-                if loop and user1 and user2:
-                    def _notify():
-                        asyncio.ensure_future(
-                            notify_new_match(
-                                user1.username,
-                                user2.username,
-                                match.id,
-                                movie_title,
-                            ),
-                            loop=loop,
-                        )
-                    loop.call_soon_threadsafe(_notify)
+def record_swipe_now(user_id: int, movie_id: int, direction: SwipeDirection):
+    """Write one swipe in its own writer transaction (group commit disabled), then publish it like the writer does."""
+    with SessionLocal(expire_on_commit=False) as write_db:
+        results, match_ids = record_swipes(write_db, [(user_id, movie_id, direction)])
+        write_db.commit()
+    publish_committed(results, match_ids)
+    return results[0]
+
+
+@app.post("/api/swipes/batch", response_model=List[SwipeBatchItemResult])
+def create_swipes_batch(
+    batch: SwipeBatchCreate,
+    current_username: str = Query(...),
+    db: Session = Depends(get_db),
+):
+    """Record many swipes in one transaction with a single match scan; per-item status in input order."""
+    current_user = user_cache.get(db, current_username)
+    if not current_user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    results, match_ids = record_swipes(
+        db, [(current_user.id, item.movie_id, item.direction) for item in batch.swipes]
+    )
+    db.commit()
+    publish_committed(results, match_ids)
+    return results
 
 
 @app.get("/api/swipes/", response_model=List[SwipeResponse])
-def get_swipes(current_username: str = Query(...), db: Session = Depends(get_db)):
-    current_user = get_user_by_username(db, current_username)
+def get_swipes(current_username: str = Query(...), db: Session = Depends(get_read_db)):
+    current_user = user_cache.get(db, current_username)
     if not current_user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -439,45 +430,30 @@ def get_swipes(current_username: str = Query(...), db: Session = Depends(get_db)
 
 # MATCH ENDPOINTS
 @app.get("/api/matches/", response_model=List[MatchResponse])
-def get_matches(current_username: str = Query(...), db: Session = Depends(get_db)):
-    current_user = get_user_by_username(db, current_username)
+async def get_matches(
+    request: Request,
+    response: Response,
+    current_username: str = Query(...),
+    since: Optional[int] = Query(None, description="Only matches with id greater than this"),
+    db: AsyncSession = Depends(get_async_read_db),
+):
+    """The user's matches (oldest first), or only those after `since`; X-Unread-Count holds the unread total."""
+    current_user = await user_cache.get_async(db, current_username)
     if not current_user:
         raise HTTPException(status_code=404, detail="User not found")
+    etag = versions.etag(matches_key(current_user.id), variant=f"since{since}" if since is not None else "")
+    not_modified = conditional(request, response, etag, PRIVATE_REVALIDATE)
+    if not_modified:
+        return not_modified
     
-    matches = db.query(Match).filter(
-        or_(Match.user1_id == current_user.id, Match.user2_id == current_user.id)
-    ).all()
-    
-    result = []
-    for match in matches:
-        friend_id = match.user2_id if match.user1_id == current_user.id else match.user1_id
-        friend = db.query(User).filter(User.id == friend_id).first()
-        movie = db.query(Movie).filter(Movie.id == match.movie_id).first()
-        streaming_services = db.query(StreamingService).join(MovieStreamingService).filter(
-            MovieStreamingService.movie_id == match.movie_id
-        ).all()
-        
-        result.append({
-            "id": match.id,
-            "user1_id": match.user1_id,
-            "user2_id": match.user2_id,
-            "movie_id": match.movie_id,
-            "notified_user1": match.notified_user1,
-            "notified_user2": match.notified_user2,
-            "created_at": match.created_at,
-            "movie": {
-                **movie.__dict__,
-                "streaming_services": streaming_services
-            },
-            "friend": friend
-        })
-    
-    return result
+    matches, unread = await get_match_feed_async(db, current_user.id, since)
+    response.headers["X-Unread-Count"] = str(unread)
+    return matches
 
 
 @app.post("/api/matches/{match_id}/notify")
 def mark_match_notified(match_id: int, current_username: str = Query(...), db: Session = Depends(get_db)):
-    current_user = get_user_by_username(db, current_username)
+    current_user = user_cache.get(db, current_username)
     if not current_user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -492,6 +468,7 @@ def mark_match_notified(match_id: int, current_username: str = Query(...), db: S
     else:
         raise HTTPException(status_code=403, detail="Not authorized")
     
+    touch(db, matches_key(current_user.id))
     db.commit()
     return {"message": "Match notification marked as read"}
 
@@ -499,7 +476,7 @@ def mark_match_notified(match_id: int, current_username: str = Query(...), db: S
 # WATCH SESSION ENDPOINTS
 @app.post("/api/watch-sessions/", response_model=WatchSessionResponse)
 def create_watch_session(session: WatchSessionCreate, current_username: str, db: Session = Depends(get_db)):
-    current_user = get_user_by_username(db, current_username)
+    current_user = user_cache.get(db, current_username)
     if not current_user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -531,8 +508,8 @@ def create_watch_session(session: WatchSessionCreate, current_username: str, db:
 
 
 @app.get("/api/watch-sessions/", response_model=List[WatchSessionResponse])
-def get_watch_sessions(current_username: str = Query(...), db: Session = Depends(get_db)):
-    current_user = get_user_by_username(db, current_username)
+def get_watch_sessions(current_username: str = Query(...), db: Session = Depends(get_read_db)):
+    current_user = user_cache.get(db, current_username)
     if not current_user:
         raise HTTPException(status_code=404, detail="User not found")
     
@@ -555,12 +532,104 @@ def get_watch_sessions(current_username: str = Query(...), db: Session = Depends
     return result
 
 
+# GROUP WATCH SESSION ENDPOINTS
+@app.post("/api/group-sessions/", response_model=GroupSessionResponse)
+def create_group_watch_session(session: GroupSessionCreate, current_username: str, db: Session = Depends(get_db)):
+    """Start a watch session with several friends."""
+    current_user = user_cache.get(db, current_username)
+    if not current_user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    friend_ids = set(session.friend_ids) - {current_user.id}
+    if not friend_ids:
+        raise HTTPException(status_code=400, detail="A group session needs at least one friend")
+    if len(friend_ids) + 1 > settings.group_session_max_members:
+        raise HTTPException(
+            status_code=400, detail=f"A group session has at most {settings.group_session_max_members} members"
+        )
+    known = set(db.execute(select(User.id).where(User.id.in_(friend_ids))).scalars())
+    if known != friend_ids:
+        raise HTTPException(status_code=404, detail="Friend not found")
+    if not friend_ids <= friend_graph.friends_of(db, current_user.id):
+        raise HTTPException(status_code=400, detail="Users are not friends")
+
+    session_id, created_at = create_group_session(db, current_user.id, sorted(friend_ids))
+    db.commit()
+    return {
+        "id": session_id,
+        "created_by": current_user.id,
+        "created_at": created_at,
+        "members": session_members(db, [session_id])[session_id],
+    }
+
+
+@app.get("/api/group-sessions/", response_model=List[GroupSessionResponse])
+def get_group_watch_sessions(current_username: str = Query(...), db: Session = Depends(get_read_db)):
+    current_user = user_cache.get(db, current_username)
+    if not current_user:
+        raise HTTPException(status_code=404, detail="User not found")
+
+    session_ids = user_session_ids(db, current_user.id)
+    if not session_ids:
+        return []
+    sessions = db.execute(
+        select(GroupSession.id, GroupSession.created_by, GroupSession.created_at)
+        .where(GroupSession.id.in_(session_ids))
+        .order_by(GroupSession.id.desc())
+    ).all()
+    members = session_members(db, session_ids)
+    return [
+        {
+            "id": session_id,
+            "created_by": created_by,
+            "created_at": created_at,
+            "members": members.get(session_id, []),
+        }
+        for session_id, created_by, created_at in sessions
+    ]
+
+
+@app.get("/api/group-sessions/{session_id}/movies", response_model=List[MovieResponse])
+def get_group_movies(
+    session_id: int,
+    current_username: str = Query(...),
+    streaming_services: Optional[str] = Query(None),
+    limit: int = Query(20, ge=1, le=100),
+    db: Session = Depends(get_read_db),
+):
+    """Movies every member swiped right on, on the most streaming services (or of the given ones) first."""
+    current_user = user_cache.get(db, current_username)
+    if not current_user:
+        raise HTTPException(status_code=404, detail="User not found")
+    member_ids = list(db.execute(
+        select(GroupSessionMember.user_id).where(GroupSessionMember.session_id == session_id)
+    ).scalars())
+    if not member_ids:
+        raise HTTPException(status_code=404, detail="Group session not found")
+    if current_user.id not in member_ids:
+        raise HTTPException(status_code=403, detail="Not authorized")
+
+    movie_ids = group_movie_ids(db, member_ids, parse_name_filter(streaming_services), limit)
+    return JSONBytesResponse(json_array(card_cache.get_many(db, movie_ids)))
+
+
 # STREAMING SERVICES ENDPOINTS
 @app.get("/api/streaming-services/", response_model=List[StreamingServiceResponse])
-def get_streaming_services(db: Session = Depends(get_db)):
+def get_streaming_services(request: Request, response: Response, db: Session = Depends(get_read_db)):
+    not_modified = conditional(request, response, versions.etag(STREAMING_SERVICES), PUBLIC_SHORT)
+    if not_modified:
+        return not_modified
     return db.query(StreamingService).all()
 
 
+@app.get("/api/genres/", response_model=List[GenreResponse])
+def get_genres(request: Request, response: Response, db: Session = Depends(get_read_db)):
+    not_modified = conditional(request, response, versions.etag(GENRES), PUBLIC_SHORT)
+    if not_modified:
+        return not_modified
+    return db.query(Genre).order_by(Genre.name).all()
+
+
 # ADMIN - TMDB sync (seed/refresh movie and streaming availability)
 @app.post("/admin/sync-movie/{movie_id}")
 def admin_sync_movie(movie_id: int, db: Session = Depends(get_db)):
@@ -581,27 +650,71 @@ def admin_sync_movie_by_title(
     return {"message": "Synced", "movie_id": movie.id, "title": movie.title}
 
 
-@app.post("/api/load-more-movies")
-def load_more_movies(page: int = 1, db: Session = Depends(get_db)):
-    """Fetch a page of popular movies from TMDB and add new ones to the catalog."""
-    added = sync_popular_movies(db, page)
-    return {"added": added, "message": f"Added {added} new movies from TMDB."}
+@app.get("/admin/tmdb-cache")
+def admin_tmdb_cache_stats():
+    """Hit/miss counters for the TMDB read-through cache."""
+    return tmdb_cache.snapshot()
+
+
+@app.post("/api/load-more-movies", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED)
+def load_more_movies(page: int = 1):
+    """Queue a page of popular movies from TMDB (plus a few pages ahead); poll /api/jobs/{id} for progress."""
+    return catalog_jobs.submit(page)
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse)
+def get_job(job_id: str):
+    job = catalog_jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
 
 # WebSocket endpoint for real-time notifications
 @app.websocket("/ws/{username}")
-async def websocket_endpoint(websocket: WebSocket, username: str):
-    await connection_manager.connect(websocket, username)
-    try:
-        while True:
-            await websocket.receive_text()
-    except WebSocketDisconnect:
-        connection_manager.disconnect(username)
+async def websocket_endpoint(websocket: WebSocket, username: str, after: Optional[int] = None):
+    """
+    Outbox events for the user: first every unacknowledged one (seq > max(after, last ack)), then
+    live ones. The client sends {"type": "ack", "seq": n} once it has handled everything up to n.
+    """
+    async def replay(conn):
+        async with AsyncReadSessionLocal() as db:
+            user = await user_cache.get_async(db, username)
+            if not user:
+                return
+            seq = max(after or 0, await db.run_sync(acked_seq, user.id))
+            while True:
+                events = await db.run_sync(events_after, user.id, seq)
+                for message in events:
+                    await connection_manager.send(conn, message)
+                if len(events) < REPLAY_PAGE_SIZE:
+                    break
+                seq = events[-1]["seq"]
+
+    async def on_message(conn, text):
+        try:
+            message = json.loads(text)
+        except ValueError:
+            return
+        if isinstance(message, dict) and message.get("type") == "ack" and isinstance(message.get("seq"), int):
+            await run_in_threadpool(ack_notifications, username, message["seq"])
+
+    await connection_manager.serve(websocket, username, on_connect=replay, on_message=on_message)
+
+
+def ack_notifications(username: str, seq: int) -> None:
+    with SessionLocal() as db:
+        user = user_cache.get(db, username)
+        if user:
+            ack(db, user.id, seq)
 
 
 # ROOT ENDPOINT - Serve frontend
 @app.get("/", response_class=HTMLResponse)
-def read_root():
+def read_root(request: Request, response: Response):
+    not_modified = conditional(request, response, file_etag("static/index.html"), REVALIDATE)
+    if not_modified:
+        return not_modified
     # Explicitly use UTF-8 so Windows default encoding (cp1252) doesn't break on special characters
     with open("static/index.html", "r", encoding="utf-8") as f:
         return f.read()
@@ -0,0 +1,55 @@
+"""Set-based match detection: new right swipes ⋈ friendships ⋈ friends' right swipes, minus existing matches."""
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import select, case, or_, and_, literal
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session, aliased
+
+from database import Friendship, Swipe, Match, SwipeDirection
+from http_cache import touch, matches_key
+
+
+def insert_new_matches(db: Session, swipe_ids: Iterable[int]) -> list[int]:
+    """
+    Create a match for every friend who also swiped right on the movie of any of the given
+    (right) swipes, in one statement: new swipes ⋈ friendships ⋈ friends' right swipes.
+    Existing matches are skipped by the unique (user1_id, user2_id, movie_id) index, so this is
+    idempotent and safe under concurrent swipes. Returns the ids of newly created matches. Does not commit.
+    """
+    swipe_ids = list(swipe_ids)
+    if not swipe_ids:
+        return []
+    mine = aliased(Swipe)
+    theirs = aliased(Swipe)
+    friend_id = case((Friendship.user1_id == mine.user_id, Friendship.user2_id), else_=Friendship.user1_id)
+    candidates = (
+        select(
+            case((theirs.user_id < mine.user_id, theirs.user_id), else_=mine.user_id),
+            case((theirs.user_id < mine.user_id, mine.user_id), else_=theirs.user_id),
+            mine.movie_id,
+            literal(False),
+            literal(False),
+            literal(datetime.utcnow()),
+        )
+        .select_from(mine)
+        .join(Friendship, or_(Friendship.user1_id == mine.user_id, Friendship.user2_id == mine.user_id))
+        .join(theirs, and_(
+            theirs.user_id == friend_id,
+            theirs.movie_id == mine.movie_id,
+            theirs.direction == SwipeDirection.RIGHT,
+        ))
+        .where(mine.id.in_(swipe_ids), mine.direction == SwipeDirection.RIGHT)
+    )
+    stmt = (
+        insert(Match)
+        .from_select(
+            ["user1_id", "user2_id", "movie_id", "notified_user1", "notified_user2", "created_at"], candidates
+        )
+        .on_conflict_do_nothing()
+        .returning(Match.id, Match.user1_id, Match.user2_id)
+    )
+    created = db.execute(stmt).all()
+    touch(db, *{matches_key(user_id) for _id, user1_id, user2_id in created for user_id in (user1_id, user2_id)})
+    return [match_id for match_id, _user1_id, _user2_id in created]
+
@@ -1,12 +1,8 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional, List
 from datetime import datetime
-from enum import Enum
 
-
-class SwipeDirection(str, Enum):
-    LEFT = "left"
-    RIGHT = "right"
+from database import SwipeDirection  # one enum for the API and the swipes table
 
 
 # User models
@@ -73,6 +69,14 @@ class StreamingServiceResponse(BaseModel):
         from_attributes = True
 
 
+class GenreResponse(BaseModel):
+    id: int
+    name: str
+
+    class Config:
+        from_attributes = True
+
+
 class MovieResponse(BaseModel):
     id: int
     title: str
@@ -88,6 +92,11 @@ class MovieResponse(BaseModel):
         from_attributes = True
 
 
+class DeckResponse(BaseModel):
+    movies: List[MovieResponse]
+    next_cursor: Optional[int] = None  # pass back as ?after= to get the next page
+
+
 # Swipe models
 class SwipeCreate(BaseModel):
     movie_id: int
@@ -116,6 +125,19 @@ class SwipeResponse(BaseModel):
         from_attributes = True
 
 
+class SwipeBatchCreate(BaseModel):
+    swipes: List[SwipeCreate] = Field(..., min_length=1, max_length=500)
+
+
+class SwipeBatchItemResult(BaseModel):
+    movie_id: int
+    status: str  # created, duplicate, movie_not_found
+    swipe: Optional[SwipeResponse] = None
+
+    class Config:
+        from_attributes = True
+
+
 # Match models
 class MatchResponse(BaseModel):
     id: int
@@ -148,7 +170,35 @@ class WatchSessionResponse(BaseModel):
         from_attributes = True
 
 
+class GroupSessionCreate(BaseModel):
+    friend_ids: List[int] = Field(..., min_length=1)
+
+
+class GroupSessionResponse(BaseModel):
+    id: int
+    created_by: int
+    created_at: datetime
+    members: List[UserResponse]
+
+    class Config:
+        from_attributes = True
+
+
 # Filter models
 class MovieFilter(BaseModel):
     streaming_services: Optional[List[str]] = None
     genres: Optional[List[str]] = None
+
+
+# Background job models
+class JobResponse(BaseModel):
+    id: str
+    page: int
+    status: str  # queued, running, done, failed
+    added: int = 0
+    error: Optional[str] = None
+    created_at: datetime
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
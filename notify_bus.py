@@ -0,0 +1,200 @@
+"""Cross-worker pub/sub for notifications and cache invalidations.
+
+publish() runs the channel's handlers in this process right away and hands the event to the
+backend; every other worker receives it from the backend and runs its own handlers (so each
+worker delivers to the sockets it holds). Events carry the publishing worker's id, so nobody
+handles its own event twice.
+
+Backends (settings.notify_backend):
+- "sqlite" (default): an outbox table in a small SQLite file shared by all workers on the host,
+  polled every notify_poll_interval_ms. Publishing never blocks: events are queued and written
+  in batches by a background thread, flushed at stop() and at interpreter exit (so scripts such
+  as seed_movies.py still reach the running workers). No external service.
+- "memory": single process only; publish is local dispatch.
+Another transport only needs publish(origin, channel, data) / start(callback) / stop().
+"""
+import atexit
+import json
+import logging
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import defaultdict
+from typing import Callable, Optional
+
+from config import settings
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[dict], None]
+Deliver = Callable[[str, str, dict], None]  # (origin, channel, payload)
+
+
+class MemoryBackend:
+    def publish(self, origin: str, channel: str, payload: dict) -> None:
+        pass
+
+    def start(self, deliver: Deliver) -> None:
+        pass
+
+    def stop(self) -> None:
+        pass
+
+
+class SQLiteOutboxBackend:
+    """Events are rows in bus_events; each worker polls for ids above the last one it has seen.
+
+    publish() only queues the event: a publisher thread writes whatever has queued up in one
+    INSERT + COMMIT, so callers (the event loop, the swipe writer) never wait on this file's lock.
+    """
+
+    def __init__(self, path: str, poll_interval: float = 0.05, retention: float = 300.0):
+        self._path = path
+        self._poll_interval = poll_interval
+        self._retention = retention
+        self._db = self._connect()
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS bus_events ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, origin TEXT NOT NULL, channel TEXT NOT NULL, "
+            "payload TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.commit()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._outgoing: queue.Queue[Optional[tuple[str, str, str, float]]] = queue.Queue()
+        self._publisher_lock = threading.Lock()
+        self._publisher: Optional[threading.Thread] = None
+        atexit.register(self._flush)
+
+    def _connect(self) -> sqlite3.Connection:
+        db = sqlite3.connect(self._path, check_same_thread=False, timeout=10)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.execute("PRAGMA synchronous=NORMAL")
+        return db
+
+    def publish(self, origin: str, channel: str, payload: dict) -> None:
+        with self._publisher_lock:
+            if self._publisher is None or not self._publisher.is_alive():
+                self._publisher = threading.Thread(target=self._write, name="notify-bus-publish", daemon=True)
+                self._publisher.start()
+        self._outgoing.put((origin, channel, json.dumps(payload), time.time()))
+
+    def _write(self) -> None:
+        while True:
+            event = self._outgoing.get()
+            if event is None:
+                return
+            batch = [event]
+            while True:
+                try:
+                    event = self._outgoing.get_nowait()
+                except queue.Empty:
+                    break
+                if event is None:
+                    self._insert(batch)
+                    return
+                batch.append(event)
+            self._insert(batch)
+
+    def _insert(self, batch: list[tuple[str, str, str, float]]) -> None:
+        try:
+            self._db.executemany(
+                "INSERT INTO bus_events (origin, channel, payload, created_at) VALUES (?, ?, ?, ?)", batch
+            )
+            self._db.commit()
+        except Exception:
+            self._db.rollback()
+            logger.exception("notify bus publish of %d events failed", len(batch))
+
+    def start(self, deliver: Deliver) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._poll, args=(deliver,), name="notify-bus", daemon=True)
+        self._thread.start()
+
+    def _flush(self) -> None:
+        """Write what is queued and end the publisher thread (the next publish starts a new one)."""
+        with self._publisher_lock:
+            if self._publisher and self._publisher.is_alive():
+                self._outgoing.put(None)
+                self._publisher.join(timeout=5)
+
+    def stop(self) -> None:
+        self._flush()
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+
+    def _poll(self, deliver: Deliver) -> None:
+        db = self._connect()
+        last_id = db.execute("SELECT coalesce(max(id), 0) FROM bus_events").fetchone()[0]
+        last_prune = time.monotonic()
+        while not self._stop.wait(self._poll_interval):
+            try:
+                rows = db.execute(
+                    "SELECT id, origin, channel, payload FROM bus_events WHERE id > ? ORDER BY id", (last_id,)
+                ).fetchall()
+                for event_id, origin, channel, payload in rows:
+                    last_id = event_id
+                    deliver(origin, channel, json.loads(payload))
+                if time.monotonic() - last_prune > self._retention / 10:
+                    last_prune = time.monotonic()
+                    db.execute("DELETE FROM bus_events WHERE created_at < ?", (time.time() - self._retention,))
+                    db.commit()
+            except Exception:
+                logger.exception("notify bus poll failed")
+        db.close()
+
+
+class NotifyBus:
+    def __init__(self, backend):
+        self.origin = uuid.uuid4().hex
+        self._backend = backend
+        self._handlers: dict[str, list[Handler]] = defaultdict(list)
+
+    def subscribe(self, channel: str, handler: Handler) -> None:
+        self._handlers[channel].append(handler)
+
+    def publish(self, channel: str, payload: dict, local: bool = True) -> None:
+        """Handle here (unless local=False) and in every other worker."""
+        if local:
+            self._dispatch(channel, payload)
+        try:
+            self._backend.publish(self.origin, channel, payload)
+        except Exception:
+            logger.exception("notify bus publish to %s failed", channel)
+
+    def start(self) -> None:
+        self._backend.start(self._deliver_remote)
+
+    def stop(self) -> None:
+        self._backend.stop()
+
+    def _deliver_remote(self, origin: str, channel: str, payload: dict) -> None:
+        if origin != self.origin:
+            self._dispatch(channel, payload)
+
+    def _dispatch(self, channel: str, payload: dict) -> None:
+        for handler in self._handlers.get(channel, ()):
+            try:
+                handler(payload)
+            except Exception:
+                logger.exception("notify bus handler for %s failed", channel)
+
+
+def _make_backend():
+    if settings.notify_backend == "memory":
+        return MemoryBackend()
+    if settings.notify_backend == "sqlite":
+        return SQLiteOutboxBackend(
+            settings.notify_bus_path,
+            poll_interval=settings.notify_poll_interval_ms / 1000,
+            retention=settings.notify_retention,
+        )
+    raise ValueError(f"Unknown notify_backend: {settings.notify_backend!r}")
+
+
+bus = NotifyBus(_make_backend())
@@ -0,0 +1,130 @@
+"""Durable per-user notification outbox.
+
+Every notification is a notification_events row written in the same transaction as the change
+it reports (a new match), so nothing is lost if no socket is open or a worker dies before
+delivery. The row id is the sequence number: live deliveries and the replay a socket gets on
+connect both carry it, the client acknowledges the highest one it has handled, and acked
+events are marked read on their matches and deleted.
+"""
+import json
+from typing import Iterable
+
+from sqlalchemy import select, delete, update, func, union_all, literal
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session, aliased
+
+from database import NotificationEvent, NotificationCursor, Match, Movie, User
+from http_cache import touch, matches_key
+from notify_bus import bus
+
+NOTIFICATION_CHANNEL = "notification"
+NEW_MATCH = "new_match"
+REPLAY_PAGE_SIZE = 100
+
+
+def add_match_events(db: Session, match_ids: list[int]) -> None:
+    """Queue a new_match event for both users of each match (each sees the other as friend). Does not commit."""
+    if not match_ids:
+        return
+    friend = aliased(User)
+    per_user = [
+        select(
+            user_id,
+            literal(NEW_MATCH),
+            func.json_object(
+                "match_id", Match.id,
+                "movie_title", func.coalesce(Movie.title, ""),
+                "friend_username", friend.username,
+            ),
+            Match.id,
+            Match.created_at,
+        )
+        .join(friend, friend.id == friend_id)
+        .join(Movie, Movie.id == Match.movie_id)
+        .where(Match.id.in_(match_ids))
+        for user_id, friend_id in ((Match.user1_id, Match.user2_id), (Match.user2_id, Match.user1_id))
+    ]
+    db.execute(
+        insert(NotificationEvent).from_select(
+            ["user_id", "type", "payload", "match_id", "created_at"],
+            union_all(*per_user),
+        )
+    )
+
+
+def event_message(seq: int, type_: str, payload: str) -> dict:
+    return {"type": type_, "seq": seq, **json.loads(payload)}
+
+
+def events_for_matches(db: Session, match_ids: list[int]) -> list[tuple[str, dict]]:
+    """(username, message) for the committed events of the given matches, in seq order."""
+    if not match_ids:
+        return []
+    rows = db.execute(
+        select(User.username, NotificationEvent.id, NotificationEvent.type, NotificationEvent.payload)
+        .join(User, User.id == NotificationEvent.user_id)
+        .where(NotificationEvent.match_id.in_(match_ids))
+        .order_by(NotificationEvent.id)
+    ).all()
+    return [(username, event_message(seq, type_, payload)) for username, seq, type_, payload in rows]
+
+
+def publish_events(events: Iterable[tuple[str, dict]]) -> None:
+    """Deliver committed events live, in whichever workers hold the users' sockets."""
+    for username, message in events:
+        bus.publish(NOTIFICATION_CHANNEL, {"username": username, "message": message})
+
+
+def acked_seq(db: Session, user_id: int) -> int:
+    return db.execute(
+        select(NotificationCursor.acked_seq).where(NotificationCursor.user_id == user_id)
+    ).scalar() or 0
+
+
+def events_after(db: Session, user_id: int, after: int, limit: int = REPLAY_PAGE_SIZE) -> list[dict]:
+    """The user's unacknowledged events with seq > after, oldest first (ix_notification_events_user_id_id)."""
+    rows = db.execute(
+        select(NotificationEvent.id, NotificationEvent.type, NotificationEvent.payload)
+        .where(NotificationEvent.user_id == user_id, NotificationEvent.id > after)
+        .order_by(NotificationEvent.id)
+        .limit(limit)
+    ).all()
+    return [event_message(seq, type_, payload) for seq, type_, payload in rows]
+
+
+def ack(db: Session, user_id: int, seq: int) -> int:
+    """
+    Acknowledge every event of the user up to seq: their matches are marked notified and the
+    events are deleted. The cursor only moves forward, and never past the user's newest event (a
+    seq from the future would hide events not written yet). Returns the new cursor. Commits.
+    """
+    newest = db.execute(
+        select(func.max(NotificationEvent.id)).where(NotificationEvent.user_id == user_id)
+    ).scalar() or 0
+    seq = min(seq, newest)
+    acked = select(NotificationEvent.match_id).where(
+        NotificationEvent.user_id == user_id,
+        NotificationEvent.id <= seq,
+        NotificationEvent.match_id.is_not(None),
+    )
+    marked = 0
+    for user_column, flag in ((Match.user1_id, Match.notified_user1), (Match.user2_id, Match.notified_user2)):
+        marked += db.execute(
+            update(Match)
+            .where(Match.id.in_(acked), user_column == user_id, flag.is_not(True))
+            .values({flag: True})
+        ).rowcount
+    if marked:
+        touch(db, matches_key(user_id))
+    db.execute(delete(NotificationEvent).where(NotificationEvent.user_id == user_id, NotificationEvent.id <= seq))
+    cursor = db.execute(
+        insert(NotificationCursor)
+        .values(user_id=user_id, acked_seq=seq)
+        .on_conflict_do_update(
+            index_elements=["user_id"],
+            set_={"acked_seq": func.max(NotificationCursor.acked_seq, seq)},
+        )
+        .returning(NotificationCursor.acked_seq)
+    ).scalar_one()
+    db.commit()
+    return cursor
@@ -0,0 +1,191 @@
+"""WebSocket fan-out: any number of sockets per user, each with a bounded queue and its own writer task.
+
+Sending never awaits a client: a message is encoded once and put on the queue of every socket of
+the user, and each socket's writer task drains its own queue. A socket whose queue is full is a
+slow consumer: it is disconnected (or, with the "drop" policy, loses its oldest queued message), so
+it can't hold back anyone else. A heartbeat task pings every socket and evicts those that have
+sent nothing (pongs included) for longer than the idle timeout.
+
+serve() can replay missed messages before live ones: while its on_connect callback runs, live
+messages for the new socket are held back and queued after the replay.
+"""
+import asyncio
+import json
+import time
+from typing import Awaitable, Callable, Optional
+
+from fastapi import WebSocket
+
+from config import settings
+
+# Close codes: 1001 going away (idle / shutdown), 1013 try again later (too slow)
+CLOSE_IDLE = 1001
+CLOSE_SLOW = 1013
+
+
+class Connection:
+    __slots__ = ("websocket", "username", "queue", "writer", "last_seen", "held")
+
+    def __init__(self, websocket: WebSocket, username: str, queue_size: int):
+        self.websocket = websocket
+        self.username = username
+        self.queue: asyncio.Queue[str] = asyncio.Queue(maxsize=queue_size)
+        self.writer: Optional[asyncio.Task] = None
+        self.last_seen = time.monotonic()
+        self.held: Optional[list[str]] = None  # live messages waiting for the connect replay
+
+
+class ConnectionManager:
+    def __init__(
+        self,
+        queue_size: int = 64,
+        slow_consumer_policy: str = "disconnect",
+        ping_interval: float = 20.0,
+        idle_timeout: float = 60.0,
+        send_timeout: float = 10.0,
+    ):
+        self._connections: dict[str, set[Connection]] = {}
+        self._queue_size = queue_size
+        self._slow_consumer_policy = slow_consumer_policy
+        self._ping_interval = ping_interval
+        self._idle_timeout = idle_timeout
+        self._send_timeout = send_timeout
+        self._heartbeat: Optional[asyncio.Task] = None
+        self.stats = {"sent": 0, "dropped": 0, "evicted_slow": 0, "evicted_idle": 0, "send_failures": 0}
+
+    @property
+    def connection_count(self) -> int:
+        return sum(len(conns) for conns in self._connections.values())
+
+    async def connect(self, websocket: WebSocket, username: str, hold: bool = False) -> Connection:
+        await websocket.accept()
+        conn = Connection(websocket, username, self._queue_size)
+        if hold:
+            conn.held = []
+        conn.writer = asyncio.create_task(self._write(conn))
+        self._connections.setdefault(username, set()).add(conn)
+        if self._heartbeat is None or self._heartbeat.done():
+            self._heartbeat = asyncio.create_task(self._heartbeat_loop())
+        return conn
+
+    def disconnect(self, conn: Connection) -> None:
+        conns = self._connections.get(conn.username)
+        if conns is not None:
+            conns.discard(conn)
+            if not conns:
+                del self._connections[conn.username]
+        if conn.writer and conn.writer is not asyncio.current_task():
+            conn.writer.cancel()
+
+    async def serve(
+        self,
+        websocket: WebSocket,
+        username: str,
+        on_connect: Optional[Callable[[Connection], Awaitable[None]]] = None,
+        on_message: Optional[Callable[[Connection, str], Awaitable[None]]] = None,
+    ) -> None:
+        """
+        Run one socket until the client goes away or is evicted; every client message counts as activity.
+        on_connect(conn) may send() a replay before any live message; on_message(conn, text) gets client messages.
+        """
+        conn = await self.connect(websocket, username, hold=on_connect is not None)
+        try:
+            if on_connect is not None:
+                await on_connect(conn)
+                held, conn.held = conn.held or [], None
+                for text in held:
+                    if not self._enqueue(conn, text):
+                        break
+            while True:
+                text = await websocket.receive_text()
+                conn.last_seen = time.monotonic()
+                if on_message is not None:
+                    await on_message(conn, text)
+        except Exception:
+            pass  # disconnected by the client, or closed by an eviction
+        finally:
+            self.disconnect(conn)
+
+    async def send(self, conn: Connection, message: dict) -> None:
+        """Queue a message to one socket, waiting (up to the send timeout) for room instead of evicting."""
+        await asyncio.wait_for(conn.queue.put(json.dumps(message)), self._send_timeout)
+
+    def send_personal(self, username: str, message: dict) -> int:
+        """Queue a message to every socket of the user without waiting on any of them; returns how many got it."""
+        conns = self._connections.get(username)
+        if not conns:
+            return 0
+        text = json.dumps(message)
+        return sum(self._enqueue(conn, text) for conn in list(conns))
+
+    def _enqueue(self, conn: Connection, text: str) -> bool:
+        if conn.held is not None:
+            conn.held.append(text)
+            return True
+        try:
+            conn.queue.put_nowait(text)
+            return True
+        except asyncio.QueueFull:
+            pass
+        if self._slow_consumer_policy == "drop":
+            conn.queue.get_nowait()  # oldest message goes, newest is kept
+            conn.queue.put_nowait(text)
+            self.stats["dropped"] += 1
+            return True
+        self.stats["evicted_slow"] += 1
+        self._evict(conn, CLOSE_SLOW)
+        return False
+
+    def _evict(self, conn: Connection, code: int) -> None:
+        self.disconnect(conn)
+        asyncio.create_task(self._close(conn.websocket, code))
+
+    async def _close(self, websocket: WebSocket, code: int) -> None:
+        try:
+            await asyncio.wait_for(websocket.close(code), self._send_timeout)
+        except Exception:
+            pass
+
+    async def _write(self, conn: Connection) -> None:
+        try:
+            while True:
+                text = await conn.queue.get()
+                await asyncio.wait_for(conn.websocket.send_text(text), self._send_timeout)
+                self.stats["sent"] += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception:
+            # Send failed or timed out: the socket is gone or hopelessly slow
+            self.stats["send_failures"] += 1
+            self.disconnect(conn)
+            await self._close(conn.websocket, CLOSE_SLOW)
+
+    async def _heartbeat_loop(self) -> None:
+        ping = json.dumps({"type": "ping"})
+        while self._connections:
+            await asyncio.sleep(self._ping_interval)
+            idle_before = time.monotonic() - self._idle_timeout
+            for conns in list(self._connections.values()):
+                for conn in list(conns):
+                    if conn.last_seen < idle_before:
+                        self.stats["evicted_idle"] += 1
+                        self._evict(conn, CLOSE_IDLE)
+                    else:
+                        self._enqueue(conn, ping)
+
+    async def close_all(self) -> None:
+        if self._heartbeat:
+            self._heartbeat.cancel()
+        conns = [conn for conns in self._connections.values() for conn in conns]
+        for conn in conns:
+            self.disconnect(conn)
+        await asyncio.gather(*(self._close(conn.websocket, CLOSE_IDLE) for conn in conns))
+
+
+connection_manager = ConnectionManager(
+    queue_size=settings.ws_send_queue_size,
+    slow_consumer_policy=settings.ws_slow_consumer_policy,
+    ping_interval=settings.ws_ping_interval,
+    idle_timeout=settings.ws_idle_timeout,
+    send_timeout=settings.ws_send_timeout,
+)
@@ -0,0 +1,138 @@
+"""Offline item-item collaborative filtering: rebuilds movie_neighbors from right swipes, then rescores decks.
+
+Right swipes form a sparse binary user x movie matrix X. Similarity is cosine on the movie columns,
+co-likes(i, j) / sqrt(likes(i) * likes(j)), computed in blocks of movies (X.T[block] @ X) by a process
+pool; each block keeps only the top settings.recommender_neighbors per movie. Scores are stored as
+integer points (deck.SCORE_SCALE per unit of similarity) so deck scores add up in SQL.
+
+Run: python recommender.py
+"""
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import numpy as np
+from scipy import sparse
+from sqlalchemy import select, delete, insert
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import SessionLocal, ReadSessionLocal, Swipe, SwipeDirection, UserDeck, MovieNeighbor
+from deck import SCORE_SCALE, rescore_decks
+
+RESCORE_CHUNK = 500  # users rescored per writer transaction
+INSERT_CHUNK = 10000
+
+_items: Optional[sparse.csr_matrix] = None  # movie x user, per worker
+_users: Optional[sparse.csr_matrix] = None  # user x movie
+_norms: Optional[np.ndarray] = None
+
+
+def load_likes(db: Session) -> tuple[sparse.csr_matrix, np.ndarray]:
+    """Binary user x movie CSR matrix of right swipes, plus the movie id of each column."""
+    rows = db.execute(
+        select(Swipe.user_id, Swipe.movie_id).where(Swipe.direction == SwipeDirection.RIGHT)
+    ).all()
+    pairs = np.array(rows, dtype=np.int64).reshape(-1, 2)
+    _user_ids, user_index = np.unique(pairs[:, 0], return_inverse=True)
+    movie_ids, movie_index = np.unique(pairs[:, 1], return_inverse=True)
+    likes = sparse.csr_matrix(
+        (np.ones(len(pairs), dtype=np.float32), (user_index, movie_index)),
+        shape=(len(_user_ids), len(movie_ids)),
+    )
+    return likes, movie_ids
+
+
+def _init_worker(likes: sparse.csr_matrix) -> None:
+    global _items, _users, _norms
+    items = likes.T.tocsr()
+    _users, _items, _norms = likes, items, np.sqrt(np.asarray(items.sum(axis=1)).ravel())
+
+
+def _neighbor_block(bounds: tuple[int, int], k: int) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Top-k cosine neighbors of movies [start, stop) as (movie, neighbor, score points) column indices."""
+    start, stop = bounds
+    items, users, norms = _items, _users, _norms
+    assert items is not None and users is not None and norms is not None, "_init_worker has not run"
+    co = (items[start:stop] @ users).tocsr()  # co-likes of each movie in the block with every movie
+    movie_index = np.repeat(np.arange(start, stop), np.diff(co.indptr))
+    similarity = co.data / (norms[movie_index] * norms[co.indices])
+    similarity[movie_index == co.indices] = 0  # not a neighbor of itself (zero scores are dropped)
+
+    movies, neighbors, scores = [], [], []
+    for row in range(stop - start):
+        lo, hi = co.indptr[row], co.indptr[row + 1]
+        if lo == hi:
+            continue
+        row_similarity = similarity[lo:hi]
+        top = np.argpartition(-row_similarity, k - 1)[:k] if hi - lo > k else np.arange(hi - lo)
+        movies.append(np.full(len(top), start + row))
+        neighbors.append(co.indices[lo:hi][top])
+        scores.append(np.rint(row_similarity[top] * SCORE_SCALE))
+    if not movies:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    return np.concatenate(movies), np.concatenate(neighbors), np.concatenate(scores).astype(np.int64)
+
+
+def compute_neighbors(
+    likes: sparse.csr_matrix, k: int, workers: int = 0, block_size: int = 1024
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Top-k neighbors of every movie column of `likes` as (movie, neighbor, score points) column indices."""
+    movie_count = likes.get_shape()[1]
+    blocks = [(start, min(start + block_size, movie_count)) for start in range(0, movie_count, block_size)]
+    workers = min(workers or os.cpu_count() or 1, len(blocks))
+    if workers <= 1:
+        _init_worker(likes)
+        results = [_neighbor_block(block, k) for block in blocks]
+    else:
+        # The matrix is sent to each worker once (initializer), blocks only carry their bounds
+        with ProcessPoolExecutor(workers, initializer=_init_worker, initargs=(likes,)) as pool:
+            results = list(pool.map(_neighbor_block, blocks, [k] * len(blocks)))
+    if not results:
+        empty = np.empty(0, dtype=np.int64)
+        return empty, empty, empty
+    movies, neighbors, scores = (np.concatenate(column) for column in zip(*results))
+    return movies, neighbors, scores
+
+
+def rebuild_neighbors(
+    k: Optional[int] = None, workers: Optional[int] = None, block_size: Optional[int] = None
+) -> int:
+    """Recompute movie_neighbors from all right swipes and rescore every materialized deck. Returns the neighbor count."""
+    k = k or settings.recommender_neighbors
+    with ReadSessionLocal() as db:
+        likes, movie_ids = load_likes(db)
+    movies, neighbors, scores = compute_neighbors(
+        likes,
+        k,
+        settings.recommender_workers if workers is None else workers,
+        block_size or settings.recommender_block_size,
+    )
+    keep = scores > 0
+    rows = np.column_stack((movie_ids[movies[keep]], movie_ids[neighbors[keep]], scores[keep])).tolist()
+
+    with SessionLocal() as db:
+        # Swap the whole table in one transaction: readers see the old or the new neighbors, never a mix
+        db.execute(delete(MovieNeighbor))
+        for start in range(0, len(rows), INSERT_CHUNK):
+            db.execute(insert(MovieNeighbor), [
+                {"movie_id": movie_id, "neighbor_id": neighbor_id, "score": score}
+                for movie_id, neighbor_id, score in rows[start:start + INSERT_CHUNK]
+            ])
+        db.commit()
+        user_ids = list(db.execute(select(UserDeck.user_id).order_by(UserDeck.user_id)).scalars())
+        for start in range(0, len(user_ids), RESCORE_CHUNK):
+            rescore_decks(db, user_ids[start:start + RESCORE_CHUNK])
+            db.commit()
+    return len(rows)
+
+
+if __name__ == "__main__":
+    from database import init_db
+
+    init_db()
+    started = time.perf_counter()
+    count = rebuild_neighbors()
+    print(f"{count} movie neighbors rebuilt and decks rescored in {time.perf_counter() - started:.1f} s")
@@ -0,0 +1,96 @@
+"""Catalog search over the movies_fts FTS5 index (title, original_title, description).
+
+User input is never passed to MATCH as-is: it is split into words, each quoted as an FTS5 string,
+so punctuation and FTS operators in a query are plain text.
+
+Typeahead ranking: title matches first (titles that start with the query, then shorter titles),
+then movies that only match in their description. bm25() is not used: its IDF term reads the
+whole doclist of every query term, which for a two-letter prefix over a large catalog is most of
+the index. Instead each tier ranks a bounded window of settings.search_candidates matches.
+"""
+import re
+from typing import Optional
+
+from sqlalchemy import select, func, literal_column, or_, table, column
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import Movie
+
+movies_fts = table("movies_fts", column("rowid"))
+_fts = literal_column("movies_fts")
+_WORD = re.compile(r"\w+")
+TITLE_COLUMNS = "title original_title"
+MIN_PREFIX = 2  # shortest prefix index of movies_fts
+
+
+def match_expression(query: str, prefix: bool = True, columns: Optional[str] = None) -> Optional[str]:
+    """
+    FTS5 MATCH expression requiring every word of the query; with prefix, the last word also
+    matches as a prefix (typeahead) unless the query ends in a space. None if there are no words.
+    """
+    words = _WORD.findall(query.lower())
+    if not words:
+        return None
+    terms = [f'"{word}"' for word in words]
+    if prefix and not query[-1].isspace():
+        if len(words[-1]) >= MIN_PREFIX:
+            terms[-1] += "*"
+        elif len(words) > 1:
+            # A one-letter prefix matches a large part of the vocabulary (no prefix index for it): still typing
+            terms.pop()
+    expression = " ".join(terms)
+    return f"{{{columns}}}: ({expression})" if columns else expression
+
+
+def _matches(expression: str, limit: int):
+    return select(movies_fts.c.rowid).where(_fts.op("MATCH")(expression)).limit(limit).subquery()
+
+
+def search_movie_ids(db: Session, query: str, limit: int = 20) -> list[int]:
+    """Ids of movies matching the query as typed, best first."""
+    title_expression = match_expression(query, columns=TITLE_COLUMNS)
+    expression = match_expression(query)
+    if not title_expression or not expression:
+        return []
+    text = " ".join(_WORD.findall(query.lower()))
+    candidates = _matches(title_expression, settings.search_candidates)
+    ids = list(db.execute(
+        select(Movie.id)
+        .join(candidates, candidates.c.rowid == Movie.id)
+        .order_by(
+            (func.substr(func.lower(Movie.title), 1, len(text)) == text).desc(),
+            func.length(Movie.title),
+            Movie.id,
+        )
+        .limit(limit)
+    ).scalars())
+    if len(ids) < limit:
+        # Description-only matches, in catalog order
+        candidates = _matches(expression, settings.search_candidates)
+        ids += db.execute(
+            select(candidates.c.rowid)
+            .where(candidates.c.rowid.not_in(ids))
+            .limit(limit - len(ids))
+        ).scalars()
+    return ids
+
+
+def find_synced_movie_id(db: Session, title: str, year: Optional[int] = None) -> Optional[int]:
+    """Id of a TMDB-linked local movie whose title or original title is exactly `title` (case-insensitive), via the index."""
+    expression = match_expression(title, prefix=False, columns=TITLE_COLUMNS)
+    if not expression:
+        return None
+    stmt = (
+        select(Movie.id)
+        .where(
+            Movie.id.in_(select(movies_fts.c.rowid).where(_fts.op("MATCH")(expression))),
+            or_(func.lower(Movie.title) == title.lower(), func.lower(Movie.original_title) == title.lower()),
+            Movie.tmdb_id.is_not(None),
+        )
+        .order_by(Movie.id)
+        .limit(1)
+    )
+    if year is not None:
+        stmt = stmt.where(Movie.release_year == year)
+    return db.execute(stmt).scalar()
@@ -1,7 +1,7 @@
 """
 Script to seed the database with sample movies and streaming services
 """
-from database import SessionLocal, Movie, StreamingService, MovieStreamingService
+from database import SessionLocal, Movie, StreamingService, MovieStreamingService, Genre, MovieGenre
 from sqlalchemy.exc import IntegrityError
 
 def seed_database():
@@ -196,6 +196,15 @@ def seed_database():
                 db.add(movie)
                 db.flush()  # Get the movie ID
             
+            # Link the movie to its genre
+            genre = db.query(Genre).filter(Genre.name == movie_data["genre"]).first()
+            if not genre:
+                genre = Genre(name=movie_data["genre"])
+                db.add(genre)
+                db.flush()
+            if not db.query(MovieGenre).filter(MovieGenre.movie_id == movie.id, MovieGenre.genre_id == genre.id).first():
+                db.add(MovieGenre(movie_id=movie.id, genre_id=genre.id))
+            
             # Add streaming services
             for service_name in streaming_services_list:
                 if service_name in streaming_services:
@@ -0,0 +1,164 @@
+"""Group commit for swipes: one writer thread coalesces swipes from many requests into one transaction.
+
+Requests submit a swipe and block on a Future. The writer takes whatever is queued (waiting up
+to flush_interval for more, capped at max_batch), records all of them and their matches with one
+set-based swipes.record_swipes call, and commits once, so N concurrent swipers pay for a handful
+of statements and one SQLite commit instead of N serialized transactions. If a group's transaction
+fails, each swipe is retried on its own so one bad request can't fail the rest.
+
+What happens after a commit (index updates, live match notifications) is the writer's job, not
+the request's: a request that is cancelled while its swipe is being written must not lose them.
+Futures are marked running when collected, so a swipe whose request is already gone is skipped
+and a collected one can no longer be cancelled.
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+
+from config import settings
+from bitmap_index import swiped
+from database import SessionLocal, ReadSessionLocal, SwipeDirection
+from outbox import events_for_matches, publish_events
+from swipes import SwipeResult, record_swipes
+
+logger = logging.getLogger(__name__)
+
+OnCommit = Callable[[list[SwipeResult], list[int]], None]  # (committed results, new match ids)
+
+
+class _PendingSwipe:
+    __slots__ = ("user_id", "movie_id", "direction", "future")
+
+    def __init__(self, user_id: int, movie_id: int, direction: SwipeDirection):
+        self.user_id = user_id
+        self.movie_id = movie_id
+        self.direction = direction
+        self.future: Future = Future()
+
+
+class SwipeWriter:
+    def __init__(
+        self,
+        session_factory: Callable[..., Session],
+        flush_interval: float = 0.005,
+        max_batch: int = 500,
+        on_commit: Optional[OnCommit] = None,
+    ):
+        self._session_factory = session_factory
+        self._on_commit = on_commit
+        self._flush_interval = flush_interval
+        self._max_batch = max_batch
+        self._queue: queue.Queue[Optional[_PendingSwipe]] = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.stats = {"swipes": 0, "commits": 0}
+
+    def submit(self, user_id: int, movie_id: int, direction: SwipeDirection) -> Future:
+        """Queue a swipe; the Future resolves to its SwipeResult once it is committed (and handed to on_commit)."""
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="swipe-writer", daemon=True)
+                self._thread.start()
+        pending = _PendingSwipe(user_id, movie_id, direction)
+        self._queue.put(pending)
+        return pending.future
+
+    def stop(self) -> None:
+        if self._thread and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+    def _collect(self, first: _PendingSwipe) -> tuple[list[_PendingSwipe], bool]:
+        """Drain the queue for up to flush_interval; returns (batch, stop_requested). Cancelled swipes are dropped."""
+        batch = [first] if first.future.set_running_or_notify_cancel() else []
+        deadline = time.monotonic() + self._flush_interval
+        while len(batch) < self._max_batch:
+            timeout = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            if item.future.set_running_or_notify_cancel():
+                batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch, stop = self._collect(first)
+            if batch:
+                self._write(batch)
+            if stop:
+                return
+
+    def _write(self, batch: list[_PendingSwipe]) -> None:
+        try:
+            results, match_ids = self._commit(batch)
+        except Exception:
+            # Isolate the failure: retry each swipe in its own transaction
+            for pending in batch:
+                try:
+                    results, match_ids = self._commit([pending])
+                except Exception as e:
+                    pending.future.set_exception(e)
+                    continue
+                self._resolve([pending], results, match_ids)
+            return
+        self._resolve(batch, results, match_ids)
+
+    def _commit(self, batch: list[_PendingSwipe]) -> tuple[list[SwipeResult], list[int]]:
+        db = self._session_factory(expire_on_commit=False)
+        try:
+            results, match_ids = record_swipes(db, [(p.user_id, p.movie_id, p.direction) for p in batch])
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+        self.stats["commits"] += 1
+        self.stats["swipes"] += len(batch)
+        return results, match_ids
+
+    def _resolve(self, batch: list[_PendingSwipe], results: list[SwipeResult], match_ids: list[int]) -> None:
+        """Post-commit hand-off; the swipes are committed, so nothing here may fail or retry them."""
+        if self._on_commit:
+            try:
+                self._on_commit(results, match_ids)
+            except Exception:
+                logger.exception("swipe writer on_commit failed")
+        for pending, result in zip(batch, results):
+            pending.future.set_result(result)
+
+
+def publish_committed(results: list[SwipeResult], match_ids: list[int]) -> None:
+    """Tell every worker's index about the created swipes and deliver the new matches live."""
+    per_user: dict[int, tuple[list[int], list[int]]] = {}
+    for result in results:
+        if result.status == "created" and result.swipe is not None:
+            movie_ids, liked = per_user.setdefault(result.swipe.user_id, ([], []))
+            movie_ids.append(result.movie_id)
+            if result.swipe.direction == SwipeDirection.RIGHT:
+                liked.append(result.movie_id)
+    for user_id, (movie_ids, liked) in per_user.items():
+        swiped(user_id, movie_ids, liked)
+    if match_ids:
+        with ReadSessionLocal() as db:
+            publish_events(events_for_matches(db, match_ids))
+
+
+swipe_writer = SwipeWriter(
+    SessionLocal,
+    flush_interval=settings.swipe_flush_interval_ms / 1000,
+    max_batch=settings.swipe_max_batch,
+    on_commit=publish_committed,
+)
@@ -0,0 +1,81 @@
+"""Bulk swipe writes: validate, insert, pop decks and detect matches for many swipes at once."""
+from dataclasses import dataclass
+from typing import Optional
+
+from sqlalchemy import select, delete, tuple_
+from sqlalchemy.dialects.sqlite import insert
+from sqlalchemy.orm import Session
+
+from database import Movie, Swipe, SwipeDirection, DeckEntry
+from deck import add_swipe_scores
+from matching import insert_new_matches
+from outbox import add_match_events
+
+
+@dataclass
+class SwipeResult:
+    movie_id: int
+    status: str  # created, duplicate, movie_not_found
+    swipe: Optional[Swipe] = None
+
+
+def record_swipes(
+    db: Session, swipes: list[tuple[int, int, SwipeDirection]]
+) -> tuple[list[SwipeResult], list[int]]:
+    """
+    Insert (user_id, movie_id, direction) swipes, from any mix of users, in bulk: one movie lookup,
+    one INSERT (existing swipes skipped by uq_swipes_user_movie), one deck pop and rescore, and one match scan.
+    New matches get their notification events in the same transaction.
+    Returns per-item results in input order plus ids of new matches. Does not commit.
+    """
+    known = set(db.execute(
+        select(Movie.id).where(Movie.id.in_({movie_id for _user_id, movie_id, _direction in swipes}))
+    ).scalars())
+
+    rows, seen = [], set()
+    for user_id, movie_id, direction in swipes:
+        if movie_id in known and (user_id, movie_id) not in seen:
+            seen.add((user_id, movie_id))
+            rows.append({"user_id": user_id, "movie_id": movie_id, "direction": SwipeDirection(direction)})
+
+    created: dict[tuple[int, int], Swipe] = {}
+    created_ids: list[int] = []
+    liked_ids: list[int] = []
+    if rows:
+        directions = {(row["user_id"], row["movie_id"]): row["direction"] for row in rows}
+        inserted = db.execute(
+            insert(Swipe).on_conflict_do_nothing(index_elements=["user_id", "movie_id"])
+            .returning(Swipe.id, Swipe.user_id, Swipe.movie_id, Swipe),
+            rows,
+        ).all()
+        for swipe_id, user_id, movie_id, swipe in inserted:
+            created[(user_id, movie_id)] = swipe
+            created_ids.append(swipe_id)
+            if directions[(user_id, movie_id)] == SwipeDirection.RIGHT:
+                liked_ids.append(swipe_id)
+    if created:
+        # Pop the swiped movies from their users' materialized decks
+        db.execute(delete(DeckEntry).where(
+            tuple_(DeckEntry.user_id, DeckEntry.movie_id).in_(
+                select(Swipe.user_id, Swipe.movie_id).where(Swipe.id.in_(created_ids))
+            )
+        ))
+        # Liked movies lift their similar movies in the users' ranked decks
+        add_swipe_scores(db, liked_ids)
+
+    results, reported = [], set()
+    for user_id, movie_id, _direction in swipes:
+        key = (user_id, movie_id)
+        if movie_id not in known:
+            results.append(SwipeResult(movie_id, "movie_not_found"))
+        elif key in created and key not in reported:
+            reported.add(key)
+            results.append(SwipeResult(movie_id, "created", created[key]))
+        else:
+            results.append(SwipeResult(movie_id, "duplicate"))
+
+    # Only right swipes can match. Every one is scanned: the scan joins friendships in this transaction,
+    # while a cached friend list may predate a friendship another worker just committed
+    match_ids = insert_new_matches(db, liked_ids)
+    add_match_events(db, match_ids)
+    return results, match_ids
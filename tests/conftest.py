@@ -0,0 +1,49 @@
+"""Test setup: every test session gets a throwaway database, bus file and TMDB cache (never movie_tinder.db).
+
+The environment is set before any app module is imported, since config.settings and the engines
+are created at import time.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'test.db')}"
+os.environ["NOTIFY_BACKEND"] = "memory"
+os.environ["NOTIFY_BUS_PATH"] = os.path.join(_tmp.name, "bus.db")
+os.environ["TMDB_CACHE_PATH"] = os.path.join(_tmp.name, "tmdb_cache.db")
+os.environ["TMDB_API_KEY"] = ""
+
+import pytest  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+from database import engine, read_engine, async_read_engine  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def client():
+    import main
+    import seed_db
+
+    seed_db.seed_database()
+    with TestClient(main.app) as test_client:
+        yield test_client
+
+
+@contextmanager
+def count_queries():
+    """Collect the SQL statements executed on any of the app's engines inside the block."""
+    statements: list[str] = []
+
+    def record(_conn, _cursor, statement, _parameters, _context, _executemany):
+        statements.append(statement)
+
+    engines = [engine, read_engine, async_read_engine.sync_engine]
+    for target in engines:
+        event.listen(target, "before_cursor_execute", record)
+    try:
+        yield statements
+    finally:
+        for target in engines:
+            event.remove(target, "before_cursor_execute", record)
@@ -0,0 +1,85 @@
+"""Bitmap index: an update committed while the index is reading the DB is not lost."""
+from sqlalchemy import delete, select
+
+from bitmap_index import MovieBitmapIndex, set_bits
+from database import SessionLocal, ReadSessionLocal, StreamingService, MovieStreamingService
+
+from test_query_budget import like
+
+
+def change_during_load(monkeypatch, db, change):
+    """Make the session run `change` once, right after its next statement has read the DB."""
+    execute = db.execute
+
+    def execute_then_change(*args, **kwargs):
+        frozen = execute(*args, **kwargs).freeze()
+        monkeypatch.setattr(db, "execute", execute)
+        change()
+        return frozen()
+
+    monkeypatch.setattr(db, "execute", execute_then_change)
+
+
+def user_id(client, username: str) -> int:
+    return client.post("/api/users/", json={"username": username}).json()["id"]
+
+
+def test_like_during_liked_load_is_kept(client, monkeypatch):
+    uid = user_id(client, "index_liker")
+    like(client, "index_liker", [1])
+    index = MovieBitmapIndex()
+
+    def like_another():
+        like(client, "index_liker", [2])
+        index.add_swipe(uid, 2, liked=True)  # the swiped event reaching this worker
+
+    with ReadSessionLocal() as db:
+        change_during_load(monkeypatch, db, like_another)
+        assert set_bits(index.common_likes(db, [uid])) == [1, 2]
+        assert set_bits(index.common_likes(db, [uid])) == [1, 2]  # cached with the like
+
+
+def test_swipe_during_swiped_load_is_filtered_out(client, monkeypatch):
+    uid = user_id(client, "index_swiper")
+    client.post("/api/swipes/?current_username=index_swiper", json={"movie_id": 1, "direction": "left"})
+    index = MovieBitmapIndex()
+
+    def swipe_another():
+        client.post("/api/swipes/?current_username=index_swiper", json={"movie_id": 3, "direction": "left"})
+        index.add_swipe(uid, 3)
+
+    with ReadSessionLocal() as db:
+        index.ensure_loaded(db)
+        change_during_load(monkeypatch, db, swipe_another)
+        served = index.filtered_ids(db, uid, ["Netflix"], limit=100)
+        assert 1 not in served and 3 not in served
+        assert 3 not in index.filtered_ids(db, uid, ["Netflix"], limit=100)
+
+
+def test_service_change_during_load_is_kept(client, monkeypatch):
+    with SessionLocal() as db:
+        service_id = db.execute(select(StreamingService.id).where(StreamingService.name == "Paramount+")).scalar_one()
+    index = MovieBitmapIndex()
+
+    def add_link():
+        with SessionLocal() as db:
+            db.add(MovieStreamingService(movie_id=1, streaming_service_id=service_id))
+            db.commit()
+            links = db.execute(
+                select(StreamingService.id, StreamingService.name)
+                .join(MovieStreamingService, MovieStreamingService.streaming_service_id == StreamingService.id)
+                .where(MovieStreamingService.movie_id == 1)
+            ).all()
+        index.set_movie_services(1, [tuple(link) for link in links])  # the movie_services event
+
+    try:
+        with ReadSessionLocal() as db:
+            change_during_load(monkeypatch, db, add_link)
+            index.ensure_loaded(db)
+            assert 1 in index.filtered_ids(db, None, ["Paramount+"], limit=100)
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(MovieStreamingService).where(
+                MovieStreamingService.movie_id == 1, MovieStreamingService.streaming_service_id == service_id
+            ))
+            db.commit()
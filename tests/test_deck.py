@@ -0,0 +1,37 @@
+"""Ranked deck paging: likes re-score the deck mid-pass without making the cursor skip movies."""
+from sqlalchemy import delete, func, select
+
+from database import SessionLocal, Movie, MovieNeighbor
+
+
+def deck_page(client, username: str, after=None) -> tuple[list[int], int]:
+    params = {"current_username": username, "limit": 3}
+    if after is not None:
+        params["after"] = after
+    page = client.get("/api/movies/deck", params=params).json()
+    return [movie["id"] for movie in page["movies"]], page["next_cursor"]
+
+
+def test_like_while_paging_serves_every_unswiped_movie(client):
+    username = "deck_pager"
+    client.post("/api/users/", json={"username": username})
+    with SessionLocal() as db:
+        movie_count = db.execute(select(func.count()).select_from(Movie)).scalar_one()
+        db.add(MovieNeighbor(movie_id=1, neighbor_id=15, score=900))
+        db.commit()
+    try:
+        served, after = deck_page(client, username)
+        assert served == [1, 2, 3]
+        # Lifts movie 15 above the cursor in the live scores
+        client.post(f"/api/swipes/?current_username={username}", json={"movie_id": 1, "direction": "right"})
+        while after is not None:
+            movie_ids, after = deck_page(client, username, after)
+            served += movie_ids
+        assert sorted(served) == list(range(1, movie_count + 1))  # each movie once, 15 included
+
+        # The next pass is ordered by the new scores
+        assert deck_page(client, username)[0][0] == 15
+    finally:
+        with SessionLocal() as db:
+            db.execute(delete(MovieNeighbor))
+            db.commit()
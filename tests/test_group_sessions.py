@@ -0,0 +1,80 @@
+"""Group watch sessions: the movies every member liked, through the bitmap index and through SQL."""
+import json
+
+import pytest
+
+from config import settings
+
+from test_query_budget import like
+
+LIKES = {"group_host": [1, 2, 3, 4], "group_a": [1, 2, 3], "group_b": [2, 3, 9], "group_idle": []}
+
+
+def befriend(client, sender: str, receiver: str, invite_code: str) -> None:
+    client.post(f"/api/friends/request?current_username={sender}", json={"invite_code": invite_code})
+    request_id = client.get(f"/api/friends/requests?current_username={receiver}").json()[0]["id"]
+    client.post(f"/api/friends/accept/{request_id}?current_username={receiver}")
+
+
+@pytest.fixture(scope="module")
+def sessions(client) -> dict[str, int]:
+    """Session ids: "all" (host, a, b) and "idle" (host, a and a member with no likes)."""
+    users = {username: client.post("/api/users/", json={"username": username}).json() for username in LIKES}
+    for username in LIKES:
+        if username != "group_host":
+            befriend(client, username, "group_host", users["group_host"]["invite_code"])
+        like(client, username, LIKES[username])
+
+    def create(*members: str) -> int:
+        response = client.post(
+            "/api/group-sessions/?current_username=group_host",
+            json={"friend_ids": [users[member]["id"] for member in members]},
+        )
+        assert response.status_code == 200
+        return response.json()["id"]
+
+    return {"all": create("group_a", "group_b"), "idle": create("group_a", "group_idle")}
+
+
+@pytest.fixture(params=[True, False], ids=["bitmap", "sql"])
+def use_bitmap_index(request, monkeypatch):
+    monkeypatch.setattr(settings, "use_bitmap_index", request.param)
+
+
+def group_movies(client, session_id: int, username: str = "group_host", **params) -> list[int]:
+    response = client.get(
+        f"/api/group-sessions/{session_id}/movies", params={"current_username": username, **params}
+    )
+    assert response.status_code == 200
+    return [movie["id"] for movie in response.json()]
+
+
+def test_movies_every_member_liked(client, sessions, use_bitmap_index):
+    # 1 and 4 are liked by only some members; 2 and 3 are on two services each, so by id
+    assert group_movies(client, sessions["all"]) == [2, 3]
+    assert group_movies(client, sessions["all"], username="group_b") == [2, 3]
+
+
+def test_given_services_rank_first(client, sessions, use_bitmap_index):
+    assert group_movies(client, sessions["all"], streaming_services=json.dumps(["Hulu"])) == [3, 2]
+    assert group_movies(client, sessions["all"], limit=1) == [2]
+
+
+def test_member_with_no_likes_means_no_movies(client, sessions, use_bitmap_index):
+    assert group_movies(client, sessions["idle"]) == []
+
+
+def test_sessions_are_listed_for_members_only(client, sessions):
+    listed = client.get("/api/group-sessions/", params={"current_username": "group_b"}).json()
+    assert [session["id"] for session in listed] == [sessions["all"]]
+    assert {member["username"] for member in listed[0]["members"]} == {"group_host", "group_a", "group_b"}
+    response = client.get(
+        f"/api/group-sessions/{sessions['idle']}/movies", params={"current_username": "group_b"}
+    )
+    assert response.status_code == 403
+
+
+def test_members_must_be_friends(client, sessions):
+    idle_id = client.get("/api/users/group_idle").json()["id"]
+    response = client.post("/api/group-sessions/?current_username=group_b", json={"friend_ids": [idle_id]})
+    assert response.status_code == 400
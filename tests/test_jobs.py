@@ -0,0 +1,32 @@
+"""Catalog job status reaches every worker over the notify bus."""
+import os
+import time
+
+from database import SessionLocal
+from notify_bus import NotifyBus, SQLiteOutboxBackend
+import jobs
+from jobs import CatalogJobQueue
+
+
+def test_job_status_is_visible_from_another_worker(tmp_path, monkeypatch):
+    path = os.path.join(tmp_path, "bus.db")
+    worker_a = NotifyBus(SQLiteOutboxBackend(path, poll_interval=0.01))
+    worker_b = NotifyBus(SQLiteOutboxBackend(path, poll_interval=0.01))
+    queue_a = CatalogJobQueue(SessionLocal, lambda db, page: 7, prefetch_pages=0)
+    queue_b = CatalogJobQueue(SessionLocal, lambda db, page: 0, prefetch_pages=0)
+    worker_b.subscribe(jobs.JOBS_CHANNEL, lambda event: queue_b.record(jobs.job_from_event(event)))
+    worker_b.start()
+    monkeypatch.setattr(jobs, "bus", worker_a)
+    try:
+        job = queue_a.submit(1)
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            seen = queue_b.get(job.id)
+            if seen and seen.status == "done":
+                break
+            time.sleep(0.01)
+        assert seen is not None and seen.status == "done" and seen.added == 7 and seen.finished_at
+    finally:
+        queue_a.stop()
+        worker_a.stop()
+        worker_b.stop()
@@ -0,0 +1,25 @@
+"""SQLite bus: events published by a short-lived process are written before it exits."""
+import os
+import sqlite3
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+PUBLISH = """
+from notify_bus import bus
+for n in range(200):
+    bus.publish("movie_key", {"movie_id": n}, local=False)
+"""
+
+
+def test_events_from_an_exiting_process_reach_the_table(tmp_path):
+    path = os.path.join(tmp_path, "bus.db")
+    env = dict(
+        os.environ, NOTIFY_BACKEND="sqlite", NOTIFY_BUS_PATH=path,
+        DATABASE_URL=f"sqlite:///{os.path.join(tmp_path, 'app.db')}",
+    )
+    for _ in range(3):
+        subprocess.run([sys.executable, "-c", PUBLISH], cwd=ROOT, env=env, check=True, timeout=30)
+    with sqlite3.connect(path) as db:
+        assert db.execute("SELECT count(*) FROM bus_events WHERE channel = 'movie_key'").fetchone()[0] == 600
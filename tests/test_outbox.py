@@ -0,0 +1,44 @@
+"""Durable outbox: events wait for an offline user, acks move the cursor forward only and never past real events."""
+from database import SessionLocal
+from outbox import ack, acked_seq, events_after
+
+from test_query_budget import make_friends, like
+
+
+def match_events(client, username: str, friend: str, movie_ids: list[int]) -> tuple[int, list[int]]:
+    """Matches between the two on movie_ids; returns the user's id and the seqs of its new events."""
+    like(client, friend, movie_ids)
+    like(client, username, movie_ids)
+    user_id = client.get(f"/api/users/{username}").json()["id"]
+    with SessionLocal() as db:
+        return user_id, [event["seq"] for event in events_after(db, user_id, acked_seq(db, user_id))]
+
+
+def test_events_are_replayed_after_going_offline(client):
+    make_friends(client, "outbox_a", "outbox_b")
+    _, seqs = match_events(client, "outbox_b", "outbox_a", [8])
+    assert len(seqs) == 1
+    with client.websocket_connect("/ws/outbox_b") as websocket:
+        message = websocket.receive_json()
+    assert message["type"] == "new_match" and message["seq"] == seqs[0]
+    assert message["movie_title"] and message["friend_username"] == "outbox_a"
+
+
+def test_partial_ack_replays_the_rest(client):
+    make_friends(client, "outbox_c", "outbox_d")
+    user_id, seqs = match_events(client, "outbox_d", "outbox_c", [8, 9])
+    assert len(seqs) == 2
+    with SessionLocal() as db:
+        assert ack(db, user_id, seqs[0]) == seqs[0]
+        assert [event["seq"] for event in events_after(db, user_id, acked_seq(db, user_id))] == seqs[1:]
+
+
+def test_cursor_never_moves_backwards_or_past_the_newest_event(client):
+    make_friends(client, "outbox_e", "outbox_f")
+    user_id, seqs = match_events(client, "outbox_f", "outbox_e", [8, 9])
+    with SessionLocal() as db:
+        assert ack(db, user_id, seqs[1]) == seqs[1]
+        assert ack(db, user_id, seqs[0]) == seqs[1]  # a stale ack
+        assert ack(db, user_id, seqs[1] + 1000) == seqs[1]  # an ack from the future
+    _, newer = match_events(client, "outbox_f", "outbox_e", [10])
+    assert len(newer) == 1 and newer[0] > seqs[1]  # still replayed
@@ -0,0 +1,59 @@
+"""Query-count budgets: list and detail endpoints cost a fixed number of queries, whatever the page size."""
+import pytest
+
+from card_cache import card_cache
+from conftest import count_queries
+from user_cache import user_cache
+
+
+def make_friends(client, sender: str, receiver: str) -> None:
+    codes = {u: client.post("/api/users/", json={"username": u}).json()["invite_code"] for u in (sender, receiver)}
+    client.post(f"/api/friends/request?current_username={sender}", json={"invite_code": codes[receiver]})
+    request_id = client.get(f"/api/friends/requests?current_username={receiver}").json()[0]["id"]
+    client.post(f"/api/friends/accept/{request_id}?current_username={receiver}")
+
+
+def like(client, username: str, movie_ids) -> None:
+    client.post(
+        f"/api/swipes/batch?current_username={username}",
+        json={"swipes": [{"movie_id": movie_id, "direction": "right"} for movie_id in movie_ids]},
+    )
+
+
+def cold_queries(client, url: str, **params) -> int:
+    """Queries for one request with the card and user caches empty."""
+    card_cache.clear()
+    user_cache.clear()
+    with count_queries() as statements:
+        response = client.get(url, params=params)
+    assert response.status_code == 200
+    return len(statements)
+
+
+@pytest.mark.parametrize("limit", [1, 5, 15])
+def test_movies_list_budget(client, limit):
+    client.post("/api/users/", json={"username": "budget_viewer"})
+    # user lookup, page of ids, movies, their streaming services
+    assert cold_queries(client, "/api/movies/", limit=limit, current_username="budget_viewer") == 4
+    assert cold_queries(client, "/api/movies/", limit=limit) == 3
+
+
+def test_movie_detail_budget(client):
+    assert cold_queries(client, "/api/movies/1") == 2  # movie, its streaming services
+    etag = client.get("/api/movies/1").headers["etag"]
+    with count_queries() as statements:
+        response = client.get("/api/movies/1", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert statements == []
+
+
+def test_matches_budget(client):
+    make_friends(client, "budget_a", "budget_b")
+    like(client, "budget_a", range(1, 11))
+    like(client, "budget_b", [1])
+    one_match = cold_queries(client, "/api/matches/", current_username="budget_a")
+    like(client, "budget_b", range(2, 11))
+    ten_matches = cold_queries(client, "/api/matches/", current_username="budget_a")
+    assert len(client.get("/api/matches/", params={"current_username": "budget_a"}).json()) == 10
+    # user lookup plus one feed query (matches, movies, friends, services and unread count)
+    assert one_match == ten_matches == 2
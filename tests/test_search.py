@@ -0,0 +1,98 @@
+"""FTS5 catalog search: user input is plain text, title prefixes rank first, and the index follows the movies table."""
+import pytest
+from sqlalchemy import delete, insert, update
+
+import tmdb_sync
+from database import SessionLocal, ReadSessionLocal, Movie
+from search import match_expression, search_movie_ids, find_synced_movie_id
+
+MOVIES = [
+    {"id": 9001, "title": "The Quokka", "genre": "Comedy"},
+    {"id": 9002, "title": "Quokkaland", "genre": "Comedy"},
+    {"id": 9003, "title": "Quokka", "genre": "Drama"},
+    {"id": 9004, "title": "Marsupial", "genre": "Drama", "description": "A quokka goes to sea."},
+    {"id": 9005, "title": "The Grand Quokka", "genre": "Drama", "release_year": 2001, "tmdb_id": 990001},
+]
+
+
+@pytest.fixture
+def quokkas(client):
+    with SessionLocal() as db:
+        db.execute(insert(Movie), MOVIES)
+        db.commit()
+    yield
+    with SessionLocal() as db:
+        db.execute(delete(Movie).where(Movie.id.in_([movie["id"] for movie in MOVIES])))
+        db.commit()
+
+
+def search(query: str) -> list[int]:
+    with ReadSessionLocal() as db:
+        return search_movie_ids(db, query)
+
+
+@pytest.mark.parametrize("query, expression", [
+    ('"quokka', '"quokka"*'),
+    ("quok*", '"quok"*'),
+    ("NEAR(quokka sea)", '"near" "quokka" "sea"*'),
+    ("(quokka", '"quokka"*'),
+    ("quokka AND NOT sea) ", '"quokka" "and" "not" "sea"'),
+    ("quokka OR", '"quokka" "or"*'),
+])
+def test_fts_syntax_in_queries_is_plain_text(quokkas, query, expression):
+    assert match_expression(query) == expression
+    search(query)  # never an FTS5 syntax error
+
+
+def test_quoted_query_still_matches(quokkas):
+    assert search('"quokka"') == search("quokka")
+    assert search("marsupial*") == [9004]
+
+
+def test_only_punctuation_finds_nothing(quokkas):
+    assert match_expression('*"()') is None
+    assert search('*"()') == []
+
+
+def test_title_prefixes_rank_before_other_matches(quokkas):
+    # Titles starting with the query (shorter first), then other title matches, then descriptions
+    assert search("quok") == [9003, 9002, 9001, 9005, 9004]
+    # A full token (trailing space) no longer matches Quokkaland
+    assert search("quokka ") == [9003, 9001, 9005, 9004]
+    assert search("grand quok") == [9005]
+
+
+def test_triggers_keep_the_index_in_sync(quokkas):
+    with SessionLocal() as db:
+        db.execute(insert(Movie).values(id=9006, title="Wombatique", genre="Drama"))
+        db.commit()
+        assert search("wombati") == [9006]
+        db.execute(update(Movie).where(Movie.id == 9006).values(title="Numbatique", description="no wombats"))
+        db.commit()
+        assert search("numbati") == [9006]
+        assert search("wombatique") == []
+        assert search("wombats") == [9006]  # description
+        db.execute(delete(Movie).where(Movie.id == 9006))
+        db.commit()
+    assert search("numbati") == []
+
+
+def test_find_synced_movie_id_is_exact_and_linked_only(quokkas):
+    with ReadSessionLocal() as db:
+        assert find_synced_movie_id(db, "the GRAND quokka") == 9005
+        assert find_synced_movie_id(db, "The Grand Quokka", 2001) == 9005
+        assert find_synced_movie_id(db, "The Grand Quokka", 2002) is None
+        assert find_synced_movie_id(db, "Grand Quokka") is None  # not the whole title
+        assert find_synced_movie_id(db, "Quokka") is None  # not linked to TMDB
+
+
+def test_sync_by_title_skips_the_search_for_a_synced_movie(quokkas, monkeypatch):
+    def no_search(*args):
+        raise AssertionError("TMDB search called for a synced movie")
+
+    monkeypatch.setattr(tmdb_sync, "search_movie", no_search)
+    monkeypatch.setattr(tmdb_sync, "get_movie_details", lambda tmdb_id: {"id": tmdb_id, "title": "The Grand Quokka"})
+    monkeypatch.setattr(tmdb_sync, "get_watch_providers", lambda tmdb_id: [])
+    with SessionLocal() as db:
+        movie = tmdb_sync.sync_movie_by_title(db, "the grand quokka", 2001)
+        assert movie is not None and movie is db.get(Movie, 9005)
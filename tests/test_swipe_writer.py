@@ -0,0 +1,69 @@
+"""Group-commit writer: cancelled requests never break the writer or lose a committed swipe's side effects."""
+import threading
+import time
+
+from database import SessionLocal, SwipeDirection
+from swipe_writer import SwipeWriter
+
+from test_query_budget import make_friends, like
+
+
+def user_id(client, username: str) -> int:
+    return client.post("/api/users/", json={"username": username}).json()["id"]
+
+
+def wait_running(future, timeout: float = 5) -> None:
+    """Wait until the writer has collected the future; fail instead of hanging if it never does."""
+    deadline = time.monotonic() + timeout
+    while not future.running():
+        assert time.monotonic() < deadline, "the writer never collected the swipe"
+        time.sleep(0.001)
+
+
+def test_cancelled_before_collect_is_skipped(client):
+    uid = user_id(client, "writer_cancel_early")
+    release = threading.Event()
+
+    def on_commit(results, match_ids):
+        release.wait(5)  # holds the writer thread until the next swipe is queued and cancelled
+
+    writer = SwipeWriter(SessionLocal, flush_interval=0, on_commit=on_commit)
+    try:
+        busy = writer.submit(uid, 1, SwipeDirection.LEFT)
+        wait_running(busy)
+        queued = writer.submit(uid, 2, SwipeDirection.LEFT)
+        assert queued.cancel()
+        release.set()
+        assert busy.result(timeout=5).status == "created"
+        # The cancelled swipe was never written, and the writer is still alive
+        assert writer.submit(uid, 2, SwipeDirection.LEFT).result(timeout=5).status == "created"
+    finally:
+        release.set()
+        writer.stop()
+
+
+def test_cancel_during_write_keeps_result_and_matches(client):
+    make_friends(client, "writer_a", "writer_b")
+    like(client, "writer_a", [3])
+    uid = client.get("/api/users/writer_b").json()["id"]
+
+    committed, release = [], threading.Event()
+
+    def on_commit(results, match_ids):
+        release.wait(5)  # hold the hand-off so the request can be cancelled mid-write
+        committed.append((results, match_ids))
+
+    writer = SwipeWriter(SessionLocal, on_commit=on_commit)
+    try:
+        future = writer.submit(uid, 3, SwipeDirection.RIGHT)
+        wait_running(future)
+        assert not future.cancel()  # collected futures are running and can't be cancelled
+        release.set()
+        assert future.result(timeout=5).status == "created"
+        # A second swipe still goes through: the writer thread survived
+        assert writer.submit(uid, 4, SwipeDirection.LEFT).result(timeout=5).status == "created"
+    finally:
+        release.set()
+        writer.stop()
+    (results, match_ids), _ = committed
+    assert results[0].status == "created" and len(match_ids) == 1
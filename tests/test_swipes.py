@@ -0,0 +1,20 @@
+"""Match detection reads friendships from the database, not from a possibly stale friend cache."""
+from database import SessionLocal, Friendship
+from friend_graph import friend_graph
+
+from test_query_budget import like
+
+
+def test_stale_friend_cache_does_not_miss_a_match(client):
+    ids = [client.post("/api/users/", json={"username": name}).json()["id"] for name in ("stale_a", "stale_b")]
+    with SessionLocal() as db:
+        assert friend_graph.friends_of(db, ids[1]) == frozenset()  # cached: no friends
+        # Committed elsewhere (another worker) without this process hearing about it
+        db.add(Friendship(user1_id=ids[0], user2_id=ids[1]))
+        db.commit()
+        assert friend_graph.friends_of(db, ids[1]) == frozenset()
+
+    like(client, "stale_a", [6])
+    like(client, "stale_b", [6])
+    matches = client.get("/api/matches/", params={"current_username": "stale_b"}).json()
+    assert [match["movie"]["id"] for match in matches] == [6]
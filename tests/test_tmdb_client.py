@@ -0,0 +1,141 @@
+"""TMDB clients against a local fake TMDB server: Retry-After on 429, 404, 5xx and transport errors."""
+import asyncio
+import json
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+import pytest
+
+from config import settings
+from tmdb_client import (
+    TMDBClient, AsyncTMDBClient, TMDBNotFound, TMDBRateLimited, TMDBUnavailable,
+)
+
+POPULAR = {"results": [{"id": 1, "title": "Fake"}]}
+
+
+class FakeTMDB(BaseHTTPRequestHandler):
+    """Serves scripted (status, headers, body) responses per path; the last one repeats."""
+    routes: dict[str, list[tuple[int, dict, dict]]] = {}
+    hits: dict[str, int] = {}
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        self.hits[path] = self.hits.get(path, 0) + 1
+        script = self.routes.get(path) or [(404, {}, {"status_message": "not found"})]
+        status, headers, body = script[min(self.hits[path], len(script)) - 1]
+        payload = json.dumps(body).encode()
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def tmdb(monkeypatch):
+    """Base URL of a fresh fake server; fast backoff so retries don't slow the tests down."""
+    FakeTMDB.routes, FakeTMDB.hits = {}, {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeTMDB)
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    monkeypatch.setattr(settings, "tmdb_backoff_base", 0.01)
+    monkeypatch.setattr(settings, "tmdb_backoff_max", 0.05)
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+    server.server_close()
+
+
+def closed_port_url() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}"
+
+
+def call(kind: str, base_url: str, method: str, *args):
+    """Run one client method with the sync or the async client."""
+    if kind == "sync":
+        with TMDBClient(api_key="key", base_url=base_url, max_retries=2, timeout=2) as client:
+            return getattr(client, method)(*args)
+
+    async def run():
+        async with AsyncTMDBClient(api_key="key", base_url=base_url, max_retries=2, timeout=2) as client:
+            return await getattr(client, method)(*args)
+
+    return asyncio.run(run())
+
+
+@pytest.fixture(params=["sync", "async"])
+def kind(request):
+    return request.param
+
+
+def test_429_honours_retry_after(tmdb, kind, monkeypatch):
+    monkeypatch.setattr(settings, "tmdb_backoff_max", 1.0)
+    FakeTMDB.routes["/movie/popular"] = [(429, {"Retry-After": "0.3"}, {}), (200, {}, POPULAR)]
+    started = time.monotonic()
+    assert call(kind, tmdb, "get_popular_movies") == POPULAR["results"]
+    assert time.monotonic() - started >= 0.3
+    assert FakeTMDB.hits["/movie/popular"] == 2
+
+
+def test_429_gives_up_after_retries(tmdb, kind):
+    FakeTMDB.routes["/movie/popular"] = [(429, {"Retry-After": "0"}, {})]
+    with pytest.raises(TMDBRateLimited) as error:
+        call(kind, tmdb, "get_popular_movies")
+    assert error.value.retry_after == 0
+    assert FakeTMDB.hits["/movie/popular"] == 3  # first try + max_retries
+
+
+@pytest.mark.parametrize("retry_after", ["3600", "Wed, 21 Oct 2099 07:28:00 GMT"])
+def test_429_retry_after_over_the_cap_is_not_waited(tmdb, kind, retry_after):
+    FakeTMDB.routes["/movie/popular"] = [(429, {"Retry-After": retry_after}, {})]
+    started = time.monotonic()
+    with pytest.raises(TMDBRateLimited) as error:
+        call(kind, tmdb, "get_popular_movies")
+    assert time.monotonic() - started < 1
+    assert error.value.retry_after is not None and error.value.retry_after > 3000
+    assert FakeTMDB.hits["/movie/popular"] == 1
+
+
+def test_404_is_not_retried(tmdb, kind):
+    with pytest.raises(TMDBNotFound) as error:
+        call(kind, tmdb, "get_movie_details", 42)
+    assert error.value.status_code == 404
+    assert FakeTMDB.hits["/movie/42"] == 1
+
+
+def test_5xx_is_retried(tmdb, kind):
+    FakeTMDB.routes["/movie/7"] = [(503, {}, {}), (200, {}, {"id": 7})]
+    assert call(kind, tmdb, "get_movie_details", 7) == {"id": 7}
+    assert FakeTMDB.hits["/movie/7"] == 2
+
+
+def test_transport_error_is_typed(kind, monkeypatch):
+    monkeypatch.setattr(settings, "tmdb_backoff_base", 0.01)
+    with pytest.raises(TMDBUnavailable) as error:
+        call(kind, closed_port_url(), "get_genres")
+    assert error.value.status_code is None
+
+
+def test_page_extras_use_the_async_client(tmdb, monkeypatch):
+    from tmdb_sync import _fetch_page_extras
+
+    monkeypatch.setattr(settings, "tmdb_api_key", "key")
+    monkeypatch.setattr(settings, "tmdb_base_url", tmdb)
+    FakeTMDB.routes["/movie/9001"] = [(429, {"Retry-After": "0"}, {}), (200, {}, {"id": 9001, "title": "A"})]
+    FakeTMDB.routes["/movie/9001/watch/providers"] = [
+        (200, {}, {"results": {settings.tmdb_region: {"flatrate": [{"provider_name": "netflix"}]}}})
+    ]
+    extras = _fetch_page_extras([9001, 9002])
+    assert extras[9001] == ({"id": 9001, "title": "A"}, ["Netflix"])
+    assert extras[9002] == (None, [])  # 404s come back empty
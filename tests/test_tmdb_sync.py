@@ -0,0 +1,50 @@
+"""Single-movie sync holds no writer connection while it waits on TMDB."""
+import pytest
+from sqlalchemy import select
+from sqlalchemy.pool import QueuePool
+
+import tmdb_sync
+from database import SessionLocal, Movie, engine
+
+SEARCH = {"id": 27205, "title": "Inception", "original_title": "Inception", "release_date": "2010-07-15"}
+DETAILS = {**SEARCH, "genres": [{"id": 878, "name": "Science Fiction"}]}
+
+
+@pytest.fixture
+def fake_tmdb(monkeypatch):
+    """Stub the TMDB calls; each records how many writer connections were checked out meanwhile."""
+    checked_out = []
+    pool = engine.pool
+    assert isinstance(pool, QueuePool)
+
+    def record(result):
+        def call(*args):
+            checked_out.append(pool.checkedout())
+            return result
+        return call
+
+    monkeypatch.setattr(tmdb_sync, "get_movie_details", record(DETAILS))
+    monkeypatch.setattr(tmdb_sync, "get_watch_providers", record(["Netflix", "Max"]))
+    monkeypatch.setattr(tmdb_sync, "search_movie", record(SEARCH))
+    return checked_out
+
+
+def test_sync_movie_releases_writer_during_tmdb(client, fake_tmdb):
+    with SessionLocal() as db:
+        movie_id = db.query(Movie.id).filter(Movie.title == "Inception").scalar()
+        assert tmdb_sync.sync_movie_from_tmdb(db, movie_id)  # no tmdb_id yet: search, then providers
+        assert tmdb_sync.sync_movie_from_tmdb(db, movie_id)  # linked: details, then providers
+    assert fake_tmdb == [0, 0, 0, 0]
+
+    detail = client.get(f"/api/movies/{movie_id}").json()
+    assert {service["name"] for service in detail["streaming_services"]} == {"Netflix", "Max"}
+    with SessionLocal() as db:
+        assert db.execute(select(Movie.tmdb_id).where(Movie.id == movie_id)).scalar() == 27205
+
+
+def test_sync_by_title_releases_writer_during_tmdb(client, fake_tmdb):
+    with SessionLocal() as db:
+        movie = tmdb_sync.sync_movie_by_title(db, "Inception", 2010)
+        assert movie is not None
+        assert db.execute(select(Movie.title).where(Movie.tmdb_id == 27205)).scalar() == "Inception"
+    assert fake_tmdb and set(fake_tmdb) == {0}
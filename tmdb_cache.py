@@ -0,0 +1,178 @@
+"""Read-through cache in front of tmdb_client: in-memory LRU over an on-disk SQLite tier.
+
+Entries expire per endpoint (settings.tmdb_cache_ttl_*). "Not found" answers are cached as
+negative results with a shorter TTL; transient failures (rate limits, 5xx, network) are not
+cached. Exposes the same functions and None / [] contract as tmdb_client.
+"""
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional
+
+from config import settings
+from tmdb_client import get_client, AsyncTMDBClient, TMDBError, TMDBNotFound
+
+_MISSING = object()
+
+
+class TTLCache:
+    def __init__(self, path: str, max_entries: int = 10000):
+        self._lock = threading.Lock()
+        self._memory: OrderedDict[str, tuple[float, Any]] = OrderedDict()
+        self._max_entries = max_entries
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS tmdb_cache (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._db.commit()
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "negative_hits": 0, "evictions": 0}
+
+    def _remember(self, key: str, expires_at: float, value: Any) -> None:
+        self._memory[key] = (expires_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self._max_entries:
+            self._memory.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    def get(self, key: str) -> Any:
+        """Cached value (possibly None / [] for negative results) or _MISSING."""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry and entry[0] > now:
+                self._memory.move_to_end(key)
+                self.stats["memory_hits"] += 1
+                return self._count_negative(entry[1])
+            row = self._db.execute(
+                "SELECT value, expires_at FROM tmdb_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row and row[1] > now:
+                value = json.loads(row[0])
+                self._remember(key, row[1], value)
+                self.stats["disk_hits"] += 1
+                return self._count_negative(value)
+            self.stats["misses"] += 1
+            return _MISSING
+
+    def _count_negative(self, value: Any) -> Any:
+        if not value:
+            self.stats["negative_hits"] += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        expires_at = time.time() + ttl
+        with self._lock:
+            self._remember(key, expires_at, value)
+            self._db.execute(
+                "INSERT OR REPLACE INTO tmdb_cache (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            self._db.commit()
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+            self._db.execute("DELETE FROM tmdb_cache")
+            self._db.commit()
+
+    def purge_expired(self) -> int:
+        """Drop expired rows from the disk tier; returns how many were removed."""
+        with self._lock:
+            cur = self._db.execute("DELETE FROM tmdb_cache WHERE expires_at <= ?", (time.time(),))
+            self._db.commit()
+            return cur.rowcount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {**self.stats, "memory_entries": len(self._memory)}
+
+
+cache = TTLCache(settings.tmdb_cache_path, settings.tmdb_cache_max_entries)
+
+
+def _cached(key: str, ttl: float, empty: Any, fetch: Callable[[], Any]) -> Any:
+    """Read-through lookup; TMDBNotFound is cached as `empty`, other TMDB errors return `empty` uncached."""
+    value = cache.get(key)
+    if value is not _MISSING:
+        return value
+    if not settings.tmdb_api_key:
+        return empty
+    try:
+        value = fetch()
+    except TMDBNotFound:
+        value = empty
+    except TMDBError:
+        return empty
+    cache.set(key, value, ttl if value else settings.tmdb_cache_ttl_negative)
+    return value
+
+
+async def _cached_async(key: str, ttl: float, empty: Any, fetch: Callable[[], Awaitable[Any]]) -> Any:
+    """_cached for an AsyncTMDBClient call (the cache itself is local and fast, so it stays sync)."""
+    value = cache.get(key)
+    if value is not _MISSING:
+        return value
+    if not settings.tmdb_api_key:
+        return empty
+    try:
+        value = await fetch()
+    except TMDBNotFound:
+        value = empty
+    except TMDBError:
+        return empty
+    cache.set(key, value, ttl if value else settings.tmdb_cache_ttl_negative)
+    return value
+
+
+def search_movie(title: str, year: Optional[int] = None) -> Optional[dict]:
+    """Cached tmdb_client.search_movie (first result or None)."""
+    key = f"search:{title.strip().lower()}:{year}"
+    return _cached(key, settings.tmdb_cache_ttl_search, None, lambda: get_client().search_movie(title, year))
+
+
+def get_movie_details(tmdb_movie_id: int) -> Optional[dict]:
+    """Cached tmdb_client.get_movie_details."""
+    return _cached(
+        f"details:{tmdb_movie_id}", settings.tmdb_cache_ttl_details, None,
+        lambda: get_client().get_movie_details(tmdb_movie_id),
+    )
+
+
+def get_watch_providers(tmdb_movie_id: int) -> list[str]:
+    """Cached tmdb_client.get_watch_providers (keyed by region)."""
+    return _cached(
+        f"providers:{settings.tmdb_region}:{tmdb_movie_id}", settings.tmdb_cache_ttl_providers, [],
+        lambda: get_client().get_watch_providers(tmdb_movie_id),
+    )
+
+
+def get_popular_movies(page: int = 1) -> list[dict]:
+    """Cached tmdb_client.get_popular_movies (short TTL: the list changes daily)."""
+    return _cached(
+        f"popular:{page}", settings.tmdb_cache_ttl_popular, [],
+        lambda: get_client().get_popular_movies(page),
+    )
+
+
+def get_genres() -> list[dict]:
+    """Cached tmdb_client.get_genres (the list rarely changes)."""
+    return _cached("genres", settings.tmdb_cache_ttl_genres, [], lambda: get_client().get_genres())
+
+
+async def get_movie_details_async(client: AsyncTMDBClient, tmdb_movie_id: int) -> Optional[dict]:
+    """get_movie_details through an AsyncTMDBClient (same cache entries)."""
+    return await _cached_async(
+        f"details:{tmdb_movie_id}", settings.tmdb_cache_ttl_details, None,
+        lambda: client.get_movie_details(tmdb_movie_id),
+    )
+
+
+async def get_watch_providers_async(client: AsyncTMDBClient, tmdb_movie_id: int) -> list[str]:
+    """get_watch_providers through an AsyncTMDBClient (same cache entries)."""
+    return await _cached_async(
+        f"providers:{settings.tmdb_region}:{tmdb_movie_id}", settings.tmdb_cache_ttl_providers, [],
+        lambda: client.get_watch_providers(tmdb_movie_id),
+    )
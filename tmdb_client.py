@@ -1,6 +1,19 @@
-"""TMDB API client: search movies and fetch watch/providers (streaming availability)."""
+"""TMDB API client: search movies and fetch watch/providers (streaming availability).
+
+TMDBClient (sync) and AsyncTMDBClient share one long-lived pooled connection set each,
+bound concurrency with a semaphore, retry 429/5xx/transport errors with jittered backoff
+(honouring Retry-After) and raise typed TMDBError subclasses. The module-level functions
+wrap a shared TMDBClient and keep the old contract of returning None / [] on failure;
+page ingestion (tmdb_sync) fans out over an AsyncTMDBClient.
+"""
+import asyncio
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Optional
+
 import httpx
-from typing import Optional
 
 from config import settings
 
@@ -34,6 +47,246 @@ def _normalize_provider_name(raw: str) -> str:
     return PROVIDER_NAME_MAP.get(key, raw.strip())
 
 
+class TMDBError(Exception):
+    """Base class for TMDB failures; status_code is None for transport errors."""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class TMDBNotConfigured(TMDBError):
+    """No TMDB API key configured."""
+
+
+class TMDBNotFound(TMDBError):
+    """TMDB returned 404 for the resource."""
+
+
+class TMDBRateLimited(TMDBError):
+    """TMDB kept returning 429 after all retries."""
+
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message, 429)
+        self.retry_after = retry_after
+
+
+class TMDBUnavailable(TMDBError):
+    """5xx or network failure that persisted after all retries."""
+
+
+def _retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Parse Retry-After (delta-seconds or HTTP date) into seconds."""
+    value = response.headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+def _error_for(response: httpx.Response) -> TMDBError:
+    status = response.status_code
+    message = f"TMDB {response.request.url.path} returned {status}"
+    if status == 404:
+        return TMDBNotFound(message, status)
+    if status == 429:
+        return TMDBRateLimited(message, _retry_after_seconds(response))
+    if status >= 500:
+        return TMDBUnavailable(message, status)
+    return TMDBError(message, status)
+
+
+def _first_result(data: dict) -> Optional[dict]:
+    results = data.get("results") or []
+    return results[0] if results else None
+
+
+def _provider_names(data: dict, region: str) -> list[str]:
+    """Canonical streaming service names (flatrate/subscription only) for the region."""
+    results = data.get("results") or {}
+    region_data = results.get(region) or {}
+    flatrate = region_data.get("flatrate") or []
+    names = []
+    for p in flatrate:
+        name = (p.get("provider_name") or "").strip()
+        if name:
+            names.append(_normalize_provider_name(name))
+    return list(dict.fromkeys(names))  # unique, order preserved
+
+
+class _TMDBClientBase:
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        base_url: Optional[str] = None,
+        region: Optional[str] = None,
+        max_concurrency: Optional[int] = None,
+        max_retries: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ):
+        self.api_key = settings.tmdb_api_key if api_key is None else api_key
+        self.base_url = (base_url or settings.tmdb_base_url).rstrip("/")
+        self.region = region or settings.tmdb_region
+        self.max_concurrency = max_concurrency or settings.tmdb_max_concurrency
+        self.max_retries = settings.tmdb_max_retries if max_retries is None else max_retries
+        self.timeout = timeout or settings.tmdb_timeout
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_concurrency,
+            max_keepalive_connections=self.max_concurrency,
+            keepalive_expiry=30.0,
+        )
+
+    def _params(self, params: Optional[dict]) -> dict:
+        if not self.api_key:
+            raise TMDBNotConfigured("TMDB_API_KEY is not set")
+        return {"api_key": self.api_key, **(params or {})}
+
+    def _retry_delay(self, attempt: int, error: TMDBError) -> Optional[float]:
+        """Seconds to wait before retrying `error`, or None if it shouldn't be retried."""
+        if attempt >= self.max_retries or not isinstance(error, (TMDBRateLimited, TMDBUnavailable)):
+            return None
+        if isinstance(error, TMDBRateLimited) and error.retry_after is not None:
+            if error.retry_after > settings.tmdb_backoff_max:
+                return None  # don't hold a request thread that long: the caller gets retry_after
+            return error.retry_after + random.uniform(0, settings.tmdb_backoff_base)
+        # Full jitter: uniform over [0, base * 2^attempt], capped
+        return random.uniform(0, min(settings.tmdb_backoff_max, settings.tmdb_backoff_base * 2 ** attempt))
+
+
+class TMDBClient(_TMDBClientBase):
+    """Thread-safe sync client over one pooled keep-alive httpx.Client."""
+
+    def __init__(self, *args, transport: Optional[httpx.BaseTransport] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._client = httpx.Client(
+            base_url=self.base_url, timeout=self.timeout, limits=self._limits(), transport=transport
+        )
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+
+    def close(self) -> None:
+        self._client.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _get(self, path: str, params: Optional[dict] = None) -> dict:
+        params = self._params(params)
+        attempt = 0
+        while True:
+            try:
+                with self._semaphore:
+                    r = self._client.get(path, params=params)
+                if r.is_success:
+                    return r.json()
+                error = _error_for(r)
+            except httpx.TransportError as e:
+                error = TMDBUnavailable(f"TMDB {path} failed: {e!r}")
+            delay = self._retry_delay(attempt, error)
+            if delay is None:
+                raise error
+            time.sleep(delay)
+            attempt += 1
+
+    def search_movie(self, title: str, year: Optional[int] = None) -> Optional[dict]:
+        params: dict[str, Any] = {"query": title}
+        if year is not None:
+            params["year"] = year
+        return _first_result(self._get("/search/movie", params))
+
+    def get_movie_details(self, tmdb_movie_id: int) -> dict:
+        return self._get(f"/movie/{tmdb_movie_id}")
+
+    def get_watch_providers(self, tmdb_movie_id: int) -> list[str]:
+        return _provider_names(self._get(f"/movie/{tmdb_movie_id}/watch/providers"), self.region)
+
+    def get_popular_movies(self, page: int = 1) -> list[dict]:
+        return self._get("/movie/popular", {"page": page}).get("results") or []
+
+    def get_genres(self) -> list[dict]:
+        return self._get("/genre/movie/list").get("genres") or []
+
+
+class AsyncTMDBClient(_TMDBClientBase):
+    """Async client over one pooled keep-alive httpx.AsyncClient; use as `async with`."""
+
+    def __init__(self, *args, transport: Optional[httpx.AsyncBaseTransport] = None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url, timeout=self.timeout, limits=self._limits(), transport=transport
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def aclose(self) -> None:
+        await self._client.aclose()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def _get(self, path: str, params: Optional[dict] = None) -> dict:
+        params = self._params(params)
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    r = await self._client.get(path, params=params)
+                if r.is_success:
+                    return r.json()
+                error = _error_for(r)
+            except httpx.TransportError as e:
+                error = TMDBUnavailable(f"TMDB {path} failed: {e!r}")
+            delay = self._retry_delay(attempt, error)
+            if delay is None:
+                raise error
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def search_movie(self, title: str, year: Optional[int] = None) -> Optional[dict]:
+        params: dict[str, Any] = {"query": title}
+        if year is not None:
+            params["year"] = year
+        return _first_result(await self._get("/search/movie", params))
+
+    async def get_movie_details(self, tmdb_movie_id: int) -> dict:
+        return await self._get(f"/movie/{tmdb_movie_id}")
+
+    async def get_watch_providers(self, tmdb_movie_id: int) -> list[str]:
+        return _provider_names(await self._get(f"/movie/{tmdb_movie_id}/watch/providers"), self.region)
+
+    async def get_popular_movies(self, page: int = 1) -> list[dict]:
+        return (await self._get("/movie/popular", {"page": page})).get("results") or []
+
+    async def get_genres(self) -> list[dict]:
+        return (await self._get("/genre/movie/list")).get("genres") or []
+
+
+_default_client: Optional[TMDBClient] = None
+_default_client_lock = threading.Lock()
+
+
+def get_client() -> TMDBClient:
+    """Process-wide TMDBClient (created on first use) so every call reuses pooled connections."""
+    global _default_client
+    if _default_client is None:
+        with _default_client_lock:
+            if _default_client is None:
+                _default_client = TMDBClient()
+    return _default_client
+
+
 def search_movie(title: str, year: Optional[int] = None) -> Optional[dict]:
     """
     Search TMDB for a movie by title (and optional year).
@@ -41,22 +294,9 @@ def search_movie(title: str, year: Optional[int] = None) -> Optional[dict]:
     """
     if not settings.tmdb_api_key:
         return None
-    params = {"api_key": settings.tmdb_api_key, "query": title}
-    if year is not None:
-        params["year"] = year
     try:
-        with httpx.Client(timeout=10.0) as client:
-            r = client.get(
-                f"{settings.tmdb_base_url}/search/movie",
-                params=params,
-            )
-            r.raise_for_status()
-            data = r.json()
-            results = data.get("results") or []
-            if not results:
-                return None
-            return results[0]
-    except Exception:
+        return get_client().search_movie(title, year)
+    except TMDBError:
         return None
 
 
@@ -68,23 +308,8 @@ def get_watch_providers(tmdb_movie_id: int) -> list[str]:
     if not settings.tmdb_api_key:
         return []
     try:
-        with httpx.Client(timeout=10.0) as client:
-            r = client.get(
-                f"{settings.tmdb_base_url}/movie/{tmdb_movie_id}/watch/providers",
-                params={"api_key": settings.tmdb_api_key},
-            )
-            r.raise_for_status()
-            data = r.json()
-            results = data.get("results") or {}
-            region_data = results.get(settings.tmdb_region) or {}
-            flatrate = region_data.get("flatrate") or []
-            names = []
-            for p in flatrate:
-                name = (p.get("provider_name") or "").strip()
-                if name:
-                    names.append(_normalize_provider_name(name))
-            return list(dict.fromkeys(names))  # unique, order preserved
-    except Exception:
+        return get_client().get_watch_providers(tmdb_movie_id)
+    except TMDBError:
         return []
 
 
@@ -93,14 +318,8 @@ def get_movie_details(tmdb_movie_id: int) -> Optional[dict]:
     if not settings.tmdb_api_key:
         return None
     try:
-        with httpx.Client(timeout=10.0) as client:
-            r = client.get(
-                f"{settings.tmdb_base_url}/movie/{tmdb_movie_id}",
-                params={"api_key": settings.tmdb_api_key},
-            )
-            r.raise_for_status()
-            return r.json()
-    except Exception:
+        return get_client().get_movie_details(tmdb_movie_id)
+    except TMDBError:
         return None
 
 
@@ -112,13 +331,19 @@ def get_popular_movies(page: int = 1) -> list[dict]:
     if not settings.tmdb_api_key:
         return []
     try:
-        with httpx.Client(timeout=15.0) as client:
-            r = client.get(
-                f"{settings.tmdb_base_url}/movie/popular",
-                params={"api_key": settings.tmdb_api_key, "page": page},
-            )
-            r.raise_for_status()
-            data = r.json()
-            return data.get("results") or []
-    except Exception:
+        return get_client().get_popular_movies(page)
+    except TMDBError:
+        return []
+
+
+def get_genres() -> list[dict]:
+    """
+    Fetch TMDB's movie genre list.
+    Returns list of dicts with id and name (what list results' genre_ids refer to).
+    """
+    if not settings.tmdb_api_key:
+        return []
+    try:
+        return get_client().get_genres()
+    except TMDBError:
         return []
@@ -1,144 +1,281 @@
 """Sync movie metadata and streaming availability from TMDB into local DB."""
+import asyncio
+from typing import Iterable, Optional
+
+from sqlalchemy import select, update, delete, func
+from sqlalchemy.dialects.sqlite import insert
 from sqlalchemy.orm import Session
 
-from database import Movie, StreamingService, MovieStreamingService
-from tmdb_client import search_movie, get_watch_providers, get_movie_details, get_popular_movies
+from database import ReadSessionLocal, Movie, StreamingService, MovieStreamingService, MovieGenre
+from tmdb_client import AsyncTMDBClient
+from tmdb_cache import (
+    search_movie, get_watch_providers, get_movie_details, get_popular_movies,
+    get_movie_details_async, get_watch_providers_async,
+)
+from deck import add_movies_to_decks
+from bitmap_index import movie_services_changed, movie_genres_changed
+from genres import tmdb_genres, upsert_genres, set_movie_genres
+from http_cache import touch, movie_key, STREAMING_SERVICES, GENRES
+from search import find_synced_movie_id
+
+
+POSTER_BASE_URL = "https://image.tmdb.org/t/p/w500"
+
+
+def _release_year(data: dict) -> Optional[int]:
+    try:
+        return int(data["release_date"][:4]) if data.get("release_date") else None
+    except (ValueError, TypeError):
+        return None
+
+
+def upsert_services(db: Session, names: Iterable[str]) -> dict[str, int]:
+    """Make sure every streaming service exists; returns {name: StreamingService.id}. Does not commit."""
+    names = set(names)
+    if not names:
+        return {}
+    db.execute(
+        insert(StreamingService).on_conflict_do_nothing(index_elements=["name"]),
+        [{"name": name} for name in names],
+    )
+    rows = db.execute(select(StreamingService.name, StreamingService.id).where(StreamingService.name.in_(names)))
+    return {name: service_id for name, service_id in rows}
 
 
 def sync_movie_from_tmdb(db: Session, movie_id: int) -> bool:
     """
     Sync a local movie by id: look up TMDB (by tmdb_id or search title/year),
     fetch watch providers, and update StreamingService / MovieStreamingService.
+    Staged like sync_popular_movies: the fields needed for the lookup are read and the (single)
+    writer connection released before any TMDB call; the row is re-read and all changes written
+    in one transaction afterwards.
     Returns True if sync succeeded, False otherwise.
     """
-    movie = db.query(Movie).filter(Movie.id == movie_id).first()
-    if not movie:
+    # Stage 1: what do we look the movie up by?
+    row = db.execute(
+        select(Movie.tmdb_id, Movie.title, Movie.release_year).where(Movie.id == movie_id)
+    ).first()
+    db.rollback()  # release the writer connection before the (slow) TMDB stage
+    if not row:
         return False
+    tmdb_id, title, release_year = row
 
-    tmdb_data = None
-    if movie.tmdb_id:
-        tmdb_data = get_movie_details(movie.tmdb_id)
+    # Stage 2: TMDB, no DB work in flight
+    tmdb_data = get_movie_details(tmdb_id) if tmdb_id else None
+    found = None
     if not tmdb_data:
-        result = search_movie(movie.title, movie.release_year)
-        if not result:
+        found = search_movie(title, release_year)
+        if not found:
             return False
-        movie.tmdb_id = result["id"]
-        movie.original_title = result.get("original_title")
-        if result.get("overview") and not movie.description:
-            movie.description = result["overview"]
-        if result.get("poster_path") and not movie.poster_url:
-            movie.poster_url = f"https://image.tmdb.org/t/p/w500{result['poster_path']}"
-        if result.get("release_date"):
-            try:
-                movie.release_year = int(result["release_date"][:4])
-            except (ValueError, TypeError):
-                pass
-        db.commit()
-        tmdb_data = result
-
-    tmdb_id = movie.tmdb_id or tmdb_data.get("id")
+        tmdb_data = found
+    tmdb_id = tmdb_data.get("id") or tmdb_id
     if not tmdb_id:
         return False
-
+    genres = tmdb_genres(tmdb_data)
     provider_names = get_watch_providers(tmdb_id)
-    if not provider_names:
-        return True  # no providers is still success
 
-    # Remove existing movie–streaming links for this movie
-    db.query(MovieStreamingService).filter(MovieStreamingService.movie_id == movie_id).delete()
+    # Stage 3: re-read the row (it may have changed meanwhile) and write everything in one transaction
+    current = db.execute(
+        select(Movie.description, Movie.poster_url, Movie.genre).where(Movie.id == movie_id)
+    ).first()
+    if not current:
+        db.rollback()
+        return False
+    description, poster_url, genre = current
+    changes: dict = {}
+    if found:
+        changes["tmdb_id"] = found["id"]
+        changes["original_title"] = found.get("original_title")
+        if found.get("overview") and not description:
+            changes["description"] = found["overview"]
+        if found.get("poster_path") and not poster_url:
+            changes["poster_url"] = f"{POSTER_BASE_URL}{found['poster_path']}"
+        year = _release_year(found)
+        if year:
+            changes["release_year"] = year
+    keys = [movie_key(movie_id)] if found else []
+
+    genre_ids: dict[str, int] = {}
+    if genres:
+        genre_ids = upsert_genres(db, genres)
+        set_movie_genres(db, movie_id, genre_ids.values())
+        if genre in (None, "", "Unknown"):
+            changes["genre"] = genres[0][1]
+        keys += [movie_key(movie_id), GENRES]
 
-    for name in provider_names:
-        service = db.query(StreamingService).filter(StreamingService.name == name).first()
-        if not service:
-            service = StreamingService(name=name)
-            db.add(service)
-            db.flush()
-        link = MovieStreamingService(movie_id=movie_id, streaming_service_id=service.id)
-        db.add(link)
+    services: dict[str, int] = {}
+    if provider_names:  # no providers is still success, and keeps the links we have
+        db.execute(delete(MovieStreamingService).where(MovieStreamingService.movie_id == movie_id))
+        services = upsert_services(db, provider_names)
+        db.execute(insert(MovieStreamingService), [
+            {"movie_id": movie_id, "streaming_service_id": services[name]} for name in dict.fromkeys(provider_names)
+        ])
+        keys += [movie_key(movie_id), STREAMING_SERVICES]
 
+    if changes:
+        db.execute(update(Movie).where(Movie.id == movie_id).values(**changes))
+    if keys:
+        touch(db, *keys)
     db.commit()
+
+    if genre_ids:
+        movie_genres_changed(movie_id, [(genre_id, name) for name, genre_id in genre_ids.items()])
+    if services:
+        movie_services_changed(movie_id, [(services[name], name) for name in dict.fromkeys(provider_names)])
     return True
 
 
 def sync_movie_by_title(db: Session, title: str, year: int | None = None) -> Movie | None:
     """
     Search TMDB by title/year, create or update a local Movie, sync providers.
+    A movie we already have (exact title, already linked to TMDB) skips the TMDB search.
+    The local lookup uses a read session, so the writer is not held during the search.
     Returns the local Movie or None.
     """
-    result = search_movie(title, year)
-    if not result:
-        return None
+    with ReadSessionLocal() as read_db:
+        movie_id = find_synced_movie_id(read_db, title, year)
+    if movie_id is None:
+        result = search_movie(title, year)
+        if not result:
+            return None
+        movie_id = _link_search_result(db, result, title)
+    sync_movie_from_tmdb(db, movie_id)
+    return db.get(Movie, movie_id)
+
 
+def _link_search_result(db: Session, result: dict, title: str) -> int:
+    """Id of the local movie for a TMDB search result: linked by tmdb_id, else same title and year, else new."""
     tmdb_id = result["id"]
-    movie = db.query(Movie).filter(Movie.tmdb_id == tmdb_id).first()
-    if not movie:
-        movie = db.query(Movie).filter(
-            Movie.title == result.get("title"),
-            Movie.release_year == (int(result["release_date"][:4]) if result.get("release_date") else None),
-        ).first()
-    if not movie:
-        movie = Movie(
-            title=result.get("title") or title,
-            genre="Unknown",
-            description=result.get("overview"),
-            poster_url=f"https://image.tmdb.org/t/p/w500{result['poster_path']}" if result.get("poster_path") else None,
-            release_year=int(result["release_date"][:4]) if result.get("release_date") else None,
+    movie_id = db.execute(select(Movie.id).where(Movie.tmdb_id == tmdb_id)).scalar()
+    if movie_id is not None:
+        return movie_id
+    movie_id = db.execute(
+        select(Movie.id).where(Movie.title == result.get("title"), Movie.release_year == _release_year(result))
+    ).scalar()
+    if movie_id is None:
+        movie_id = db.execute(
+            insert(Movie).values(_movie_row({**result, "title": result.get("title") or title}, [])).returning(Movie.id)
+        ).scalar_one()
+        db.commit()
+        add_movies_to_decks(db, [movie_id])
+        return movie_id
+    # Same movie, not linked to TMDB yet: link it and fill in what we don't have
+    overview = result.get("overview") or None
+    poster_path = result.get("poster_path")
+    db.execute(
+        update(Movie)
+        .where(Movie.id == movie_id, Movie.tmdb_id.is_(None))
+        .values(
             tmdb_id=tmdb_id,
-            original_title=result.get("original_title"),
+            original_title=func.coalesce(result.get("original_title"), Movie.original_title),
+            description=func.coalesce(func.nullif(Movie.description, ""), overview),
+            poster_url=func.coalesce(
+                func.nullif(Movie.poster_url, ""), f"{POSTER_BASE_URL}{poster_path}" if poster_path else None
+            ),
         )
-        db.add(movie)
-        db.commit()
-        db.refresh(movie)
-    else:
-        if not movie.tmdb_id:
-            movie.tmdb_id = tmdb_id
-            movie.original_title = result.get("original_title") or movie.original_title
-            if result.get("overview") and not movie.description:
-                movie.description = result.get("overview")
-            if result.get("poster_path") and not movie.poster_url:
-                movie.poster_url = f"https://image.tmdb.org/t/p/w500{result['poster_path']}"
-            db.commit()
-            db.refresh(movie)
-
-    sync_movie_from_tmdb(db, movie.id)
-    return movie
+    )
+    touch(db, movie_key(movie_id))
+    db.commit()
+    return movie_id
+
+
+async def _fetch_page_extras_async(tmdb_ids: list[int]) -> dict[int, tuple[Optional[dict], list[str]]]:
+    async with AsyncTMDBClient() as client:
+        async def fetch(tmdb_id: int):
+            details, providers = await asyncio.gather(
+                get_movie_details_async(client, tmdb_id), get_watch_providers_async(client, tmdb_id)
+            )
+            return tmdb_id, (details, providers)
+
+        return dict(await asyncio.gather(*(fetch(tmdb_id) for tmdb_id in tmdb_ids)))
+
+
+def _fetch_page_extras(tmdb_ids: list[int]) -> dict[int, tuple[Optional[dict], list[str]]]:
+    """
+    Fetch details and watch providers for many TMDB ids concurrently: {tmdb_id: (details, providers)}.
+    One AsyncTMDBClient per page: its semaphore bounds the requests in flight, over pooled connections.
+    Runs its own event loop (callers are worker threads).
+    """
+    if not tmdb_ids:
+        return {}
+    return asyncio.run(_fetch_page_extras_async(tmdb_ids))
+
+
+def _movie_row(item: dict, genres: list[tuple[int, str]]) -> dict:
+    poster_path = item.get("poster_path")
+    return {
+        "title": item.get("title") or "Unknown",
+        "genre": genres[0][1] if genres else "Unknown",
+        "description": item.get("overview"),
+        "poster_url": f"{POSTER_BASE_URL}{poster_path}" if poster_path else None,
+        "release_year": _release_year(item),
+        "tmdb_id": item["id"],
+        "original_title": item.get("original_title"),
+    }
 
 
 def sync_popular_movies(db: Session, page: int = 1) -> int:
     """
     Fetch a page of popular movies from TMDB and add any new ones to the local DB
     (with watch providers). Skips movies we already have by tmdb_id.
-    Commits after each movie to avoid holding the DB lock and so other requests see new rows.
+    Staged: one IN query finds known ids, details + providers for the rest are fetched
+    concurrently (no DB work in flight), then movies, services and links are upserted
+    (and genres) in one bulk transaction. New movies are appended to every materialized user deck.
     Returns the number of new movies added.
     """
     results = get_popular_movies(page)
-    if not results:
+    items = list({item["id"]: item for item in results if item.get("id")}.values())
+    if not items:
         return 0
-    added = 0
-    for item in results:
-        tmdb_id = item.get("id")
-        if not tmdb_id:
-            continue
-        existing = db.query(Movie).filter(Movie.tmdb_id == tmdb_id).first()
-        if existing:
-            continue
-        title = item.get("title") or "Unknown"
-        release_date = item.get("release_date")
-        year = int(release_date[:4]) if release_date else None
-        poster_path = item.get("poster_path")
-        poster_url = f"https://image.tmdb.org/t/p/w500{poster_path}" if poster_path else None
-        movie = Movie(
-            title=title,
-            genre="Unknown",
-            description=item.get("overview"),
-            poster_url=poster_url,
-            release_year=year,
-            tmdb_id=tmdb_id,
-            original_title=item.get("original_title"),
-        )
-        db.add(movie)
-        db.commit()
-        db.refresh(movie)
-        sync_movie_from_tmdb(db, movie.id)
-        added += 1
-    return added
+
+    # Stage 1: which ids do we already have?
+    known = set(db.execute(
+        select(Movie.tmdb_id).where(Movie.tmdb_id.in_([item["id"] for item in items]))
+    ).scalars())
+    db.rollback()  # release the writer connection before the (slow) TMDB stage
+    items = [item for item in items if item["id"] not in known]
+    if not items:
+        return 0
+
+    # Stage 2: details + providers for the whole page, concurrently
+    extras = _fetch_page_extras([item["id"] for item in items])
+
+    # Genre names from details, else the page's genre_ids named by TMDB's (cached) genre list
+    movie_genres = {item["id"]: tmdb_genres(extras[item["id"]][0]) or tmdb_genres(item) for item in items}
+
+    # Stage 3: bulk upsert in one transaction; ON CONFLICT makes concurrent syncs of the same movie harmless
+    inserted = db.execute(
+        insert(Movie).on_conflict_do_nothing(index_elements=["tmdb_id"]).returning(Movie.id, Movie.tmdb_id),
+        [_movie_row(item, movie_genres[item["id"]]) for item in items],
+    ).all()
+    movie_ids = {tmdb_id: movie_id for movie_id, tmdb_id in inserted}
+
+    genre_ids = upsert_genres(db, (genre for tmdb_id in movie_ids for genre in movie_genres[tmdb_id]))
+    genre_links = [
+        {"movie_id": movie_id, "genre_id": genre_ids[name]}
+        for tmdb_id, movie_id in movie_ids.items()
+        for name in dict.fromkeys(name for _genre_tmdb_id, name in movie_genres[tmdb_id])
+    ]
+    if genre_links:
+        db.execute(insert(MovieGenre).on_conflict_do_nothing(), genre_links)
+        touch(db, GENRES)
+
+    provider_names = {name for tmdb_id in movie_ids for name in extras[tmdb_id][1]}
+    services: dict[str, int] = {}
+    if provider_names:
+        services = upsert_services(db, provider_names)
+        links = [
+            {"movie_id": movie_id, "streaming_service_id": services[name]}
+            for tmdb_id, movie_id in movie_ids.items()
+            for name in extras[tmdb_id][1]
+        ]
+        if links:
+            db.execute(insert(MovieStreamingService), links)
+        touch(db, STREAMING_SERVICES)
+    db.commit()
+
+    for tmdb_id, movie_id in movie_ids.items():
+        movie_services_changed(movie_id, [(services[name], name) for name in extras[tmdb_id][1]])
+        movie_genres_changed(movie_id, [(genre_ids[name], name) for _genre_tmdb_id, name in movie_genres[tmdb_id]])
+    add_movies_to_decks(db, movie_ids.values())
+    return len(movie_ids)
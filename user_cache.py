@@ -0,0 +1,87 @@
+"""Bounded LRU of username -> (user id, invite code), so authenticated endpoints skip the user lookup.
+
+Usernames never change, so found users stay valid until evicted. Unknown usernames are cached
+too, for settings.user_cache_negative_ttl seconds, and create_user invalidates the name it takes
+in every worker (user_created, over the notify bus).
+"""
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from config import settings
+from database import User
+from notify_bus import bus
+
+
+class CachedUser(NamedTuple):
+    id: int
+    username: str
+    invite_code: str
+
+
+class UserCache:
+    def __init__(self, max_entries: int = 10000, negative_ttl: float = 5.0):
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[str, tuple[Optional[CachedUser], float]] = OrderedDict()
+        self._max_entries = max_entries
+        self._negative_ttl = negative_ttl
+        self.stats = {"hits": 0, "misses": 0}
+
+    @staticmethod
+    def _stmt(username: str):
+        return select(User.id, User.username, User.invite_code).where(User.username == username)
+
+    def _lookup(self, username: str) -> tuple[bool, Optional[CachedUser]]:
+        """(hit, user); a hit on a cached unknown username is (True, None)."""
+        with self._lock:
+            entry = self._entries.get(username)
+            if entry is not None and (entry[0] is not None or entry[1] > time.monotonic()):
+                self._entries.move_to_end(username)
+                self.stats["hits"] += 1
+                return True, entry[0]
+            self.stats["misses"] += 1
+            return False, None
+
+    def _store(self, username: str, row) -> Optional[CachedUser]:
+        user = CachedUser(*row) if row else None
+        with self._lock:
+            self._entries[username] = (user, time.monotonic() + self._negative_ttl)
+            self._entries.move_to_end(username)
+            while len(self._entries) > self._max_entries:
+                self._entries.popitem(last=False)
+        return user
+
+    def get(self, db: Session, username: str) -> Optional[CachedUser]:
+        hit, user = self._lookup(username)
+        if hit:
+            return user
+        return self._store(username, db.execute(self._stmt(username)).first())
+
+    async def get_async(self, db: AsyncSession, username: str) -> Optional[CachedUser]:
+        hit, user = self._lookup(username)
+        if hit:
+            return user
+        return self._store(username, (await db.execute(self._stmt(username))).first())
+
+    def invalidate(self, username: str) -> None:
+        with self._lock:
+            self._entries.pop(username, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+USER_CREATED_CHANNEL = "user_created"
+user_cache = UserCache(settings.user_cache_max_entries, settings.user_cache_negative_ttl)
+bus.subscribe(USER_CREATED_CHANNEL, lambda event: user_cache.invalidate(event["username"]))
+
+
+def user_created(username: str) -> None:
+    """Drop any cached "unknown user" entry for a newly created username, in every worker."""
+    bus.publish(USER_CREATED_CHANNEL, {"username": username})